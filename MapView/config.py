@@ -2,3 +2,5 @@ import os
 
 STORE_HOST = os.environ.get("STORE_HOST") or "localhost"
 STORE_PORT = os.environ.get("STORE_PORT") or 8000
+# WebSocket frame format: "json" or "msgpack" (requires the msgpack package)
+WS_FORMAT = os.environ.get("WS_FORMAT") or "json"
@@ -4,7 +4,12 @@ from datetime import datetime
 import websockets
 from kivy import Logger
 from pydantic import BaseModel, field_validator
-from config import STORE_HOST, STORE_PORT
+from config import STORE_HOST, STORE_PORT, WS_FORMAT
+
+try:
+    import msgpack
+except ImportError:  # Binary frames are optional, JSON frames are used without msgpack
+    msgpack = None
 
 
 # Pydantic models
@@ -32,9 +37,10 @@ class ProcessedAgentData(BaseModel):
 
 
 class Datasource:
-    def __init__(self, user_id: int):
+    def __init__(self, user_id: int, wire_format: str = WS_FORMAT):
         self.index = 0
         self.user_id = user_id
+        self.wire_format = wire_format if wire_format == "json" or msgpack is not None else "json"
         self.connection_status = None
         self._new_points = []
         asyncio.ensure_future(self.connect_to_server())
@@ -46,7 +52,7 @@ class Datasource:
         return points
 
     async def connect_to_server(self):
-        uri = f"ws://{STORE_HOST}:{STORE_PORT}/ws/{self.user_id}"
+        uri = f"ws://{STORE_HOST}:{STORE_PORT}/ws/{self.user_id}?format={self.wire_format}"
         while True:
             Logger.debug("CONNECT TO SERVER")
             async with websockets.connect(uri) as websocket:
@@ -54,7 +60,11 @@ class Datasource:
                 try:
                     while True:
                         data = await websocket.recv()
-                        parsed_data = json.loads(data)
+                        # Text frames carry a JSON array, binary frames a msgpack array
+                        if isinstance(data, bytes):
+                            parsed_data = msgpack.unpackb(data)
+                        else:
+                            parsed_data = json.loads(data)
                         self.handle_received_data(parsed_data)
                 except websockets.ConnectionClosedOK:
                     self.connection_status = "Disconnected"
@@ -62,11 +72,11 @@ class Datasource:
 
     def handle_received_data(self, data):
         # Update your UI or perform actions with received data here
-        Logger.debug(f"Received data: {json.loads(data)}")
+        Logger.debug(f"Received {len(data)} points")
         processed_agent_data_list = sorted(
             [
                 ProcessedAgentData(**processed_data_json)
-                for processed_data_json in json.loads(data)
+                for processed_data_json in data
             ],
             key=lambda v: v.timestamp,
         )
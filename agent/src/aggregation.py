@@ -0,0 +1,102 @@
+"""
+On-agent windowed aggregation of the sensor readings.
+Readings are grouped into windows of a fixed duration of recording time. Each window is reduced to one
+WindowSummary, and in "anomaly" mode the raw readings around samples whose z acceleration is far from
+the window median are passed on too, so the uplink carries one summary per window instead of every sample.
+The summaries are published to their own topic, which the downstream pipeline does not subscribe to.
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from domain.aggregated_data import AggregatedData
+from domain.window_summary import AxisStats, WindowSummary
+
+AGGREGATION_MODES = ("raw", "summary", "anomaly")
+
+
+def _axis_stats(values: np.ndarray) -> AxisStats:
+    return AxisStats(
+        float(values.min()), float(values.max()), float(values.mean()), float(values.std())
+    )
+
+
+class WindowAggregator:
+    def __init__(
+        self,
+        window: float,
+        mode: str = "summary",
+        z_threshold: float = 8000,
+        context: int = 2,
+    ) -> None:
+        """
+        Parameters:
+            window (float): Window length in seconds of recording time.
+            mode (str): "summary" emits summaries only, "anomaly" also the raw readings around anomalies.
+            z_threshold (float): Samples whose z differs from the window median by more are anomalies.
+            context (int): Readings passed on before and after every anomalous one.
+        """
+        if mode not in ("summary", "anomaly"):
+            raise ValueError(f"Unsupported aggregation mode: {mode}")
+        self.window = window
+        self.mode = mode
+        self.z_threshold = z_threshold
+        self.context = context
+        self._readings: List[AggregatedData] = []
+        self._window_start: Optional[datetime] = None
+
+    def add(self, reading: AggregatedData) -> Tuple[List[WindowSummary], List[AggregatedData]]:
+        """
+        Add a reading to the current window.
+        Returns:
+            The summary and readings to publish when the reading started a new window, empty lists otherwise.
+        """
+        # A reading from before the window start means the recording was restarted
+        if self._window_start is not None and not (
+            0 <= (reading.timestamp - self._window_start).total_seconds() < self.window
+        ):
+            output = self.flush()
+        else:
+            output = ([], [])
+        if self._window_start is None:
+            self._window_start = reading.timestamp
+        self._readings.append(reading)
+        return output
+
+    def flush(self) -> Tuple[List[WindowSummary], List[AggregatedData]]:
+        """Close the current window, its summary and readings to publish"""
+        readings, self._readings = self._readings, []
+        self._window_start = None
+        if not readings:
+            return [], []
+        accelerometer = np.array(
+            [(r.accelerometer.x, r.accelerometer.y, r.accelerometer.z) for r in readings],
+            dtype=np.float64,
+        )
+        z = accelerometer[:, 2]
+        anomalous = np.abs(z - np.median(z)) > self.z_threshold
+        # The peak is the sample farthest from the window mean, in either direction
+        peak_z = int(z[np.abs(z - z.mean()).argmax()])
+        summary = WindowSummary(
+            user_id=readings[0].user_id,
+            start=readings[0].timestamp,
+            end=readings[-1].timestamp,
+            samples=len(readings),
+            x=_axis_stats(accelerometer[:, 0]),
+            y=_axis_stats(accelerometer[:, 1]),
+            z=_axis_stats(z),
+            peak_z=peak_z,
+            anomalies=int(anomalous.sum()),
+            gps_start=readings[0].gps,
+            gps_end=readings[-1].gps,
+        )
+        if self.mode != "anomaly" or not anomalous.any():
+            return [summary], []
+        # Widen every anomalous sample by the context on both sides, within the window
+        indexes = np.flatnonzero(anomalous)
+        marks = np.zeros(len(readings) + 1, dtype=np.int64)
+        np.add.at(marks, np.maximum(indexes - self.context, 0), 1)
+        np.add.at(marks, np.minimum(indexes + self.context + 1, len(readings)), -1)
+        keep = np.cumsum(marks[:-1]) > 0
+        return [summary], [reading for reading, kept in zip(readings, keep) if kept]
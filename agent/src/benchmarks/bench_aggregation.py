@@ -0,0 +1,54 @@
+"""
+Uplink messages and bytes of the agent for raw publishing and the on-agent aggregation modes.
+The bundled recording is replayed REPEAT times and serialized as it would be published.
+Run from the agent src directory:
+    python -m benchmarks.bench_aggregation
+"""
+import config
+from aggregation import WindowAggregator
+from file_datasource import FileDatasource
+from schema.aggregated_data_schema import AggregatedDataSchema
+from schema.window_summary_schema import WindowSummarySchema
+
+REPEAT = 10
+
+
+def readings():
+    datasource = FileDatasource(config.ACCELEROMETER_FILE, config.GPS_FILE)
+    for _ in range(REPEAT):
+        datasource.startReading()
+        yield from datasource.read()
+        datasource.stopReading()
+
+
+def main():
+    schema = AggregatedDataSchema()
+    summary_schema = WindowSummarySchema()
+    print(f"window {config.AGGREGATION_WINDOW} s, anomaly z threshold {config.AGGREGATION_Z_THRESHOLD:.0f}")
+    print(f"{'mode':<10} {'messages':>10} {'bytes':>12} {'reduction':>10}")
+    raw_bytes = None
+    for mode in ("raw", "summary", "anomaly"):
+        messages = size = 0
+        aggregator = None if mode == "raw" else WindowAggregator(
+            config.AGGREGATION_WINDOW, mode, config.AGGREGATION_Z_THRESHOLD, config.AGGREGATION_CONTEXT
+        )
+        for reading in readings():
+            if aggregator is None:
+                outputs = ([], [reading])
+            else:
+                outputs = aggregator.add(reading)
+            summaries, items = outputs
+            for msg in [summary_schema.dumps(s) for s in summaries] + [schema.dumps(i) for i in items]:
+                messages += 1
+                size += len(msg)
+        if aggregator is not None:
+            summaries, items = aggregator.flush()
+            for msg in [summary_schema.dumps(s) for s in summaries] + [schema.dumps(i) for i in items]:
+                messages += 1
+                size += len(msg)
+        raw_bytes = raw_bytes or size
+        print(f"{mode:<10} {messages:>10,} {size:>12,} {raw_bytes / size:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Startup time and peak memory of the agent's FileDatasource on a synthetic drive log.
+The previous implementation loaded both CSVs into lists before returning the first reading,
+it is measured on at most LEGACY_ROWS rows because its memory grows with the recording.
+Run from the agent src directory:
+    python -m benchmarks.bench_file_datasource [rows]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from csv import reader
+from datetime import datetime
+
+import config
+from domain.accelerometer import Accelerometer
+from domain.aggregated_data import AggregatedData
+from domain.gps import Gps
+from file_datasource import FileDatasource
+
+DEFAULT_ROWS = 10_000_000
+LEGACY_ROWS = 1_000_000
+
+
+def write_log(directory: str, rows: int):
+    accelerometer_filename = os.path.join(directory, "accelerometer.csv")
+    gps_filename = os.path.join(directory, "gps.csv")
+    z_values = [str(random.randint(12000, 20000)) for _ in range(1000)]
+    with open(accelerometer_filename, "w") as accelerometer_file, open(gps_filename, "w") as gps_file:
+        accelerometer_file.write("x,y,z\n")
+        gps_file.write("longitude,latitude\n")
+        chunk = 100_000
+        for start in range(0, rows, chunk):
+            count = min(chunk, rows - start)
+            accelerometer_file.write(
+                "".join(f"-17,4,{z_values[i % 1000]}\n" for i in range(count))
+            )
+            gps_file.write(
+                "".join(f"50.{start + i:014d},30.524547100067142\n" for i in range(count))
+            )
+    return accelerometer_filename, gps_filename
+
+
+def legacy_read(accelerometer_filename: str, gps_filename: str, rows: int):
+    """The eager implementation: both files as lists, then a third list of AggregatedData"""
+    accelerometer_data = []
+    with open(accelerometer_filename) as file:
+        csv_reader = reader(file)
+        next(csv_reader)
+        for _, row in zip(range(rows), csv_reader):
+            x, y, z = map(int, row)
+            accelerometer_data.append(Accelerometer(x, y, z))
+    gps_data = []
+    with open(gps_filename) as file:
+        csv_reader = reader(file)
+        next(csv_reader)
+        for _, row in zip(range(rows), csv_reader):
+            longitude, latitude = map(float, row)
+            gps_data.append(Gps(longitude, latitude))
+    return [
+        AggregatedData(accelerometer, gps, datetime.now(), config.USER_ID)
+        for accelerometer, gps in zip(accelerometer_data, gps_data)
+    ]
+
+
+def measure(name: str, rows: int, open_data, consume):
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    iterator = open_data()
+    next(iterator)
+    startup = time.perf_counter() - started_at
+    count = 1 + consume(iterator)
+    elapsed = time.perf_counter() - started_at
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert count == rows, (count, rows)
+    print(f"{name:<12} {rows:>12,} {startup * 1000:>12.1f} {elapsed:>10.1f} {peak / 2**20:>14.1f}")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    legacy_rows = min(rows, LEGACY_ROWS)
+    with tempfile.TemporaryDirectory() as directory:
+        accelerometer_filename, gps_filename = write_log(directory, rows)
+        print(f"{'datasource':<12} {'rows':>12} {'startup ms':>12} {'total s':>10} {'peak MiB':>14}")
+
+        def legacy_open():
+            data = legacy_read(accelerometer_filename, gps_filename, legacy_rows)
+            return iter(data)
+
+        measure("eager", legacy_rows, legacy_open, lambda data: sum(1 for _ in data))
+
+        datasource = FileDatasource(accelerometer_filename, gps_filename)
+
+        def streaming_open():
+            datasource.startReading()
+            return datasource.read()
+
+        def consume(data):
+            count = sum(1 for _ in data)
+            datasource.stopReading()
+            return count
+
+        measure("streaming", rows, streaming_open, consume)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Replay of a synthetic drive log from CSV against the memory-mapped columnar format made by recording.py.
+Reports the one-off conversion time, time to the first reading and readings/sec for both formats.
+Run from the agent src directory:
+    python -m benchmarks.bench_recording [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import recording
+from benchmarks.bench_file_datasource import write_log
+from file_datasource import FileDatasource
+
+DEFAULT_ROWS = 10_000_000
+
+
+def replay(datasource: FileDatasource):
+    started_at = time.perf_counter()
+    datasource.startReading()
+    data = datasource.read()
+    next(data)
+    startup = time.perf_counter() - started_at
+    count = 1 + sum(1 for _ in data)
+    datasource.stopReading()
+    return startup, count / (time.perf_counter() - started_at)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    with tempfile.TemporaryDirectory() as directory:
+        accelerometer_csv, gps_csv = write_log(directory, rows)
+        started_at = time.perf_counter()
+        accelerometer_npy = recording.npy_filename_for(accelerometer_csv)
+        gps_npy = recording.npy_filename_for(gps_csv)
+        recording.convert_csv(accelerometer_csv, accelerometer_npy, recording.ACCELEROMETER_DTYPE)
+        recording.convert_csv(gps_csv, gps_npy, recording.GPS_DTYPE)
+        print(f"{rows:,} rows converted in {time.perf_counter() - started_at:.1f} s")
+
+        size = lambda *filenames: sum(os.path.getsize(f) for f in filenames) / 2**20
+        print(f"{'format':<10} {'size MiB':>10} {'startup ms':>12} {'readings/sec':>14}")
+        for name, files in (("csv", (accelerometer_csv, gps_csv)), ("npy", (accelerometer_npy, gps_npy))):
+            startup, rate = replay(FileDatasource(*files))
+            print(f"{name:<10} {size(*files):>10.1f} {startup * 1000:>12.2f} {rate:>14,.0f}")
+
+        # Consumers that take the columns as arrays skip the per-reading objects entirely
+        datasource = FileDatasource(accelerometer_npy, gps_npy)
+        started_at = time.perf_counter()
+        datasource.startReading()
+        accelerometer, _ = datasource.read_columns()
+        z_mean = accelerometer["z"].mean()
+        datasource.stopReading()
+        print(f"npy columns: mean z over {rows:,} rows in {time.perf_counter() - started_at:.3f} s ({z_mean:.0f})")
+
+
+if __name__ == "__main__":
+    main()
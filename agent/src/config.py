@@ -1,11 +1,11 @@
 import os
 
 
-def try_parse(type, value: str):
+def try_parse(type, value: str, default=None):
     try:
         return type(value)
     except Exception:
-        return None
+        return default
 
 
 USER_ID = 1
@@ -15,4 +15,30 @@ MQTT_BROKER_PORT = try_parse(int, os.environ.get("MQTT_BROKER_PORT")) or 1883
 MQTT_TOPIC = os.environ.get("MQTT_TOPIC") or "agent"
 
 # Delay for sending data to mqtt in seconds
-DELAY = try_parse(float, os.environ.get("DELAY")) or 1
\ No newline at end of file
+DELAY = try_parse(float, os.environ.get("DELAY")) or 1
+
+# Recording replayed by the agent: CSV files, or .npy files converted with recording.py
+ACCELEROMETER_FILE = os.environ.get("ACCELEROMETER_FILE") or "data/accelerometer.csv"
+GPS_FILE = os.environ.get("GPS_FILE") or "data/gps.csv"
+# Sampling rates of the recording in Hz, used to timestamp samples and align GPS to the accelerometer
+ACCELEROMETER_RATE = try_parse(float, os.environ.get("ACCELEROMETER_RATE")) or 10
+GPS_RATE = try_parse(float, os.environ.get("GPS_RATE")) or 1
+
+# Load generator mode: LOAD_RATE aggregate messages per second from LOAD_VEHICLES virtual
+# vehicles for LOAD_DURATION seconds, used instead of the DELAY paced replay when set
+LOAD_RATE = try_parse(float, os.environ.get("LOAD_RATE"))
+LOAD_VEHICLES = try_parse(int, os.environ.get("LOAD_VEHICLES")) or 10
+LOAD_DURATION = try_parse(float, os.environ.get("LOAD_DURATION")) or 60
+
+# On-agent aggregation: "raw" publishes every reading, "summary" one summary per AGGREGATION_WINDOW
+# seconds to MQTT_SUMMARY_TOPIC, "anomaly" also the raw readings whose z differs from the window
+# median by more than AGGREGATION_Z_THRESHOLD, with AGGREGATION_CONTEXT readings before and after.
+# Nothing in the edge, hub, store or map consumes MQTT_SUMMARY_TOPIC: in "summary" mode no reading
+# reaches MQTT_TOPIC, which disconnects the agent from the rest of the pipeline, and in "anomaly"
+# mode only the readings around anomalies reach it
+AGGREGATION_MODE = os.environ.get("AGGREGATION_MODE") or "raw"
+AGGREGATION_WINDOW = try_parse(float, os.environ.get("AGGREGATION_WINDOW")) or 10
+# 0 is a meaningful threshold and context, so these fall back to the default only when unset or invalid
+AGGREGATION_Z_THRESHOLD = try_parse(float, os.environ.get("AGGREGATION_Z_THRESHOLD"), 8000)
+AGGREGATION_CONTEXT = try_parse(int, os.environ.get("AGGREGATION_CONTEXT"), 2)
+MQTT_SUMMARY_TOPIC = os.environ.get("MQTT_SUMMARY_TOPIC") or f"{MQTT_TOPIC}_summary"
@@ -0,0 +1,27 @@
+from dataclasses import dataclass
+
+from datetime import datetime
+from domain.gps import Gps
+
+
+@dataclass
+class AxisStats:
+    min: float
+    max: float
+    mean: float
+    std: float
+
+
+@dataclass
+class WindowSummary:
+    user_id: int
+    start: datetime
+    end: datetime
+    samples: int
+    x: AxisStats
+    y: AxisStats
+    z: AxisStats
+    peak_z: int
+    anomalies: int
+    gps_start: Gps
+    gps_end: Gps
@@ -1,67 +1,97 @@
-import csv
-from csv import reader 
 from datetime import datetime
-from domain.accelerometer import Accelerometer
-from domain.gps import Gps
+from typing import Iterator, Optional, TextIO
+
+import numpy as np
+
+import recording
 from domain.aggregated_data import AggregatedData
+from fusion import fuse
 import config
 
+# Largest number of rows parsed at once while replaying a CSV recording
+READ_CHUNK_ROWS = 65536
+
 
 class FileDatasource:
     def __init__(
         self,
         accelerometer_filename: str,
         gps_filename: str,
-
+        accelerometer_rate: float = config.ACCELEROMETER_RATE,
+        gps_rate: float = config.GPS_RATE,
     ) -> None:
         self.accelerometer_filename = accelerometer_filename
         self.gps_filename = gps_filename
+        self.accelerometer_rate = accelerometer_rate
+        self.gps_rate = gps_rate
+        # .npy recordings made by recording.py are memory-mapped, anything else is read as CSV
+        self.columnar = accelerometer_filename.endswith(".npy") and gps_filename.endswith(".npy")
+        self._accelerometer_file: Optional[TextIO] = None
+        self._gps_file: Optional[TextIO] = None
+        self._accelerometer_recording: Optional[np.ndarray] = None
+        self._gps_recording: Optional[np.ndarray] = None
+        self._started_at: Optional[datetime] = None
 
-    def read(self) -> list[AggregatedData]:
-        #The method returns data received from the sensors
-        accelerometer_data = self._read_accelerometer_data()
-        gps_data = self._read_gps_data()
-
-        # Determine the minimum length of data to avoid IndexError
-        min_length = min(len(accelerometer_data), len(gps_data))
-        
-        aggregated_data_list = []
-        for i in range(min_length):
-            aggregated_data_list.append(
-                AggregatedData(
-                    accelerometer_data[i],
-                    gps_data[i],
-                    datetime.now(),
-                    config.USER_ID,
-                )
+    def read(self) -> Iterator[AggregatedData]:
+        """
+        The method yields data received from the sensors one reading at a time.
+        Every accelerometer sample is emitted, timestamped at its place in the recording (counted from
+        startReading) and with the GPS position interpolated for that moment, see fusion.py.
+        Both files are read a chunk at a time, so memory use does not depend on the size of the recording.
+        Reading ends with the accelerometer recording or when stopReading is called.
+        """
+        if self._started_at is None:
+            raise RuntimeError("startReading must be called before read")
+        if self.columnar:
+            accelerometer_chunks = recording.iter_chunks(self._accelerometer_recording)
+            gps_chunks = recording.iter_chunks(self._gps_recording)
+        else:
+            accelerometer_chunks = recording.iter_csv_chunks(
+                self._accelerometer_file, recording.ACCELEROMETER_DTYPE, READ_CHUNK_ROWS
             )
-            
-        return aggregated_data_list
-
-    def _read_accelerometer_data(self) -> list[Accelerometer]:
-        accelerometer_data = []
-        with open(self.accelerometer_filename, 'r') as file:
-            csv_reader = reader(file)
-            next(csv_reader)  # Skip header if present
-            for row in csv_reader:
-                x, y, z = map(int, row)
-                accelerometer_data.append(Accelerometer(x, y, z))
-        return accelerometer_data
+            gps_chunks = recording.iter_csv_chunks(
+                self._gps_file, recording.GPS_DTYPE, READ_CHUNK_ROWS
+            )
+        try:
+            for aggregated_data in fuse(
+                accelerometer_chunks,
+                gps_chunks,
+                self.accelerometer_rate,
+                self.gps_rate,
+                self._started_at,
+                config.USER_ID,
+            ):
+                if self._started_at is None:
+                    return
+                yield aggregated_data
+        except ValueError:
+            # The files were closed by stopReading while reading
+            if self._started_at is not None:
+                raise
 
-    def _read_gps_data(self) -> list[Gps]:
-        gps_data = []
-        with open(self.gps_filename, 'r') as file:
-            csv_reader = reader(file)
-            next(csv_reader)  # Skip header if present
-            for row in csv_reader:
-                longitude, latitude = map(float, row)
-                gps_data.append(Gps(longitude, latitude))
-        return gps_data
+    def read_columns(self):
+        """The memory-mapped accelerometer and GPS recordings, for consumers that work on whole arrays"""
+        if self._accelerometer_recording is None:
+            raise RuntimeError("startReading must be called before read_columns")
+        return self._accelerometer_recording, self._gps_recording
 
     def startReading(self, *args, **kwargs):
-        """The method must be called before reading data"""
-        pass
+        """The method must be called before reading data, it opens the recording from the beginning"""
+        self.stopReading()
+        if self.columnar:
+            self._accelerometer_recording = recording.load(self.accelerometer_filename)
+            self._gps_recording = recording.load(self.gps_filename)
+        else:
+            self._accelerometer_file = open(self.accelerometer_filename, 'r', newline='')
+            self._gps_file = open(self.gps_filename, 'r', newline='')
+        self._started_at = datetime.now()
 
     def stopReading(self, *args, **kwargs):
-        """The method should be called to stop reading data"""
-        pass
\ No newline at end of file
+        """The method should be called to stop reading data, it closes the files"""
+        self._started_at = None
+        self._accelerometer_recording = self._gps_recording = None
+        accelerometer_file, gps_file = self._accelerometer_file, self._gps_file
+        self._accelerometer_file = self._gps_file = None
+        for file in (accelerometer_file, gps_file):
+            if file is not None:
+                file.close()
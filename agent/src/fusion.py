@@ -0,0 +1,82 @@
+"""
+Time alignment of the accelerometer and GPS streams.
+The recordings hold no timestamps, sample i of a sensor sampled at rate Hz was taken i / rate seconds
+after the recording started. Every accelerometer sample gets a GPS position linearly interpolated
+between the GPS fixes around it, so the accelerometer is replayed at its full rate.
+"""
+from datetime import datetime
+from typing import Iterator
+
+import numpy as np
+
+from domain.accelerometer import Accelerometer
+from domain.aggregated_data import AggregatedData
+from domain.gps import Gps
+
+
+def fuse(
+    accelerometer_chunks: Iterator[np.ndarray],
+    gps_chunks: Iterator[np.ndarray],
+    accelerometer_rate: float,
+    gps_rate: float,
+    start_time: datetime,
+    user_id: int,
+) -> Iterator[AggregatedData]:
+    """
+    Parameters:
+        accelerometer_chunks: Consecutive structured arrays with x, y and z fields.
+        gps_chunks: Consecutive structured arrays with longitude and latitude fields.
+        accelerometer_rate, gps_rate: Sampling rates in Hz.
+        start_time: Time of the first sample of both streams.
+    Returns:
+        One AggregatedData per accelerometer sample, in order. Samples past the last GPS fix
+        keep that position, and the stream ends when there is no GPS fix at all.
+    """
+    start = np.datetime64(start_time, "us")
+    gps_times = np.empty(0)
+    gps_longitudes = np.empty(0)
+    gps_latitudes = np.empty(0)
+    gps_offset = 0
+    accelerometer_offset = 0
+    gps_exhausted = False
+
+    for accelerometer in accelerometer_chunks:
+        times = (accelerometer_offset + np.arange(len(accelerometer))) / accelerometer_rate
+        accelerometer_offset += len(accelerometer)
+
+        # Pull GPS fixes until they cover the whole chunk
+        while not gps_exhausted and (len(gps_times) == 0 or gps_times[-1] < times[-1]):
+            gps = next(gps_chunks, None)
+            if gps is None:
+                gps_exhausted = True
+                break
+            gps_times = np.concatenate(
+                (gps_times, (gps_offset + np.arange(len(gps))) / gps_rate)
+            )
+            gps_longitudes = np.concatenate((gps_longitudes, gps["longitude"]))
+            gps_latitudes = np.concatenate((gps_latitudes, gps["latitude"]))
+            gps_offset += len(gps)
+        if len(gps_times) == 0:
+            return
+
+        longitudes = np.interp(times, gps_times, gps_longitudes)
+        latitudes = np.interp(times, gps_times, gps_latitudes)
+        timestamps = start + (times * 1e6).astype("timedelta64[us]")
+
+        for x, y, z, longitude, latitude, timestamp in zip(
+            accelerometer["x"].tolist(),
+            accelerometer["y"].tolist(),
+            accelerometer["z"].tolist(),
+            longitudes.tolist(),
+            latitudes.tolist(),
+            timestamps.tolist(),
+        ):
+            yield AggregatedData(
+                Accelerometer(x, y, z), Gps(longitude, latitude), timestamp, user_id
+            )
+
+        # Keep only the fixes the next chunks can still be interpolated from
+        keep_from = max(np.searchsorted(gps_times, times[-1], side="right") - 1, 0)
+        gps_times = gps_times[keep_from:]
+        gps_longitudes = gps_longitudes[keep_from:]
+        gps_latitudes = gps_latitudes[keep_from:]
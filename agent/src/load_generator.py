@@ -0,0 +1,127 @@
+"""
+Load generator for capacity planning of the edge/hub/store chain.
+Replays the configured recording as N virtual vehicles, each with its own user_id, at a target
+aggregate message rate. Messages are scheduled against absolute deadlines, so the rate does not
+drift with publish or serialization time. Run from the agent src directory:
+    python load_generator.py --vehicles 100 --rate 5000 --duration 60
+"""
+import argparse
+import time
+from datetime import datetime
+from itertools import cycle
+from typing import Iterator, List
+
+from domain.aggregated_data import AggregatedData
+from file_datasource import FileDatasource
+from schema.aggregated_data_schema import AggregatedDataSchema
+import config
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        client,
+        topic: str,
+        datasource: FileDatasource,
+        vehicles: int,
+        rate: float,
+        first_user_id: int = 1,
+        report_interval: float = 1.0,
+    ) -> None:
+        self.client = client
+        self.topic = topic
+        self.datasource = datasource
+        self.vehicles = max(1, vehicles)
+        self.rate = rate
+        self.first_user_id = first_user_id
+        self.report_interval = report_interval
+        self.schema = AggregatedDataSchema()
+        self.sent = 0
+        self.failed = 0
+        self.max_lag = 0.0
+
+    def _readings(self) -> Iterator[AggregatedData]:
+        """The recording replayed endlessly"""
+        while True:
+            self.datasource.startReading()
+            empty = True
+            for reading in self.datasource.read():
+                empty = False
+                yield reading
+            self.datasource.stopReading()
+            if empty:
+                raise ValueError("The recording is empty")
+
+    def run(self, duration: float) -> dict:
+        """Publish for duration seconds and return the final report"""
+        readings = self._readings()
+        user_ids: List[int] = list(range(self.first_user_id, self.first_user_id + self.vehicles))
+        interval = 1 / self.rate
+        started_at = time.perf_counter()
+        next_report_at = started_at + self.report_interval
+        for i, user_id in enumerate(cycle(user_ids)):
+            deadline = started_at + i * interval
+            if deadline - started_at >= duration:
+                break
+            now = time.perf_counter()
+            if deadline > now:
+                time.sleep(deadline - now)
+            else:
+                # Behind schedule: publish right away without sleeping until the deadlines catch up
+                self.max_lag = max(self.max_lag, now - deadline)
+            self._publish(next(readings), user_id)
+            if now >= next_report_at:
+                self._print_report(self.report(now - started_at))
+                next_report_at += self.report_interval
+        report = self.report(time.perf_counter() - started_at)
+        self._print_report(report)
+        self.datasource.stopReading()
+        return report
+
+    def _publish(self, reading: AggregatedData, user_id: int):
+        reading.user_id = user_id
+        reading.timestamp = datetime.now()
+        result = self.client.publish(self.topic, self.schema.dumps(reading))
+        if result[0] == 0:
+            self.sent += 1
+        else:
+            self.failed += 1
+
+    def report(self, elapsed: float) -> dict:
+        return {
+            "elapsed": elapsed,
+            "sent": self.sent,
+            "failed": self.failed,
+            "target_rate": self.rate,
+            "achieved_rate": self.sent / elapsed if elapsed > 0 else 0.0,
+            "max_lag": self.max_lag,
+        }
+
+    @staticmethod
+    def _print_report(report: dict):
+        print(
+            f"[{report['elapsed']:7.1f}s] sent {report['sent']:,} failed {report['failed']:,} "
+            f"rate {report['achieved_rate']:,.0f}/{report['target_rate']:,.0f} msg/s "
+            f"max lag {report['max_lag'] * 1000:.1f} ms"
+        )
+
+
+def run_load(client, vehicles: int, rate: float, duration: float) -> dict:
+    datasource = FileDatasource(config.ACCELEROMETER_FILE, config.GPS_FILE)
+    load_generator = LoadGenerator(
+        client, config.MQTT_TOPIC, datasource, vehicles, rate, first_user_id=config.USER_ID
+    )
+    return load_generator.run(duration)
+
+
+if __name__ == "__main__":
+    from main import connect_mqtt
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vehicles", type=int, default=config.LOAD_VEHICLES)
+    parser.add_argument("--rate", type=float, default=config.LOAD_RATE or 1000, help="aggregate messages per second")
+    parser.add_argument("--duration", type=float, default=config.LOAD_DURATION, help="seconds")
+    args = parser.parse_args()
+    mqtt_client = connect_mqtt(config.MQTT_BROKER_HOST, config.MQTT_BROKER_PORT)
+    run_load(mqtt_client, args.vehicles, args.rate, args.duration)
+    mqtt_client.loop_stop()
@@ -2,7 +2,10 @@ from paho.mqtt import client as mqtt_client
 import json
 import time
 from schema.aggregated_data_schema import AggregatedDataSchema
+from schema.window_summary_schema import WindowSummarySchema
+from aggregation import WindowAggregator
 from file_datasource import FileDatasource
+from load_generator import run_load
 import config
 
 
@@ -24,32 +27,74 @@ def connect_mqtt(broker, port):
     return client
 
 
-def publish(client, topic, datasource, delay):
-    data = datasource.read()
-    print(len(data))
+def send(client, topic, msg):
+    result = client.publish(topic, msg)
+    # result: [0, 1]
+    status = result[0]
+    if status == 0:
+        pass
+        # print(f"Send `{msg}` to topic `{topic}`")
+    else:
+        print(f"Failed to send message to topic {topic}")
+
+
+def publish(client, topic, datasource, delay, aggregator=None, summary_topic=None):
+    schema = AggregatedDataSchema()
+    summary_schema = WindowSummarySchema()
+
+    def send_aggregated(summaries, items):
+        # Only window summaries, and raw readings around anomalies, leave the vehicle
+        for summary in summaries:
+            send(client, summary_topic, summary_schema.dumps(summary))
+        for item in items:
+            send(client, topic, schema.dumps(item))
+
     while True:
-        for item in data:
+        # Replay the recording from the beginning every time it ends
+        datasource.startReading()
+        for item in datasource.read():
             time.sleep(delay)
             #print(item)
-            msg = AggregatedDataSchema().dumps(item)
-            #print(msg)
-            result = client.publish(topic, msg)
-            # result: [0, 1]
-            status = result[0]
-            if status == 0:
-                pass
-                # print(f"Send `{msg}` to topic `{topic}`")
+            if aggregator is None:
+                send(client, topic, schema.dumps(item))
             else:
-                print(f"Failed to send message to topic {topic}")
+                send_aggregated(*aggregator.add(item))
+        datasource.stopReading()
+        if aggregator is not None:
+            send_aggregated(*aggregator.flush())
 
 
 def run():
     # Prepare mqtt client
     client = connect_mqtt(config.MQTT_BROKER_HOST, config.MQTT_BROKER_PORT)
+    if config.LOAD_RATE:
+        # Load-test the pipeline instead of replaying the recording in real time
+        run_load(client, config.LOAD_VEHICLES, config.LOAD_RATE, config.LOAD_DURATION)
+        return
     # Prepare datasource
-    datasource = FileDatasource("data/accelerometer.csv", "data/gps.csv")
+    datasource = FileDatasource(config.ACCELEROMETER_FILE, config.GPS_FILE)
+    aggregator = None
+    if config.AGGREGATION_MODE == "summary":
+        print(
+            f"AGGREGATION_MODE=summary publishes only to {config.MQTT_SUMMARY_TOPIC}, "
+            f"which nothing downstream subscribes to: no readings are sent to {config.MQTT_TOPIC}"
+        )
+    if config.AGGREGATION_MODE != "raw":
+        aggregator = WindowAggregator(
+            config.AGGREGATION_WINDOW,
+            config.AGGREGATION_MODE,
+            config.AGGREGATION_Z_THRESHOLD,
+            config.AGGREGATION_CONTEXT,
+        )
     # Infinity publish data
-    publish(client, config.MQTT_TOPIC, datasource, config.DELAY)
+    publish(
+        client,
+        config.MQTT_TOPIC,
+        datasource,
+        config.DELAY,
+        aggregator,
+        config.MQTT_SUMMARY_TOPIC,
+    )
 
 
 if __name__ == "__main__":
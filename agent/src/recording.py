@@ -0,0 +1,96 @@
+"""
+Binary columnar recordings for replaying drive logs.
+Each sensor is stored as a NumPy structured array in a .npy file, which is memory-mapped on read:
+opening a recording costs nothing and its rows are served from the page cache.
+Convert the CSV recordings with:
+    python recording.py data/accelerometer.csv data/gps.csv
+"""
+import sys
+from itertools import islice
+from typing import Iterator, TextIO
+
+import numpy as np
+
+ACCELEROMETER_DTYPE = np.dtype([("x", "<i4"), ("y", "<i4"), ("z", "<i4")])
+GPS_DTYPE = np.dtype([("longitude", "<f8"), ("latitude", "<f8")])
+
+# Rows parsed at a time while converting, so memory stays bounded for any recording size
+CHUNK_ROWS = 1_000_000
+
+
+def _count_rows(csv_filename: str) -> int:
+    with open(csv_filename, "rb") as file:
+        # Header excluded
+        return max(sum(1 for line in file if line.strip()) - 1, 0)
+
+
+def iter_csv_chunks(file: TextIO, dtype: np.dtype, chunk_rows: int = CHUNK_ROWS) -> Iterator[np.ndarray]:
+    """
+    Parse an open CSV recording with a header row into structured arrays, a chunk at a time.
+    Chunks start small and grow, so the first rows are available right away.
+    """
+    next(file, None)  # Skip header
+    lines = (line for line in file if line.strip())
+    size = min(1024, chunk_rows)
+    while True:
+        batch = list(islice(lines, size))
+        if not batch:
+            return
+        yield np.loadtxt(batch, delimiter=",", dtype=dtype, ndmin=1)
+        size = min(size * 2, chunk_rows)
+
+
+def convert_csv(csv_filename: str, npy_filename: str, dtype: np.dtype) -> int:
+    """
+    Convert a CSV recording with a header row to a .npy file of the given structured dtype.
+    Returns:
+        rows (int): Number of rows written.
+    """
+    rows = _count_rows(csv_filename)
+    recording = np.lib.format.open_memmap(npy_filename, mode="w+", dtype=dtype, shape=(rows,))
+    with open(csv_filename, "r") as file:
+        start = 0
+        for chunk in iter_csv_chunks(file, dtype):
+            recording[start:start + len(chunk)] = chunk
+            start += len(chunk)
+    recording.flush()
+    del recording
+    return rows
+
+
+def npy_filename_for(csv_filename: str) -> str:
+    return csv_filename[:-len(".csv")] + ".npy" if csv_filename.endswith(".csv") else csv_filename + ".npy"
+
+
+def load(npy_filename: str) -> np.ndarray:
+    """Memory-map a recording read-only, nothing is read until rows are accessed"""
+    return np.load(npy_filename, mmap_mode="r")
+
+
+def iter_chunks(recording: np.ndarray, chunk_rows: int = 65536) -> Iterator[np.ndarray]:
+    """
+    Yield consecutive slices of a recording, views into the mapped file without copying.
+    Chunks start small and grow, so the first rows are available right away.
+    """
+    start, size = 0, min(1024, chunk_rows)
+    while start < len(recording):
+        yield recording[start:start + size]
+        start += size
+        size = min(size * 2, chunk_rows)
+
+
+def iter_rows(recording: np.ndarray, chunk_rows: int = 65536) -> Iterator[tuple]:
+    """Yield the rows of a recording as tuples of Python numbers, converting a chunk at a time"""
+    for chunk in iter_chunks(recording, chunk_rows):
+        yield from chunk.tolist()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python recording.py <accelerometer.csv> <gps.csv>")
+        sys.exit(1)
+    accelerometer_csv, gps_csv = sys.argv[1:]
+    for csv_filename, dtype in ((accelerometer_csv, ACCELEROMETER_DTYPE), (gps_csv, GPS_DTYPE)):
+        npy_filename = npy_filename_for(csv_filename)
+        rows = convert_csv(csv_filename, npy_filename, dtype)
+        print(f"{csv_filename} -> {npy_filename}: {rows} rows")
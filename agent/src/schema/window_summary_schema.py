@@ -0,0 +1,23 @@
+from marshmallow import Schema, fields
+from schema.gps_schema import GpsSchema
+
+
+class AxisStatsSchema(Schema):
+    min = fields.Float()
+    max = fields.Float()
+    mean = fields.Float()
+    std = fields.Float()
+
+
+class WindowSummarySchema(Schema):
+    user_id = fields.Int()
+    start = fields.DateTime("iso")
+    end = fields.DateTime("iso")
+    samples = fields.Int()
+    x = fields.Nested(AxisStatsSchema)
+    y = fields.Nested(AxisStatsSchema)
+    z = fields.Nested(AxisStatsSchema)
+    peak_z = fields.Int()
+    anomalies = fields.Int()
+    gps_start = fields.Nested(GpsSchema)
+    gps_end = fields.Nested(GpsSchema)
@@ -0,0 +1,73 @@
+import unittest
+from datetime import datetime, timedelta
+
+from aggregation import WindowAggregator
+from domain.accelerometer import Accelerometer
+from domain.aggregated_data import AggregatedData
+from domain.gps import Gps
+
+START = datetime(2024, 1, 1)
+
+
+def reading(seconds: float, z: int = 16000) -> AggregatedData:
+    return AggregatedData(
+        Accelerometer(0, 0, z), Gps(30.52, 50.45), START + timedelta(seconds=seconds), 1
+    )
+
+
+class TestWindowAggregator(unittest.TestCase):
+    def test_window_rolls_over_on_timestamp(self):
+        aggregator = WindowAggregator(window=1.0)
+        self.assertEqual(aggregator.add(reading(0)), ([], []))
+        self.assertEqual(aggregator.add(reading(0.5)), ([], []))
+        summaries, readings = aggregator.add(reading(1.0))
+        self.assertEqual(readings, [])
+        self.assertEqual(len(summaries), 1)
+        self.assertEqual(summaries[0].samples, 2)
+        self.assertEqual((summaries[0].start, summaries[0].end), (reading(0).timestamp, reading(0.5).timestamp))
+        summaries, _ = aggregator.flush()
+        self.assertEqual(summaries[0].samples, 1)
+        self.assertEqual(summaries[0].start, reading(1.0).timestamp)
+
+    def test_restarted_recording_starts_a_new_window(self):
+        aggregator = WindowAggregator(window=10.0)
+        aggregator.add(reading(5))
+        summaries, _ = aggregator.add(reading(0))
+        self.assertEqual(summaries[0].samples, 1)
+
+    def test_anomaly_context_is_cut_at_window_edges(self):
+        aggregator = WindowAggregator(window=60.0, mode="anomaly", z_threshold=8000, context=2)
+        z_values = [30000, 16000, 16000, 16000, 16000, 16000, 16000, 30000]
+        for i, z in enumerate(z_values):
+            aggregator.add(reading(i, z))
+        summaries, readings = aggregator.flush()
+        self.assertEqual(summaries[0].anomalies, 2)
+        self.assertEqual(summaries[0].peak_z, 30000)
+        self.assertEqual(
+            [r.timestamp for r in readings], [reading(i).timestamp for i in (0, 1, 2, 5, 6, 7)]
+        )
+
+    def test_zero_context_keeps_only_anomalies(self):
+        aggregator = WindowAggregator(window=60.0, mode="anomaly", context=0)
+        for i, z in enumerate([16000, 30000, 16000]):
+            aggregator.add(reading(i, z))
+        _, readings = aggregator.flush()
+        self.assertEqual([r.accelerometer.z for r in readings], [30000])
+
+    def test_summary_mode_passes_no_readings(self):
+        aggregator = WindowAggregator(window=60.0, mode="summary")
+        for i, z in enumerate([16000, 30000, 16000]):
+            aggregator.add(reading(i, z))
+        summaries, readings = aggregator.flush()
+        self.assertEqual((summaries[0].anomalies, readings), (1, []))
+
+    def test_flush_empty_window(self):
+        aggregator = WindowAggregator(window=1.0)
+        self.assertEqual(aggregator.flush(), ([], []))
+        aggregator.add(reading(0))
+        aggregator.flush()
+        self.assertEqual(aggregator.flush(), ([], []))
+
+
+if __name__ == "__main__":
+    unittest.main()
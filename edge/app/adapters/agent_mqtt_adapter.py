@@ -1,9 +1,55 @@
 import logging
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Union
+
 import paho.mqtt.client as mqtt
+from pydantic import TypeAdapter, ValidationError
+
 from app.interfaces.agent_gateway import AgentGateway
 from app.entities.agent_data import AgentData, GpsData
-from app.usecases.data_processing import process_agent_data
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.usecases.anomaly_detection import StreamingRoadStateDetector
+from app.usecases.data_processing import process_agent_data_batch
+from app.usecases.micro_batching import MicroBatcher
+from app.usecases.worker_pool import WorkerPool
 from app.interfaces.hub_gateway import HubGateway
+from app.runner import Runner
+
+agent_data_list_adapter = TypeAdapter(List[AgentData])
+USER_ID_PATTERN = re.compile(rb'"user_id"\s*:\s*(-?\d+)')
+
+
+def payload_user_id(payload: bytes) -> int:
+    """The user_id of a raw agent payload without parsing it, 0 when it has none"""
+    match = USER_ID_PATTERN.search(payload)
+    return int(match.group(1)) if match else 0
+
+
+def validate_batch(payloads: List[bytes]) -> List[AgentData]:
+    """Validate the whole batch in one call, fall back to per-message validation to skip invalid ones"""
+    try:
+        agent_data_batch = agent_data_list_adapter.validate_json(
+            b"[" + b",".join(payloads) + b"]", strict=True
+        )
+        if len(agent_data_batch) == len(payloads):
+            return agent_data_batch
+    except ValidationError:
+        pass
+    agent_data_batch = []
+    for payload in payloads:
+        try:
+            agent_data_batch.append(
+                AgentData.model_validate_json(payload, strict=True)
+            )
+        except Exception as e:
+            logging.info(f"Error processing MQTT message: {e}")
+    return agent_data_batch
+
+
+def process_payloads(payloads: List[bytes]) -> List[ProcessedAgentData]:
+    """Validate and classify raw agent payloads, runs in a worker thread or process"""
+    return process_agent_data_batch(validate_batch(payloads))
 
 
 class AgentMQTTAdapter(AgentGateway):
@@ -14,8 +60,14 @@ class AgentMQTTAdapter(AgentGateway):
         topic,
         hub_gateway: HubGateway,
         batch_size=10,
+        batch_max_age=1.0,
+        workers=1,
+        worker_kind="thread",
+        queue_size=100,
+        road_state_detector: Optional[StreamingRoadStateDetector] = None,
     ):
         self.batch_size = batch_size
+        self.batch_max_age = batch_max_age
         # MQTT
         self.broker_host = broker_host
         self.broker_port = broker_port
@@ -23,6 +75,26 @@ class AgentMQTTAdapter(AgentGateway):
         self.client = mqtt.Client()
         # Hub
         self.hub_gateway = hub_gateway
+        # Classification against per-vehicle baselines, None uses the fixed z intervals
+        self.road_state_detector = road_state_detector
+        # Validation and classification can be moved to separate processes to use every core,
+        # the worker threads then only wait for the results and forward them to the hub
+        self.executor = (
+            ProcessPoolExecutor(max_workers=workers) if worker_kind == "process" else None
+        )
+        # Processing runs in the pool so the MQTT network thread only buffers payloads
+        self.worker_pool = WorkerPool(
+            handler=self.process_batch,
+            workers=workers,
+            queue_size=queue_size,
+            # The detector needs the samples of every vehicle in order, so every vehicle sticks to one worker
+            shard_key=payload_user_id if road_state_detector is not None else None,
+        )
+        self.batcher = MicroBatcher(
+            flush_callback=self.worker_pool.submit,
+            batch_size=batch_size,
+            max_age=batch_max_age,
+        )
 
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
@@ -32,18 +104,48 @@ class AgentMQTTAdapter(AgentGateway):
             logging.info(f"Failed to connect to MQTT broker with code: {rc}")
 
     def on_message(self, client, userdata, msg):
-        """Processing agent data and sent it to hub gateway"""
-        try:
-            payload: str = msg.payload.decode("utf-8")
-            # Create AgentData instance with the received data
-            agent_data = AgentData.model_validate_json(payload, strict=True)
-            # Process the received data (you can call a use case here if needed)
-            processed_data = process_agent_data(agent_data)
-            # Store the agent_data in the database (you can send it to the data processing module)
-            if not self.hub_gateway.save_data(processed_data):
-                logging.error("Hub is not available")
-        except Exception as e:
-            logging.info(f"Error processing MQTT message: {e}")
+        """Buffer agent data until the batch is ready to be processed"""
+        self.batcher.add(msg.payload)
+
+    def process_batch(self, payloads: List[bytes]) -> Union[bool, int]:
+        """
+        Processing a batch of agent data and sent it to hub gateway.
+        Returns False when the hub is not available, otherwise the number of invalid payloads that were skipped.
+        """
+        if self.road_state_detector is not None:
+            # The baselines live in this process, only the validation can be moved to the worker processes
+            if self.executor is not None:
+                agent_data_batch = self.executor.submit(validate_batch, payloads).result()
+            else:
+                agent_data_batch = validate_batch(payloads)
+            processed_data_batch = self.road_state_detector.process_agent_data_batch(agent_data_batch)
+        elif self.executor is not None:
+            processed_data_batch = self.executor.submit(process_payloads, payloads).result()
+        else:
+            processed_data_batch = process_payloads(payloads)
+        invalid = len(payloads) - len(processed_data_batch)
+        if not processed_data_batch:
+            return invalid
+        if not self.hub_gateway.save_batch(processed_data_batch):
+            logging.error("Hub is not available")
+            return False
+        return invalid
+
+    def is_connected(self) -> bool:
+        return self.client.is_connected()
+
+    def stats(self):
+        """
+        Backpressure metrics: queue depth, processed, invalid and dropped messages and processing latency,
+        plus the hub gateway's own and the per-vehicle state of the road state detector
+        """
+        stats = self.worker_pool.stats()
+        hub_stats = getattr(self.hub_gateway, "stats", None)
+        if hub_stats is not None:
+            stats["hub"] = hub_stats()
+        if self.road_state_detector is not None:
+            stats["vehicles"] = self.road_state_detector.state.stats()
+        return stats
 
     def connect(self):
         self.client.on_connect = self.on_connect
@@ -51,10 +153,21 @@ class AgentMQTTAdapter(AgentGateway):
         self.client.connect(self.broker_host, self.broker_port, 60)
 
     def start(self):
+        self.worker_pool.start()
+        self.batcher.start()
         self.client.loop_start()
 
     def stop(self):
         self.client.loop_stop()
+        # Flush the messages received before the loop was stopped and wait until they are processed
+        self.batcher.close()
+        self.worker_pool.stop()
+        if self.executor is not None:
+            self.executor.shutdown()
+        hub_close = getattr(self.hub_gateway, "close", None)
+        if hub_close is not None:
+            hub_close()
+        logging.info(f"Agent adapter stopped: {self.stats()}")
 
 
 # Usage example:
@@ -65,12 +178,5 @@ if __name__ == "__main__":
     # Assuming you have implemented the StoreGateway and passed it to the adapter
     store_gateway = HubGateway()
     adapter = AgentMQTTAdapter(broker_host, broker_port, topic, store_gateway)
-    adapter.connect()
-    adapter.start()
-    try:
-        # Keep the adapter running in the background
-        while True:
-            pass
-    except KeyboardInterrupt:
-        adapter.stop()
-        logging.info("Adapter stopped.")
+    # Keep the adapter running in the background until SIGINT/SIGTERM
+    Runner(adapter).run()
@@ -1,14 +1,51 @@
 import logging
+import threading
+from typing import List
 
 import requests as requests
+from pydantic import TypeAdapter
+from requests.adapters import HTTPAdapter
 
 from app.entities.processed_agent_data import ProcessedAgentData
 from app.interfaces.hub_gateway import HubGateway
+from app.usecases.micro_batching import MicroBatcher
+
+processed_agent_data_list_adapter = TypeAdapter(List[ProcessedAgentData])
 
 
 class HubHttpAdapter(HubGateway):
-    def __init__(self, api_base_url):
+    """
+    Sends processed agent data to the Hub over HTTP through a keep-alive connection pool.
+    Batches go to the batch endpoint in one request. With batch_size above 1, readings passed
+    to save_data are accumulated and sent as batches too, after batch_max_age seconds at the latest.
+    Accumulated batches the Hub does not accept are logged and counted in stats().
+    """
+
+    def __init__(
+        self,
+        api_base_url,
+        pool_size: int = 10,
+        timeout: float = 5.0,
+        batch_size: int = 1,
+        batch_max_age: float = 1.0,
+    ):
         self.api_base_url = api_base_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        pool = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", pool)
+        self.session.mount("https://", pool)
+        self.session.headers["Content-Type"] = "application/json"
+        self.sent = 0
+        self.failed = 0
+        self.failed_batches = 0
+        self._lock = threading.Lock()
+        # Whether the accumulated batch the calling thread flushed failed
+        self._flush_result = threading.local()
+        self.batcher = None
+        if batch_size > 1:
+            self.batcher = MicroBatcher(self._save_accumulated, batch_size, batch_max_age)
+            self.batcher.start()
 
     def save_data(self, processed_data: ProcessedAgentData):
         """
@@ -16,14 +53,74 @@ class HubHttpAdapter(HubGateway):
         Parameters:
             processed_data (ProcessedAgentData): Processed road data to be saved.
         Returns:
-            bool: True if the data is successfully saved, False otherwise.
+            bool: True if the data is successfully saved (or accumulated for a batch), False otherwise,
+            also when the reading completed a batch the Hub did not accept.
+        """
+        if self.batcher is not None:
+            self._flush_result.failed = False
+            # A full batch is sent by this thread, on the deadline it is sent by the batcher thread
+            self.batcher.add(processed_data)
+            return not self._flush_result.failed
+        return self._post("/processed_agent_data/", processed_data.model_dump_json(), 1)
+
+    def save_batch(self, processed_data_batch: List[ProcessedAgentData]) -> bool:
+        """
+        Save a batch of processed road data to the Hub in a single request.
+        Returns:
+            bool: True if the whole batch is successfully saved, False otherwise.
         """
-        url = f"{self.api_base_url}/processed_agent_data/"
+        if not processed_data_batch:
+            return True
+        return self._post(
+            "/processed_agent_data/batch/",
+            processed_agent_data_list_adapter.dump_json(processed_data_batch),
+            len(processed_data_batch),
+        )
+
+    def _save_accumulated(self, processed_data_batch: List[ProcessedAgentData]):
+        try:
+            saved = self.save_batch(processed_data_batch)
+        except Exception as e:
+            logging.error(f"Error sending {len(processed_data_batch)} readings to Hub: {e}")
+            saved = False
+        if not saved:
+            self._flush_result.failed = True
+            with self._lock:
+                self.failed_batches += 1
+            logging.error(f"Accumulated batch of {len(processed_data_batch)} readings was not saved by Hub")
 
-        response = requests.post(url, data=processed_data.model_dump_json())
-        if response.status_code != 200:
+    def _post(self, path: str, body, readings: int) -> bool:
+        try:
+            response = self.session.post(
+                f"{self.api_base_url}{path}", data=body, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            logging.error(f"Error sending {readings} readings to Hub: {e}")
+            response = None
+        if response is not None and response.status_code != 200:
             logging.info(
-                f"Invalid Hub response\nData: {processed_data.model_dump_json()}\nResponse: {response}"
+                f"Invalid Hub response for {readings} readings\nResponse: {response}"
             )
-            return False
-        return True
+        saved = response is not None and response.status_code == 200
+        with self._lock:
+            if saved:
+                self.sent += readings
+            else:
+                self.failed += readings
+        return saved
+
+    def stats(self):
+        """Readings sent, readings the Hub did not accept, failed accumulated batches and readings waiting in one"""
+        with self._lock:
+            return {
+                "sent": self.sent,
+                "failed": self.failed,
+                "failed_batches": self.failed_batches,
+                "buffered": len(self.batcher) if self.batcher is not None else 0,
+            }
+
+    def close(self):
+        """Send the accumulated readings and close the connection pool"""
+        if self.batcher is not None:
+            self.batcher.close()
+        self.session.close()
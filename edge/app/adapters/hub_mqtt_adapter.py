@@ -1,18 +1,49 @@
 import logging
+import threading
+from typing import List
 
-import requests as requests
 from paho.mqtt import client as mqtt_client
+from pydantic import TypeAdapter
 
 from app.entities.processed_agent_data import ProcessedAgentData
 from app.interfaces.hub_gateway import HubGateway
 
+processed_agent_data_list_adapter = TypeAdapter(List[ProcessedAgentData])
+
 
 class HubMqttAdapter(HubGateway):
-    def __init__(self, broker, port, topic):
+    """
+    Publishes processed agent data to the Hub over MQTT.
+    With batch_publish a whole batch travels as one message holding a JSON array.
+    Delivery is tracked through on_publish: for QoS 1 and 2 a message counts as delivered once the broker acknowledged it.
+    """
+
+    def __init__(
+        self,
+        broker,
+        port,
+        topic,
+        qos: int = 0,
+        max_inflight: int = 20,
+        max_queued: int = 1000,
+        batch_publish: bool = True,
+    ):
         self.broker = broker
         self.port = port
         self.topic = topic
+        self.qos = qos
+        self.batch_publish = batch_publish
+        self.published = 0
+        self.delivered = 0
+        self.failed = 0
+        self._unconfirmed = {}
+        self._early_confirmed = set()
+        self._lock = threading.Lock()
         self.mqtt_client = self._connect_mqtt(broker, port)
+        # In-flight QoS 1/2 messages waiting for an acknowledgement, and messages queued behind them
+        self.mqtt_client.max_inflight_messages_set(max_inflight)
+        self.mqtt_client.max_queued_messages_set(max_queued)
+        self.mqtt_client.on_publish = self.on_publish
 
     def save_data(self, processed_data: ProcessedAgentData):
         """
@@ -22,14 +53,57 @@ class HubMqttAdapter(HubGateway):
         Returns:
             bool: True if the data is successfully saved, False otherwise.
         """
-        msg = processed_data.model_dump_json()
-        result = self.mqtt_client.publish(self.topic, msg)
-        status = result[0]
-        if status == 0:
+        return self._publish(processed_data.model_dump_json(), 1)
+
+    def save_batch(self, processed_data_batch: List[ProcessedAgentData]) -> bool:
+        """
+        Save a batch of processed road data to the Hub in a single message.
+        Returns:
+            bool: True if the message is accepted for delivery, False otherwise.
+        """
+        if not self.batch_publish:
+            return super().save_batch(processed_data_batch)
+        if not processed_data_batch:
             return True
-        else:
-            print(f"Failed to send message to topic {self.topic}")
-            return False
+        msg = processed_agent_data_list_adapter.dump_json(processed_data_batch)
+        return self._publish(msg, len(processed_data_batch))
+
+    def _publish(self, msg, readings: int) -> bool:
+        result = self.mqtt_client.publish(self.topic, msg, qos=self.qos)
+        with self._lock:
+            if result.rc != mqtt_client.MQTT_ERR_SUCCESS:
+                self.failed += readings
+                logging.error(
+                    f"Failed to send {readings} readings to topic {self.topic}: "
+                    f"{mqtt_client.error_string(result.rc)}"
+                )
+                return False
+            self.published += readings
+            # on_publish may run on the network thread before publish() returned the mid
+            if result.mid in self._early_confirmed:
+                self._early_confirmed.discard(result.mid)
+                self.delivered += readings
+            else:
+                self._unconfirmed[result.mid] = readings
+        return True
+
+    def on_publish(self, client, userdata, mid):
+        with self._lock:
+            readings = self._unconfirmed.pop(mid, None)
+            if readings is None:
+                self._early_confirmed.add(mid)
+            else:
+                self.delivered += readings
+
+    def stats(self):
+        """Readings published, confirmed by the broker, waiting for confirmation and rejected by the client"""
+        with self._lock:
+            return {
+                "published": self.published,
+                "delivered": self.delivered,
+                "unconfirmed": sum(self._unconfirmed.values()),
+                "failed": self.failed,
+            }
 
     @staticmethod
     def _connect_mqtt(broker, port):
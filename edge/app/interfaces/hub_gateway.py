@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import List
 from app.entities.processed_agent_data import ProcessedAgentData
 
 
@@ -18,3 +19,15 @@ class HubGateway(ABC):
             bool: True if the data is successfully saved, False otherwise.
         """
         pass
+
+    def save_batch(self, processed_data_batch: List[ProcessedAgentData]) -> bool:
+        """
+        Method to save a batch of processed agent data.
+        Adapters that can transfer a batch at once should override it, by default every item is saved separately.
+        Parameters:
+            processed_data_batch (List[ProcessedAgentData]): The processed agent data to be saved.
+        Returns:
+            bool: True if the whole batch is successfully saved, False otherwise.
+        """
+        results = [self.save_data(processed_data) for processed_data in processed_data_batch]
+        return all(results)
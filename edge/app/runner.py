@@ -0,0 +1,95 @@
+import json
+import logging
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+
+from app.interfaces.agent_gateway import AgentGateway
+
+
+class HealthServer:
+    """Serves GET /health with the status returned by health_callback"""
+
+    def __init__(self, host: str, port: int, health_callback: Callable[[], Dict[str, Any]]):
+        health_callback_ = health_callback
+
+        class HealthRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/health":
+                    self.send_error(404)
+                    return
+                health = health_callback_()
+                body = json.dumps(health).encode("utf-8")
+                self.send_response(200 if health.get("status") == "ok" else 503)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug(format % args)
+
+        self.server = ThreadingHTTPServer((host, port), HealthRequestHandler)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="health-server", daemon=True
+        )
+
+    def start(self):
+        self.thread.start()
+        logging.info(f"Health endpoint listening on port {self.server.server_address[1]}")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Runner:
+    """
+    Runs an agent gateway until SIGINT or SIGTERM is received.
+    The main thread sleeps on an event instead of spinning, on shutdown the gateway is stopped
+    which drains the batches that are still in flight.
+    """
+
+    def __init__(
+        self,
+        agent_gateway: AgentGateway,
+        health_port: Optional[int] = None,
+        health_host: str = "0.0.0.0",
+    ):
+        self.agent_gateway = agent_gateway
+        self.health_port = health_port
+        self.health_host = health_host
+        self._stop_event = threading.Event()
+        self._health_server: Optional[HealthServer] = None
+
+    def health(self) -> Dict[str, Any]:
+        connected = getattr(self.agent_gateway, "is_connected", lambda: True)()
+        stats = getattr(self.agent_gateway, "stats", dict)()
+        return {
+            "status": "ok" if connected and not self._stop_event.is_set() else "unavailable",
+            "connected": connected,
+            **stats,
+        }
+
+    def stop(self, *args):
+        logging.info("Shutting down...")
+        self._stop_event.set()
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        if self.health_port:
+            self._health_server = HealthServer(self.health_host, self.health_port, self.health)
+            self._health_server.start()
+        try:
+            # Connect to the MQTT broker and start listening for messages
+            self.agent_gateway.connect()
+            self.agent_gateway.start()
+            self._stop_event.wait()
+        finally:
+            # Stop the gateway first so in-flight batches are drained before exit
+            self.agent_gateway.stop()
+            if self._health_server is not None:
+                self._health_server.stop()
+            logging.info("System stopped.")
@@ -0,0 +1,117 @@
+"""
+Streaming road state detection relative to each vehicle's own baseline.
+Every vehicle keeps an exponentially weighted mean and variance of its z acceleration and the last few
+samples for the peak-to-peak swing. A sample is scored by how far it and the recent swing are from that
+baseline in standard deviations, so mounting, orientation and suspension differences between vehicles
+do not matter the way they do for the fixed z intervals of data_processing.py.
+Each sample costs a constant amount of work and memory per vehicle, the state lives in a VehicleStateStore.
+"""
+import math
+from typing import List, Optional
+
+from app.entities.agent_data import AgentData
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.usecases.vehicle_state import VehicleStateStore
+
+
+class StreamingRoadStateDetector:
+    def __init__(
+        self,
+        alpha: float = 0.05,
+        window: int = 8,
+        warmup: int = 20,
+        small_threshold: float = 3.0,
+        large_threshold: float = 6.0,
+        min_std: float = 100.0,
+        state: Optional[VehicleStateStore] = None,
+    ):
+        """
+        Parameters:
+            alpha (float): Weight of the newest sample in the EWMA mean and variance.
+            window (int): Samples the peak-to-peak swing is measured over, unless a state store is given.
+            warmup (int): Samples of a vehicle classified as "normal" while its baseline settles.
+            small_threshold (float): Deviation in standard deviations from which a sample is an anomaly.
+            large_threshold (float): Deviation in standard deviations from which a pit is a large one.
+            min_std (float): Floor of the standard deviation, so a very smooth ride does not flag sensor noise.
+            state (VehicleStateStore): Per-vehicle state, its window is the peak-to-peak window.
+        """
+        self.state = state if state is not None else VehicleStateStore(window=window)
+        self.alpha = alpha
+        self.warmup = warmup
+        self.small_threshold = small_threshold
+        self.large_threshold = large_threshold
+        self.min_std = min_std
+
+    def __len__(self):
+        return len(self.state)
+
+    def _classify(self, slot: int, z: float) -> str:
+        state = self.state
+        window = state.window
+        count = state.count[slot]
+        start = slot * window
+        state.recent[start + count % window] = z
+        count += 1
+        state.count[slot] = count
+        if count == 1:
+            state.mean[slot] = z
+            return "normal"
+        mean = state.mean[slot]
+        variance = state.variance[slot]
+        std = max(math.sqrt(variance), self.min_std)
+        deviation = z - mean
+        score = abs(deviation) / std
+
+        # Outliers move the baseline by at most the large threshold, so one hit does not hide the next ones
+        # while a lasting change, such as the phone being turned over, is still followed
+        limit = self.large_threshold * std
+        clamped = min(max(deviation, -limit), limit)
+        state.mean[slot] = mean + self.alpha * clamped
+        state.variance[slot] = (1 - self.alpha) * (variance + self.alpha * clamped * clamped)
+
+        # Only a sample that is an anomaly itself is flagged, an earlier hit still in the window is not
+        if count <= self.warmup or score < self.small_threshold:
+            return "normal"
+        # A swing of twice the amplitude between the extremes of the window counts as much as one deviation,
+        # so the rebound of a pit is graded together with its drop
+        recent = state.recent[start:start + min(count, window)]
+        low, high = min(recent), max(recent)
+        severity = max(score, (high - low) / (2 * std))
+        # The direction is taken from the extreme farthest from the baseline, the drop of a pit rather than its rebound.
+        # Gravity lies along the baseline: a pit lightens the vehicle first, a bump pushes it up
+        extreme = high - mean if high - mean > mean - low else low - mean
+        if extreme * mean > 0:
+            return "bumps"
+        return "large pits" if severity >= self.large_threshold else "small pits"
+
+    def classify(self, user_id: int, z: float) -> str:
+        """Classify one z acceleration sample of a vehicle and update its baseline"""
+        with self.state.lock:
+            return self._classify(self.state.slot(user_id), z)
+
+    def process_agent_data_batch(
+        self, agent_data_batch: List[AgentData]
+    ) -> List[ProcessedAgentData]:
+        """
+        Classify a batch of agent data, samples of every vehicle are expected in the order they were taken,
+        so the batches holding a vehicle must be passed in the order they were received, by one worker at a time.
+        The last GPS fix and timestamp of every vehicle are recorded in the state store.
+        Parameters:
+            agent_data_batch (List[AgentData]): Agent data readings of any number of vehicles.
+        Returns:
+            processed_data_batch (List[ProcessedAgentData]): Processed data in the same order as the input.
+        """
+        processed_data_batch = []
+        state = self.state
+        with state.lock:
+            state.expire()
+            for agent_data in agent_data_batch:
+                slot = state.slot(agent_data.user_id)
+                road_state = self._classify(slot, agent_data.accelerometer.z)
+                state.latitude[slot] = agent_data.gps.latitude
+                state.longitude[slot] = agent_data.gps.longitude
+                state.timestamp[slot] = agent_data.timestamp.timestamp()
+                processed_data_batch.append(
+                    ProcessedAgentData(road_state=road_state, agent_data=agent_data)
+                )
+        return processed_data_batch
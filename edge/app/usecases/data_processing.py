@@ -1,21 +1,78 @@
+from typing import List
+
+import numpy as np
+
 from app.entities.agent_data import AgentData
 from app.entities.processed_agent_data import ProcessedAgentData
 
 interval = {
     "normal": {
-        "start": 14000, 
+        "start": 14000,
         "end": 18000
         },
     "less": {
-        "start": 12000, 
+        "start": 12000,
         "end": 14000
         },
     "greater": {
-        "start": 18000, 
+        "start": 18000,
         "end": 20000
         }
 }
 
+ROAD_STATES = np.array(["normal", "small pits", "large pits"], dtype=object)
+
+
+def classify_road_state_batch(z_acceleration: np.ndarray) -> np.ndarray:
+    """
+    Classify the state of the road surface for a whole window of readings at once.
+    Parameters:
+        z_acceleration (np.ndarray): Either a 1-D array of z-axis values or a 2-D (N, 3) array of x/y/z columns.
+    Returns:
+        road_states (np.ndarray): Array of road state names, one per reading.
+    """
+    z_acceleration = np.asarray(z_acceleration, dtype=np.float64)
+    if z_acceleration.ndim == 2:
+        z_acceleration = z_acceleration[:, 2]
+
+    normal = (interval["normal"]["start"] < z_acceleration) & (
+        z_acceleration < interval["normal"]["end"]
+    )
+    small_pits = (
+        (interval["less"]["start"] < z_acceleration)
+        & (z_acceleration < interval["less"]["end"])
+    ) | (
+        (interval["greater"]["start"] < z_acceleration)
+        & (z_acceleration < interval["greater"]["end"])
+    )
+    # Index 2 ("large pits") is the fallback, the first matching condition wins
+    state_index = np.where(normal, 0, np.where(small_pits, 1, 2))
+    return ROAD_STATES[state_index]
+
+
+def process_agent_data_batch(
+    agent_data_batch: List[AgentData],
+) -> List[ProcessedAgentData]:
+    """
+    Process a batch of agent data and classify the state of the road surface in one vectorized pass.
+    Parameters:
+        agent_data_batch (List[AgentData]): Agent data readings that containing accelerometer, GPS, and timestamp.
+    Returns:
+        processed_data_batch (List[ProcessedAgentData]): Processed data in the same order as the input.
+    """
+    if not agent_data_batch:
+        return []
+    z_acceleration = np.fromiter(
+        (agent_data.accelerometer.z for agent_data in agent_data_batch),
+        dtype=np.float64,
+        count=len(agent_data_batch),
+    )
+    road_states = classify_road_state_batch(z_acceleration)
+    return [
+        ProcessedAgentData(road_state=road_state, agent_data=agent_data)
+        for road_state, agent_data in zip(road_states, agent_data_batch)
+    ]
+
 
 def process_agent_data(
     agent_data: AgentData,
@@ -27,13 +84,4 @@ def process_agent_data(
     Returns:
         processed_data_batch (ProcessedAgentData): Processed data containing the classified state of the road surface and agent data.
     """
-    # Assuming classification logic based on accelerometer z-axis value ranges
-    z_acceleration = agent_data.accelerometer.z
-
-    if interval["normal"]["start"] < z_acceleration < interval["normal"]["end"]:
-        road_state = "normal"
-    elif interval["less"]["start"] < z_acceleration < interval["less"]["end"] or interval["greater"]["start"] > z_acceleration < interval["greater"]["end"]:
-        road_state = "small pits"
-    else:
-        road_state = "large pits"
-    return ProcessedAgentData(road_state=road_state, agent_data=agent_data)
\ No newline at end of file
+    return process_agent_data_batch([agent_data])[0]
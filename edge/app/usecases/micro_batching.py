@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+
+class MicroBatcher:
+    """
+    Buffers incoming items and hands them over in batches.
+    A batch is flushed as soon as it holds batch_size items or when its oldest item is max_age seconds old.
+    Batches are handed over one at a time in the order the items were added.
+    """
+
+    def __init__(
+        self,
+        flush_callback: Callable[[List[Any]], None],
+        batch_size: int,
+        max_age: float,
+    ):
+        self.flush_callback = flush_callback
+        self.batch_size = max(1, batch_size)
+        self.max_age = max_age
+        self._items: List[Any] = []
+        self._first_item_at: Optional[float] = None
+        self._condition = threading.Condition()
+        # Held from taking a batch until it is handed over, so a later batch never overtakes it
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="micro-batcher", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def add(self, item: Any):
+        with self._condition:
+            self._items.append(item)
+            if self._first_item_at is None:
+                self._first_item_at = time.monotonic()
+                self._condition.notify()
+            full = len(self._items) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Hand over everything buffered so far regardless of size and age"""
+        with self._flush_lock:
+            with self._condition:
+                batch = self._take()
+            if batch:
+                self._flush(batch)
+
+    def close(self):
+        """Stop the deadline thread and flush the remaining items"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.flush()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._items)
+
+    def _take(self) -> List[Any]:
+        batch, self._items = self._items, []
+        self._first_item_at = None
+        return batch
+
+    def _flush(self, batch: List[Any]):
+        try:
+            self.flush_callback(batch)
+        except Exception as e:
+            logging.error(f"Error flushing batch of {len(batch)} items: {e}")
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and self._first_item_at is None:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                remaining = self._first_item_at + self.max_age - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+            self.flush()
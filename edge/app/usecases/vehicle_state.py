@@ -0,0 +1,142 @@
+"""
+Compact per-vehicle state for stateful edge processing.
+Every vehicle gets a slot, an index into flat typed arrays holding its rolling statistics, the last
+samples of its z acceleration, its last GPS fix and the time of its last reading. A vehicle takes
+8 bytes per field instead of a Python object per vehicle, and the slots of evicted vehicles are reused.
+Vehicles not seen for ttl seconds expire, and when every slot is taken the least recently seen vehicle
+is evicted, so memory stays under the configured cap whatever the number of vehicles.
+"""
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# Memory of one entry of the user_id index, an OrderedDict of int keys and values, measured with tracemalloc
+INDEX_BYTES_PER_ENTRY = 170
+# count, mean, variance, latitude, longitude, timestamp and last_seen
+FIELDS_PER_ENTRY = 7
+
+
+class VehicleStateStore:
+    def __init__(
+        self,
+        window: int = 8,
+        max_entries: int = 100_000,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Parameters:
+            window (int): Recent z acceleration samples kept per vehicle.
+            max_entries (int): Vehicles kept at most.
+            max_bytes (int): Memory cap, lowers max_entries to the vehicles that fit in it.
+            ttl (float): Seconds after the last reading of a vehicle when its state is dropped, None keeps it.
+            clock: Time source of the TTL, in seconds.
+        """
+        self.window = max(1, window)
+        self.entry_bytes = (FIELDS_PER_ENTRY + self.window) * 8 + INDEX_BYTES_PER_ENTRY
+        self.capacity = max(1, max_entries)
+        if max_bytes is not None:
+            self.capacity = max(1, min(self.capacity, max_bytes // self.entry_bytes))
+        self.ttl = ttl
+        self.clock = clock
+        # The fields of the vehicle in slot i are at index i, its recent samples at i * window onwards
+        self.count = array("q")
+        self.mean = array("d")
+        self.variance = array("d")
+        self.latitude = array("d")
+        self.longitude = array("d")
+        self.timestamp = array("d")
+        self.last_seen = array("d")
+        self.recent = array("d")
+        # user_id -> slot, least recently seen first
+        self._slots: "OrderedDict[int, int]" = OrderedDict()
+        self._free = []
+        self.evictions = 0
+        self.expirations = 0
+        # Callers hold the lock while they work on the slot they got
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, user_id: int):
+        return user_id in self._slots
+
+    def _expired(self, slot: int, now: float) -> bool:
+        return self.ttl is not None and now - self.last_seen[slot] > self.ttl
+
+    def _release(self, user_id: int):
+        self._free.append(self._slots.pop(user_id))
+
+    def _reset(self, slot: int, now: float):
+        self.count[slot] = 0
+        self.mean[slot] = self.variance[slot] = 0.0
+        self.latitude[slot] = self.longitude[slot] = self.timestamp[slot] = 0.0
+        self.last_seen[slot] = now
+
+    def _allocate(self, now: float) -> int:
+        self.expire(now)
+        if not self._free and len(self._slots) >= self.capacity:
+            self._release(next(iter(self._slots)))
+            self.evictions += 1
+        if self._free:
+            return self._free.pop()
+        slot = len(self.count)
+        for field in (
+            self.count, self.mean, self.variance, self.latitude, self.longitude, self.timestamp, self.last_seen
+        ):
+            field.append(0)
+        self.recent.extend([0.0] * self.window)
+        return slot
+
+    def slot(self, user_id: int) -> int:
+        """
+        The slot of a vehicle, marked as seen now. A vehicle that is new or whose state expired
+        gets a reset slot, with count 0.
+        """
+        now = self.clock()
+        with self.lock:
+            slot = self._slots.get(user_id)
+            if slot is not None:
+                self._slots.move_to_end(user_id)
+                if self._expired(slot, now):
+                    self.expirations += 1
+                    self._reset(slot, now)
+                else:
+                    self.last_seen[slot] = now
+                return slot
+            slot = self._allocate(now)
+            self._slots[user_id] = slot
+            self._reset(slot, now)
+            return slot
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Drop the vehicles not seen for ttl seconds, returns how many were dropped"""
+        if self.ttl is None:
+            return 0
+        now = self.clock() if now is None else now
+        expired = 0
+        with self.lock:
+            # The index is ordered by last reading, so the expired vehicles are at its start
+            for slot in self._slots.values():
+                if not self._expired(slot, now):
+                    break
+                expired += 1
+            for _ in range(expired):
+                self._release(next(iter(self._slots)))
+            self.expirations += expired
+        return expired
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "entries": len(self._slots),
+                "capacity": self.capacity,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "bytes": len(self.count) * (self.entry_bytes - INDEX_BYTES_PER_ENTRY)
+                + len(self._slots) * INDEX_BYTES_PER_ENTRY,
+            }
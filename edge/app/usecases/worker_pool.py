@@ -0,0 +1,139 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+
+class WorkerPoolMetrics:
+    """Backpressure metrics of the worker pool, safe to read from any thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.invalid = 0
+        self.failed = 0
+        self.dropped = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._total_latency = 0.0
+        self._batches = 0
+
+    def record(self, count: int, latency: float, success: bool, invalid: int = 0):
+        with self._lock:
+            if success:
+                self.processed += count - invalid
+                self.invalid += invalid
+            else:
+                self.failed += count
+            self._batches += 1
+            self._total_latency += latency
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def record_drop(self, count: int):
+        with self._lock:
+            self.dropped += count
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "processed": self.processed,
+                "invalid": self.invalid,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "last_latency": self.last_latency,
+                "max_latency": self.max_latency,
+                "avg_latency": self._total_latency / self._batches if self._batches else 0.0,
+            }
+
+
+class WorkerPool:
+    """
+    Bounded queue of batches processed by a pool of worker threads.
+    Submitting never blocks the caller: when the queue is full the batch is dropped and counted.
+    Latency is measured from submitting a batch until its handler returns.
+    With a shard key every worker has its own queue and a batch is split between them by the key of its items,
+    so the items of one key are handled by one worker in the order they were submitted.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], Union[bool, int, None]],
+        workers: int = 1,
+        queue_size: int = 100,
+        shard_key: Optional[Callable[[Any], int]] = None,
+    ):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.shard_key = shard_key
+        if shard_key is None:
+            self.queues = [queue.Queue(maxsize=max(1, queue_size))]
+        else:
+            # The queue size is shared between the workers
+            self.queues = [
+                queue.Queue(maxsize=max(1, queue_size // self.workers)) for _ in range(self.workers)
+            ]
+        self.metrics = WorkerPoolMetrics()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, args=(self.queues[i % len(self.queues)],), name=f"edge-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, batch: List[Any]) -> bool:
+        if self.shard_key is None:
+            return self._put(self.queues[0], batch)
+        shards = [[] for _ in self.queues]
+        for item in batch:
+            shards[self.shard_key(item) % len(shards)].append(item)
+        submitted = True
+        for shard_queue, shard in zip(self.queues, shards):
+            if shard:
+                submitted = self._put(shard_queue, shard) and submitted
+        return submitted
+
+    def stop(self):
+        """Wait until every queued batch is processed and stop the workers"""
+        for i in range(len(self._threads)):
+            self.queues[i % len(self.queues)].put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def queue_depth(self) -> int:
+        return sum(worker_queue.qsize() for worker_queue in self.queues)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"queue_depth": self.queue_depth(), **self.metrics.snapshot()}
+
+    def _put(self, worker_queue: queue.Queue, batch: List[Any]) -> bool:
+        try:
+            worker_queue.put_nowait((time.monotonic(), batch))
+            return True
+        except queue.Full:
+            self.metrics.record_drop(len(batch))
+            logging.warning(f"Worker queue is full, dropped batch of {len(batch)} messages")
+            return False
+
+    def _run(self, worker_queue: queue.Queue):
+        while True:
+            item = worker_queue.get()
+            if item is None:
+                break
+            submitted_at, batch = item
+            invalid = 0
+            try:
+                # A handler may return False to report a failed batch, or the number of invalid items it skipped
+                result = self.handler(batch)
+                success = result is not False
+                if type(result) is int:
+                    invalid = result
+            except Exception as e:
+                success = False
+                logging.error(f"Error processing batch of {len(batch)} messages: {e}")
+            self.metrics.record(len(batch), time.monotonic() - submitted_at, success, invalid)
@@ -0,0 +1,68 @@
+"""
+Throughput of the streaming road state detector with many concurrent vehicles, against the fixed
+z intervals, and the road states both give for the agent recording.
+Run from the edge directory:
+    python -m benchmarks.bench_anomaly_detection
+"""
+import os
+import time
+from collections import Counter
+
+import numpy as np
+
+from app.usecases.anomaly_detection import StreamingRoadStateDetector
+from app.usecases.data_processing import classify_road_state_batch, process_agent_data_batch
+from benchmarks.bench_data_processing import make_agent_data
+
+VEHICLES = (1, 1_000, 10_000)
+READINGS = 200_000
+# Readings are materialized as AgentData in windows to keep memory bounded
+WINDOW = 10_000
+RECORDING = os.path.join(
+    os.path.dirname(__file__), "..", "..", "agent", "src", "data", "accelerometer.csv"
+)
+
+
+def bench(vehicles, process):
+    rng = np.random.default_rng(0)
+    elapsed = 0.0
+    for start in range(0, READINGS, WINDOW):
+        window = make_agent_data(rng.normal(16500, 300, WINDOW))
+        # Interleave the vehicles as their messages arrive at the edge
+        for i, agent_data in enumerate(window):
+            agent_data.user_id = (start + i) % vehicles
+        started_at = time.perf_counter()
+        process(window)
+        elapsed += time.perf_counter() - started_at
+    return elapsed
+
+
+def compare_on_recording():
+    z_values = np.loadtxt(RECORDING, delimiter=",", skiprows=1, usecols=2)
+    detector = StreamingRoadStateDetector()
+    streaming = Counter(detector.classify(1, z) for z in z_values.tolist())
+    interval = Counter(classify_road_state_batch(z_values).tolist())
+    print(f"\nroad states of {len(z_values)} recorded readings")
+    for state in ("normal", "small pits", "large pits", "bumps"):
+        print(f"{state:<12} interval {interval[state]:>6} streaming {streaming[state]:>6}")
+
+
+def main():
+    print(f"{'vehicles':>10} {'path':<12} {'messages/sec':>14} {'us/message':>11}")
+    for vehicles in VEHICLES:
+        detector = StreamingRoadStateDetector()
+        results = {
+            "interval": bench(vehicles, process_agent_data_batch),
+            "streaming": bench(vehicles, detector.process_agent_data_batch),
+        }
+        for path, elapsed in results.items():
+            print(
+                f"{vehicles:>10} {path:<12} {READINGS / elapsed:>14,.0f} "
+                f"{elapsed / READINGS * 1e6:>11.2f}"
+            )
+    if os.path.exists(RECORDING):
+        compare_on_recording()
+
+
+if __name__ == "__main__":
+    main()
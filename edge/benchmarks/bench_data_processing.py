@@ -0,0 +1,72 @@
+"""
+Compare the per-message and the vectorized road state classification.
+Run from the edge directory:
+    python -m benchmarks.bench_data_processing
+"""
+import time
+from datetime import datetime
+
+import numpy as np
+
+from app.entities.agent_data import AccelerometerData, AgentData, GpsData
+from app.usecases.data_processing import (
+    classify_road_state_batch,
+    process_agent_data,
+    process_agent_data_batch,
+)
+
+SIZES = (1_000, 100_000, 1_000_000)
+# Readings are materialized as AgentData in windows to keep memory bounded
+WINDOW = 10_000
+
+
+def make_agent_data(z_values):
+    timestamp = datetime.now()
+    return [
+        AgentData(
+            user_id=1,
+            accelerometer=AccelerometerData(x=0, y=0, z=z),
+            gps=GpsData(latitude=50.45, longitude=30.52),
+            timestamp=timestamp,
+        )
+        for z in z_values.tolist()
+    ]
+
+
+def bench_models(z_values, process):
+    elapsed = 0.0
+    for start in range(0, len(z_values), WINDOW):
+        window = make_agent_data(z_values[start:start + WINDOW])
+        started_at = time.perf_counter()
+        process(window)
+        elapsed += time.perf_counter() - started_at
+    return elapsed
+
+
+def per_message(window):
+    for agent_data in window:
+        process_agent_data(agent_data)
+
+
+def bench_vectorized(z_values):
+    started_at = time.perf_counter()
+    classify_road_state_batch(z_values)
+    return time.perf_counter() - started_at
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'readings':>10} {'path':<24} {'messages/sec':>14}")
+    for size in SIZES:
+        z_values = rng.normal(16500, 2500, size)
+        results = {
+            "per-message": bench_models(z_values, per_message),
+            "batch (AgentData)": bench_models(z_values, process_agent_data_batch),
+            "vectorized (z array)": bench_vectorized(z_values),
+        }
+        for path, elapsed in results.items():
+            print(f"{size:>10} {path:<24} {size / elapsed:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
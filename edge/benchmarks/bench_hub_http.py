@@ -0,0 +1,78 @@
+"""
+Readings/sec delivered by the HTTP hub transport against a local HTTP/1.1 server that answers 200 to everything.
+Compares the previous requests.post per reading with the pooled session, one reading and one batch per request.
+Run from the edge directory:
+    python -m benchmarks.bench_hub_http
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from app.adapters.hub_http_adapter import HubHttpAdapter
+from app.entities.agent_data import AccelerometerData, AgentData, GpsData
+from app.entities.processed_agent_data import ProcessedAgentData
+
+READINGS = 2_000
+BATCH_SIZE = 100
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    reading = ProcessedAgentData(
+        road_state="normal",
+        agent_data=AgentData(
+            user_id=1,
+            accelerometer=AccelerometerData(x=1.0, y=2.0, z=16000.0),
+            gps=GpsData(latitude=50.45, longitude=30.52),
+            timestamp="2024-03-01T12:34:56",
+        ),
+    )
+    adapter = HubHttpAdapter(url)
+
+    def per_reading_without_session():
+        for _ in range(READINGS):
+            requests.post(f"{url}/processed_agent_data/", data=reading.model_dump_json())
+
+    def per_reading_with_session():
+        for _ in range(READINGS):
+            adapter.save_data(reading)
+
+    def batches_with_session():
+        for _ in range(READINGS // BATCH_SIZE):
+            adapter.save_batch([reading] * BATCH_SIZE)
+
+    print(f"{READINGS:,} readings")
+    print(f"{'transport':<36} {'readings/sec':>14}")
+    for name, bench in (
+        ("requests.post per reading", per_reading_without_session),
+        ("session, one reading per request", per_reading_with_session),
+        (f"session, {BATCH_SIZE} readings per request", batches_with_session),
+    ):
+        started_at = time.perf_counter()
+        bench()
+        print(f"{name:<36} {READINGS / (time.perf_counter() - started_at):>14,.0f}")
+    adapter.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Throughput of the edge ingestion path with and without micro-batching.
+Messages are fed straight into AgentMQTTAdapter.on_message and published to an in-process fake hub.
+Run from the edge directory:
+    python -m benchmarks.bench_micro_batching
+"""
+import json
+import time
+from types import SimpleNamespace
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
+from app.entities.agent_data import AgentData
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.interfaces.hub_gateway import HubGateway
+from app.usecases.data_processing import process_agent_data
+
+MESSAGES = 100_000
+BATCH_SIZES = (10, 100, 1000)
+
+processed_data_list_adapter = TypeAdapter(List[ProcessedAgentData])
+
+
+class FakeHubGateway(HubGateway):
+    """Serializes the data like the MQTT hub adapter and counts publishes"""
+
+    def __init__(self):
+        self.publishes = 0
+
+    def save_data(self, processed_data: ProcessedAgentData) -> bool:
+        processed_data.model_dump_json()
+        self.publishes += 1
+        return True
+
+    def save_batch(self, processed_data_batch: List[ProcessedAgentData]) -> bool:
+        processed_data_list_adapter.dump_json(processed_data_batch)
+        self.publishes += 1
+        return True
+
+
+def make_messages(count):
+    return [
+        SimpleNamespace(
+            payload=json.dumps(
+                {
+                    "user_id": 1,
+                    "accelerometer": {"x": 100, "y": 200, "z": 14000 + i % 6000},
+                    "gps": {"latitude": 50.45, "longitude": 30.52},
+                    "timestamp": "2024-03-01T12:34:56",
+                }
+            ).encode("utf-8")
+        )
+        for i in range(count)
+    ]
+
+
+def bench_per_message(messages, hub_gateway):
+    """The ingestion path before micro-batching"""
+    started_at = time.perf_counter()
+    for msg in messages:
+        agent_data = AgentData.model_validate_json(msg.payload.decode("utf-8"), strict=True)
+        hub_gateway.save_data(process_agent_data(agent_data))
+    return time.perf_counter() - started_at
+
+
+def bench_batched(messages, hub_gateway, batch_size):
+    adapter = AgentMQTTAdapter(
+        "localhost",
+        1883,
+        "agent_data_topic",
+        hub_gateway,
+        batch_size=batch_size,
+        queue_size=len(messages),
+    )
+    adapter.worker_pool.start()
+    started_at = time.perf_counter()
+    for msg in messages:
+        adapter.on_message(None, None, msg)
+    adapter.batcher.flush()
+    adapter.worker_pool.stop()
+    return time.perf_counter() - started_at
+
+
+def main():
+    messages = make_messages(MESSAGES)
+    print(f"{'mode':<16} {'messages/sec':>14} {'hub publishes':>14}")
+    hub_gateway = FakeHubGateway()
+    elapsed = bench_per_message(messages, hub_gateway)
+    print(f"{'per-message':<16} {MESSAGES / elapsed:>14,.0f} {hub_gateway.publishes:>14,}")
+    for batch_size in BATCH_SIZES:
+        hub_gateway = FakeHubGateway()
+        elapsed = bench_batched(messages, hub_gateway, batch_size)
+        print(
+            f"{f'batch={batch_size}':<16} {MESSAGES / elapsed:>14,.0f} {hub_gateway.publishes:>14,}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Memory and lookup cost of the per-vehicle state: VehicleStateStore against a dict of pydantic models
+holding the same fields. Run from the edge directory:
+    python -m benchmarks.bench_vehicle_state
+"""
+import time
+import tracemalloc
+from typing import List
+
+from pydantic import BaseModel
+
+from app.usecases.vehicle_state import VehicleStateStore
+
+VEHICLES = (10_000, 50_000)
+WINDOW = 8
+LOOKUPS = 1_000_000
+
+
+class VehicleState(BaseModel):
+    count: int = 0
+    mean: float = 0.0
+    variance: float = 0.0
+    latitude: float = 0.0
+    longitude: float = 0.0
+    timestamp: float = 0.0
+    last_seen: float = 0.0
+    recent: List[float] = []
+
+
+def build_models(vehicles):
+    return {user_id: VehicleState(recent=[0.0] * WINDOW) for user_id in range(vehicles)}
+
+
+def build_store(vehicles):
+    store = VehicleStateStore(window=WINDOW, max_entries=vehicles)
+    for user_id in range(vehicles):
+        store.slot(user_id)
+    return store
+
+
+def measure_memory(build, vehicles):
+    tracemalloc.start()
+    state = build(vehicles)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return state, size
+
+
+def bench_models(models, vehicles):
+    started_at = time.perf_counter()
+    for i in range(LOOKUPS):
+        state = models[i % vehicles]
+        state.count += 1
+        state.mean += 1.0
+    return time.perf_counter() - started_at
+
+
+def bench_store(store, vehicles):
+    started_at = time.perf_counter()
+    for i in range(LOOKUPS):
+        slot = store.slot(i % vehicles)
+        store.count[slot] += 1
+        store.mean[slot] += 1.0
+    return time.perf_counter() - started_at
+
+
+def main():
+    print(f"{'vehicles':>10} {'state':<16} {'bytes/vehicle':>14} {'us/update':>10}")
+    for vehicles in VEHICLES:
+        models, models_size = measure_memory(build_models, vehicles)
+        store, store_size = measure_memory(build_store, vehicles)
+        results = {
+            "pydantic dict": (models_size, bench_models(models, vehicles)),
+            "state store": (store_size, bench_store(store, vehicles)),
+        }
+        for name, (size, elapsed) in results.items():
+            print(f"{vehicles:>10} {name:<16} {size / vehicles:>14,.0f} {elapsed / LOOKUPS * 1e6:>10.2f}")
+        print(f"{'':>10} store metrics: {store.stats()}")
+
+
+if __name__ == "__main__":
+    main()
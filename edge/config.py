@@ -1,11 +1,18 @@
 import os
 
 
-def try_parse_int(value: str):
+def try_parse_int(value: str, default=None):
     try:
         return int(value)
     except Exception:
-        return None
+        return default
+
+
+def try_parse_float(value: str, default=None):
+    try:
+        return float(value)
+    except Exception:
+        return default
 
 
 # Configuration for agent MQTT
@@ -17,8 +24,50 @@ MQTT_TOPIC = os.environ.get("MQTT_TOPIC") or "agent_data_topic"
 HUB_MQTT_BROKER_HOST = os.environ.get("HUB_MQTT_BROKER_HOST") or "localhost"
 HUB_MQTT_BROKER_PORT = try_parse_int(os.environ.get("HUB_MQTT_BROKER_PORT")) or 1883
 HUB_MQTT_TOPIC = os.environ.get("HUB_MQTT_TOPIC") or "processed_agent_data_topic"
+HUB_MQTT_QOS = try_parse_int(os.environ.get("HUB_MQTT_QOS")) or 0
+# Unacknowledged QoS 1/2 messages in flight, and messages queued behind them before publishing fails,
+# 0 is unlimited
+HUB_MQTT_MAX_INFLIGHT = try_parse_int(os.environ.get("HUB_MQTT_MAX_INFLIGHT"), 20)
+HUB_MQTT_MAX_QUEUED = try_parse_int(os.environ.get("HUB_MQTT_MAX_QUEUED"), 1000)
+# Set HUB_MQTT_BATCH_PUBLISH=0 to publish one message per reading
+HUB_MQTT_BATCH_PUBLISH = os.environ.get("HUB_MQTT_BATCH_PUBLISH") != "0"
 
 # Configuration for the Hub
 HUB_HOST = os.environ.get("HUB_HOST") or "localhost"
 HUB_PORT = try_parse_int(os.environ.get("HUB_PORT")) or 12000
 HUB_URL = f"http://{HUB_HOST}:{HUB_PORT}"
+# "mqtt" or "http"
+HUB_TRANSPORT = os.environ.get("HUB_TRANSPORT") or "mqtt"
+HUB_HTTP_POOL_SIZE = try_parse_int(os.environ.get("HUB_HTTP_POOL_SIZE")) or 10
+HUB_HTTP_TIMEOUT = try_parse_float(os.environ.get("HUB_HTTP_TIMEOUT")) or 5.0
+# Readings passed one by one are accumulated into batches of this size, 1 sends them right away
+HUB_HTTP_BATCH_SIZE = try_parse_int(os.environ.get("HUB_HTTP_BATCH_SIZE")) or 1
+
+# Configuration for agent data micro-batching
+BATCH_SIZE = try_parse_int(os.environ.get("BATCH_SIZE")) or 10
+BATCH_MAX_AGE = try_parse_float(os.environ.get("BATCH_MAX_AGE")) or 1.0
+
+# Configuration for the edge worker pool
+WORKERS = try_parse_int(os.environ.get("WORKERS")) or 1
+# "thread" or "process"
+WORKER_KIND = os.environ.get("WORKER_KIND") or "thread"
+QUEUE_SIZE = try_parse_int(os.environ.get("QUEUE_SIZE")) or 100
+
+# Road state classification: "streaming" against per-vehicle baselines or "interval" for the fixed z ranges.
+# The streaming detector needs the samples of a vehicle in order, so the workers are sharded by user_id
+ROAD_STATE_DETECTOR = os.environ.get("ROAD_STATE_DETECTOR") or "streaming"
+DETECTOR_ALPHA = try_parse_float(os.environ.get("DETECTOR_ALPHA")) or 0.05
+DETECTOR_WINDOW = try_parse_int(os.environ.get("DETECTOR_WINDOW")) or 8
+DETECTOR_WARMUP = try_parse_int(os.environ.get("DETECTOR_WARMUP")) or 20
+# Deviations from the baseline in standard deviations
+DETECTOR_SMALL_THRESHOLD = try_parse_float(os.environ.get("DETECTOR_SMALL_THRESHOLD")) or 3.0
+DETECTOR_LARGE_THRESHOLD = try_parse_float(os.environ.get("DETECTOR_LARGE_THRESHOLD")) or 6.0
+DETECTOR_MIN_STD = try_parse_float(os.environ.get("DETECTOR_MIN_STD")) or 100.0
+
+# Per-vehicle state: vehicles kept at most, memory cap in MiB and seconds without readings until a vehicle is dropped
+VEHICLE_STATE_MAX_ENTRIES = try_parse_int(os.environ.get("VEHICLE_STATE_MAX_ENTRIES")) or 100_000
+VEHICLE_STATE_MAX_MEMORY_MB = try_parse_int(os.environ.get("VEHICLE_STATE_MAX_MEMORY_MB")) or 64
+VEHICLE_STATE_TTL = try_parse_float(os.environ.get("VEHICLE_STATE_TTL")) or 600.0
+
+# Port of the edge health endpoint
+HEALTH_PORT = try_parse_int(os.environ.get("HEALTH_PORT")) or 8080
@@ -2,14 +2,41 @@ import logging
 from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
 from app.adapters.hub_http_adapter import HubHttpAdapter
 from app.adapters.hub_mqtt_adapter import HubMqttAdapter
+from app.runner import Runner
+from app.usecases.anomaly_detection import StreamingRoadStateDetector
+from app.usecases.vehicle_state import VehicleStateStore
 from config import (
     MQTT_BROKER_HOST,
     MQTT_BROKER_PORT,
     MQTT_TOPIC,
     HUB_URL,
+    HUB_TRANSPORT,
+    HUB_HTTP_POOL_SIZE,
+    HUB_HTTP_TIMEOUT,
+    HUB_HTTP_BATCH_SIZE,
     HUB_MQTT_BROKER_HOST,
     HUB_MQTT_BROKER_PORT,
     HUB_MQTT_TOPIC,
+    HUB_MQTT_QOS,
+    HUB_MQTT_MAX_INFLIGHT,
+    HUB_MQTT_MAX_QUEUED,
+    HUB_MQTT_BATCH_PUBLISH,
+    BATCH_SIZE,
+    BATCH_MAX_AGE,
+    WORKERS,
+    WORKER_KIND,
+    QUEUE_SIZE,
+    ROAD_STATE_DETECTOR,
+    DETECTOR_ALPHA,
+    DETECTOR_WINDOW,
+    DETECTOR_WARMUP,
+    DETECTOR_SMALL_THRESHOLD,
+    DETECTOR_LARGE_THRESHOLD,
+    DETECTOR_MIN_STD,
+    VEHICLE_STATE_MAX_ENTRIES,
+    VEHICLE_STATE_MAX_MEMORY_MB,
+    VEHICLE_STATE_TTL,
+    HEALTH_PORT,
 )
 
 if __name__ == "__main__":
@@ -22,30 +49,53 @@ if __name__ == "__main__":
             logging.FileHandler("app.log"),  # Save log messages to a file
         ],
     )
-    # Create an instance of the StoreApiAdapter using the configuration
-    # hub_adapter = HubHttpAdapter(
-    #     api_base_url=HUB_URL,
-    # )
-    hub_adapter = HubMqttAdapter(
-        broker=HUB_MQTT_BROKER_HOST,
-        port=HUB_MQTT_BROKER_PORT,
-        topic=HUB_MQTT_TOPIC,
-    )
+    # Create an instance of the hub gateway for the configured transport
+    if HUB_TRANSPORT == "http":
+        hub_adapter = HubHttpAdapter(
+            api_base_url=HUB_URL,
+            pool_size=HUB_HTTP_POOL_SIZE,
+            timeout=HUB_HTTP_TIMEOUT,
+            batch_size=HUB_HTTP_BATCH_SIZE,
+            batch_max_age=BATCH_MAX_AGE,
+        )
+    else:
+        hub_adapter = HubMqttAdapter(
+            broker=HUB_MQTT_BROKER_HOST,
+            port=HUB_MQTT_BROKER_PORT,
+            topic=HUB_MQTT_TOPIC,
+            qos=HUB_MQTT_QOS,
+            max_inflight=HUB_MQTT_MAX_INFLIGHT,
+            max_queued=HUB_MQTT_MAX_QUEUED,
+            batch_publish=HUB_MQTT_BATCH_PUBLISH,
+        )
+    road_state_detector = None
+    if ROAD_STATE_DETECTOR == "streaming":
+        vehicle_state = VehicleStateStore(
+            window=DETECTOR_WINDOW,
+            max_entries=VEHICLE_STATE_MAX_ENTRIES,
+            max_bytes=VEHICLE_STATE_MAX_MEMORY_MB * 1024 * 1024,
+            ttl=VEHICLE_STATE_TTL,
+        )
+        road_state_detector = StreamingRoadStateDetector(
+            alpha=DETECTOR_ALPHA,
+            warmup=DETECTOR_WARMUP,
+            small_threshold=DETECTOR_SMALL_THRESHOLD,
+            large_threshold=DETECTOR_LARGE_THRESHOLD,
+            min_std=DETECTOR_MIN_STD,
+            state=vehicle_state,
+        )
     # Create an instance of the AgentMQTTAdapter using the configuration
     agent_adapter = AgentMQTTAdapter(
         broker_host=MQTT_BROKER_HOST,
         broker_port=MQTT_BROKER_PORT,
         topic=MQTT_TOPIC,
         hub_gateway=hub_adapter,
+        batch_size=BATCH_SIZE,
+        batch_max_age=BATCH_MAX_AGE,
+        workers=WORKERS,
+        worker_kind=WORKER_KIND,
+        queue_size=QUEUE_SIZE,
+        road_state_detector=road_state_detector,
     )
-    try:
-        # Connect to the MQTT broker and start listening for messages
-        agent_adapter.connect()
-        agent_adapter.start()
-        # Keep the system running indefinitely (you can add other logic as needed)
-        while True:
-            pass
-    except KeyboardInterrupt:
-        # Stop the MQTT adapter and exit gracefully if interrupted by the user
-        agent_adapter.stop()
-        logging.info("System stopped.")
+    # Run until SIGINT/SIGTERM, then drain in-flight batches and stop gracefully
+    Runner(agent_adapter, health_port=HEALTH_PORT).run()
@@ -0,0 +1,42 @@
+import unittest
+from datetime import datetime
+from unittest.mock import Mock
+
+from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter, payload_user_id
+from app.entities.agent_data import AccelerometerData, AgentData, GpsData
+from app.interfaces.hub_gateway import HubGateway
+
+
+def make_payload(user_id, z=16500):
+    return AgentData(
+        user_id=user_id,
+        accelerometer=AccelerometerData(x=0, y=0, z=z),
+        gps=GpsData(latitude=50.45, longitude=30.52),
+        timestamp=datetime(2024, 1, 1),
+    ).model_dump_json().encode()
+
+
+class TestAgentMQTTAdapter(unittest.TestCase):
+    def test_invalid_payloads_are_not_counted_as_processed(self):
+        hub = Mock(spec=HubGateway)
+        hub.save_batch.return_value = True
+        adapter = AgentMQTTAdapter("localhost", 1883, "topic", hub, batch_size=32, workers=2)
+        adapter.worker_pool.start()
+        for i in range(95):
+            adapter.batcher.add(make_payload(i % 5))
+        adapter.batcher.add(b'{"user_id": 1}')
+        adapter.batcher.close()
+        adapter.worker_pool.stop()
+        stats = adapter.stats()
+        self.assertEqual(stats["processed"], 95)
+        self.assertEqual(stats["invalid"], 1)
+        self.assertEqual(sum(len(call.args[0]) for call in hub.save_batch.call_args_list), 95)
+
+    def test_payload_user_id(self):
+        self.assertEqual(payload_user_id(make_payload(42)), 42)
+        self.assertEqual(payload_user_id(b'{"user_id" : -3}'), -3)
+        self.assertEqual(payload_user_id(b"not json"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+from datetime import datetime
+from unittest.mock import Mock
+
+from app.entities.agent_data import AccelerometerData, AgentData, GpsData
+from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
+from app.interfaces.hub_gateway import HubGateway
+from app.usecases.anomaly_detection import StreamingRoadStateDetector
+
+
+def make_agent_data(user_id, z):
+    return AgentData(
+        user_id=user_id,
+        accelerometer=AccelerometerData(x=0, y=0, z=z),
+        gps=GpsData(latitude=50.45, longitude=30.52),
+        timestamp=datetime(2024, 1, 1),
+    )
+
+
+def ride(baseline, samples=100):
+    # A smooth ride with a little sensor noise around the baseline
+    return [baseline + (i % 5 - 2) * 20 for i in range(samples)]
+
+
+class TestStreamingRoadStateDetector(unittest.TestCase):
+    def test_steady_ride_is_normal(self):
+        detector = StreamingRoadStateDetector()
+        states = [detector.classify(1, z) for z in ride(16500)]
+        self.assertEqual(set(states), {"normal"})
+
+    def test_warmup_is_normal(self):
+        detector = StreamingRoadStateDetector(warmup=20)
+        for z in ride(16500, samples=10):
+            detector.classify(1, z)
+        self.assertEqual(detector.classify(1, 5000), "normal")
+
+    def test_pits_and_bumps_relative_to_baseline(self):
+        detector = StreamingRoadStateDetector(window=1)
+        for z in ride(16500):
+            detector.classify(1, z)
+        self.assertEqual(detector.classify(1, 16500 - 400), "small pits")
+        for z in ride(16500, samples=20):
+            detector.classify(1, z)
+        self.assertEqual(detector.classify(1, 16500 - 2000), "large pits")
+        for z in ride(16500, samples=20):
+            detector.classify(1, z)
+        self.assertEqual(detector.classify(1, 16500 + 2000), "bumps")
+
+    def test_upside_down_sensor(self):
+        detector = StreamingRoadStateDetector(window=1)
+        for z in ride(-16500):
+            detector.classify(1, z)
+        # Less gravity is a smaller magnitude whatever the sign of the axis
+        self.assertEqual(detector.classify(1, -16500 + 2000), "large pits")
+
+    def test_peak_to_peak_swing(self):
+        detector = StreamingRoadStateDetector(window=4)
+        for z in ride(16500):
+            detector.classify(1, z)
+        # A quick drop and a smaller rebound: the rebound is graded by the swing and is part of the pit
+        self.assertEqual(detector.classify(1, 16500 - 1200), "large pits")
+        self.assertEqual(detector.classify(1, 16500 + 500), "large pits")
+
+    def test_single_hit_is_one_detection(self):
+        detector = StreamingRoadStateDetector()
+        for z in ride(16500):
+            detector.classify(1, z)
+        states = [detector.classify(1, z) for z in [16500 - 2000] + ride(16500, samples=20)]
+        self.assertEqual(states, ["large pits"] + ["normal"] * 20)
+
+    def test_vehicles_have_own_baselines(self):
+        detector = StreamingRoadStateDetector()
+        batch = [
+            make_agent_data(user_id, z)
+            for z_low, z_high in zip(ride(10000), ride(20000))
+            for user_id, z in ((1, z_low), (2, z_high))
+        ]
+        processed_batch = detector.process_agent_data_batch(batch)
+        self.assertEqual(len(detector), 2)
+        self.assertEqual({processed.road_state for processed in processed_batch}, {"normal"})
+        self.assertEqual(processed_batch[1].agent_data, batch[1])
+        # The last GPS fix and timestamp are kept per vehicle
+        slot = detector.state.slot(2)
+        self.assertEqual((detector.state.latitude[slot], detector.state.longitude[slot]), (50.45, 30.52))
+        self.assertEqual(detector.state.timestamp[slot], datetime(2024, 1, 1).timestamp())
+
+    def test_lasting_change_is_followed(self):
+        detector = StreamingRoadStateDetector()
+        for z in ride(16500):
+            detector.classify(1, z)
+        states = [detector.classify(1, z) for z in ride(12000, samples=300)]
+        self.assertEqual(states[-50:], ["normal"] * 50)
+
+    def test_workers_keep_the_samples_of_a_vehicle_in_order(self):
+        hub = Mock(spec=HubGateway)
+        hub.save_batch.return_value = True
+        adapter = AgentMQTTAdapter(
+            "localhost", 1883, "topic", hub, batch_size=4, queue_size=1000,
+            workers=4, road_state_detector=StreamingRoadStateDetector(),
+        )
+        adapter.worker_pool.start()
+        samples = [
+            (user_id, z) for i, z in enumerate(ride(16500)) for user_id in range(1, 9)
+        ] + [(user_id, 16500 - 2000) for user_id in range(1, 9)]
+        for user_id, z in samples:
+            adapter.batcher.add(make_agent_data(user_id, z).model_dump_json().encode())
+        adapter.batcher.close()
+        adapter.worker_pool.stop()
+        road_states = {}
+        for call in hub.save_batch.call_args_list:
+            for processed in call.args[0]:
+                road_states.setdefault(processed.agent_data.user_id, []).append(processed.road_state)
+        # Every vehicle sees its ride and then the hit, whichever worker handled it
+        for user_id in range(1, 9):
+            self.assertEqual(road_states[user_id], ["normal"] * 100 + ["large pits"])
+
+
+if __name__ == "__main__":
+    unittest.main()
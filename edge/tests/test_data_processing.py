@@ -0,0 +1,50 @@
+import unittest
+
+import numpy as np
+
+from app.entities.agent_data import AccelerometerData, AgentData, GpsData
+from app.usecases.data_processing import (
+    classify_road_state_batch,
+    process_agent_data,
+    process_agent_data_batch,
+)
+
+
+def make_agent_data(z):
+    return AgentData(
+        user_id=1,
+        accelerometer=AccelerometerData(x=0.1, y=0.2, z=z),
+        gps=GpsData(latitude=10.123, longitude=20.456),
+        timestamp="2023-07-21T12:34:56Z",
+    )
+
+
+class TestDataProcessing(unittest.TestCase):
+    def test_classify_road_state_batch(self):
+        z = np.array([16000, 13000, 11000, 19000, 21000])
+        road_states = classify_road_state_batch(z)
+        self.assertEqual(
+            road_states.tolist(),
+            ["normal", "small pits", "large pits", "small pits", "large pits"],
+        )
+
+    def test_classify_road_state_batch_xyz_columns(self):
+        xyz = np.array([[1, 2, 16000], [1, 2, 13000]])
+        road_states = classify_road_state_batch(xyz)
+        self.assertEqual(road_states.tolist(), ["normal", "small pits"])
+
+    def test_process_agent_data_matches_batch(self):
+        batch = [make_agent_data(z) for z in (16000, 13000, 19000)]
+        processed_batch = process_agent_data_batch(batch)
+        self.assertEqual(
+            [process_agent_data(agent_data) for agent_data in batch],
+            processed_batch,
+        )
+        self.assertEqual(processed_batch[0].agent_data, batch[0])
+
+    def test_process_agent_data_batch_empty(self):
+        self.assertEqual(process_agent_data_batch([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import json
+import unittest
+from unittest.mock import Mock
+
+from app.adapters.hub_http_adapter import HubHttpAdapter
+from app.entities.agent_data import AccelerometerData, AgentData, GpsData
+from app.entities.processed_agent_data import ProcessedAgentData
+
+
+def processed_agent_data(user_id: int) -> ProcessedAgentData:
+    return ProcessedAgentData(
+        road_state="normal",
+        agent_data=AgentData(
+            user_id=user_id,
+            accelerometer=AccelerometerData(x=1.0, y=2.0, z=16000.0),
+            gps=GpsData(latitude=50.45, longitude=30.52),
+            timestamp="2024-03-01T12:34:56",
+        ),
+    )
+
+
+class TestHubHttpAdapter(unittest.TestCase):
+    def create_adapter(self, **kwargs):
+        adapter = HubHttpAdapter("http://hub", **kwargs)
+        adapter.session.post = Mock(return_value=Mock(status_code=200))
+        return adapter
+
+    def test_save_batch_sends_one_request(self):
+        adapter = self.create_adapter()
+        batch = [processed_agent_data(1), processed_agent_data(2)]
+        self.assertTrue(adapter.save_batch(batch))
+        adapter.session.post.assert_called_once()
+        url = adapter.session.post.call_args.args[0]
+        self.assertEqual(url, "http://hub/processed_agent_data/batch/")
+        body = adapter.session.post.call_args.kwargs["data"]
+        self.assertEqual(
+            [ProcessedAgentData.model_validate(item) for item in json.loads(body)], batch
+        )
+
+    def test_save_data_accumulates_batches(self):
+        adapter = self.create_adapter(batch_size=3, batch_max_age=60)
+        for user_id in range(4):
+            self.assertTrue(adapter.save_data(processed_agent_data(user_id)))
+        self.assertEqual(adapter.session.post.call_count, 1)
+        adapter.close()
+        self.assertEqual(adapter.session.post.call_count, 2)
+        body = adapter.session.post.call_args.kwargs["data"]
+        self.assertEqual(len(json.loads(body)), 1)
+
+    def test_failed_response(self):
+        adapter = self.create_adapter()
+        adapter.session.post.return_value = Mock(status_code=500)
+        self.assertFalse(adapter.save_data(processed_agent_data(1)))
+        self.assertEqual(adapter.stats()["failed"], 1)
+
+    def test_failed_accumulated_batch_is_reported(self):
+        adapter = self.create_adapter(batch_size=2, batch_max_age=60)
+        adapter.session.post.return_value = Mock(status_code=500)
+        self.assertTrue(adapter.save_data(processed_agent_data(1)))
+        # The reading that completes the batch gets the result of sending it
+        self.assertFalse(adapter.save_data(processed_agent_data(2)))
+        adapter.session.post.return_value = Mock(status_code=200)
+        self.assertTrue(adapter.save_data(processed_agent_data(3)))
+        adapter.close()
+        self.assertEqual(
+            adapter.stats(), {"sent": 1, "failed": 2, "failed_batches": 1, "buffered": 0}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import json
+import unittest
+from unittest.mock import Mock, patch
+
+from paho.mqtt import client as mqtt_client
+
+from app.adapters.hub_mqtt_adapter import HubMqttAdapter
+from app.entities.agent_data import AccelerometerData, AgentData, GpsData
+from app.entities.processed_agent_data import ProcessedAgentData
+
+
+def processed_agent_data(user_id: int) -> ProcessedAgentData:
+    return ProcessedAgentData(
+        road_state="normal",
+        agent_data=AgentData(
+            user_id=user_id,
+            accelerometer=AccelerometerData(x=1.0, y=2.0, z=16000.0),
+            gps=GpsData(latitude=50.45, longitude=30.52),
+            timestamp="2024-03-01T12:34:56",
+        ),
+    )
+
+
+class TestHubMqttAdapter(unittest.TestCase):
+    def setUp(self):
+        self.mock_client = Mock()
+        self.mock_client.publish.return_value = Mock(rc=mqtt_client.MQTT_ERR_SUCCESS, mid=1)
+        with patch.object(HubMqttAdapter, "_connect_mqtt", return_value=self.mock_client):
+            self.adapter = HubMqttAdapter("broker", 1883, "topic", qos=1, max_inflight=5, max_queued=50)
+
+    def test_limits_are_applied(self):
+        self.mock_client.max_inflight_messages_set.assert_called_once_with(5)
+        self.mock_client.max_queued_messages_set.assert_called_once_with(50)
+
+    def test_save_batch_publishes_one_array_message(self):
+        batch = [processed_agent_data(1), processed_agent_data(2)]
+        self.assertTrue(self.adapter.save_batch(batch))
+        self.mock_client.publish.assert_called_once()
+        topic, msg = self.mock_client.publish.call_args.args
+        self.assertEqual(topic, "topic")
+        self.assertEqual(self.mock_client.publish.call_args.kwargs, {"qos": 1})
+        self.assertEqual(
+            [ProcessedAgentData.model_validate(item) for item in json.loads(msg)], batch
+        )
+        self.assertEqual(self.adapter.stats()["unconfirmed"], 2)
+        self.adapter.on_publish(self.mock_client, None, 1)
+        self.assertEqual(
+            self.adapter.stats(),
+            {"published": 2, "delivered": 2, "unconfirmed": 0, "failed": 0},
+        )
+
+    def test_confirmation_before_publish_returns(self):
+        self.adapter.on_publish(self.mock_client, None, 1)
+        self.assertTrue(self.adapter.save_data(processed_agent_data(1)))
+        self.assertEqual(self.adapter.stats()["delivered"], 1)
+        self.assertEqual(self.adapter.stats()["unconfirmed"], 0)
+
+    def test_publish_failure_is_counted(self):
+        self.mock_client.publish.return_value = Mock(rc=mqtt_client.MQTT_ERR_QUEUE_SIZE, mid=2)
+        self.assertFalse(self.adapter.save_batch([processed_agent_data(1)] * 3))
+        self.assertEqual(self.adapter.stats()["failed"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
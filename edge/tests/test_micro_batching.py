@@ -0,0 +1,43 @@
+import threading
+import unittest
+from unittest.mock import Mock
+
+from app.usecases.micro_batching import MicroBatcher
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_flush_on_size(self):
+        flush_callback = Mock()
+        batcher = MicroBatcher(flush_callback, batch_size=2, max_age=60)
+        batcher.add(1)
+        flush_callback.assert_not_called()
+        batcher.add(2)
+        flush_callback.assert_called_once_with([1, 2])
+        self.assertEqual(len(batcher), 0)
+
+    def test_flush_on_age(self):
+        flushed = threading.Event()
+        batches = []
+
+        def flush_callback(batch):
+            batches.append(batch)
+            flushed.set()
+
+        batcher = MicroBatcher(flush_callback, batch_size=100, max_age=0.05)
+        batcher.start()
+        batcher.add(1)
+        self.assertTrue(flushed.wait(1))
+        self.assertEqual(batches, [[1]])
+        batcher.close()
+
+    def test_close_flushes_remaining_items(self):
+        flush_callback = Mock()
+        batcher = MicroBatcher(flush_callback, batch_size=100, max_age=60)
+        batcher.start()
+        batcher.add(1)
+        batcher.close()
+        flush_callback.assert_called_once_with([1])
+
+
+if __name__ == "__main__":
+    unittest.main()
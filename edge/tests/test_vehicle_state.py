@@ -0,0 +1,72 @@
+import unittest
+
+from app.usecases.vehicle_state import INDEX_BYTES_PER_ENTRY, VehicleStateStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestVehicleStateStore(unittest.TestCase):
+    def test_slot_is_stable_and_reset_for_new_vehicles(self):
+        store = VehicleStateStore()
+        slot = store.slot(1)
+        store.count[slot] = 5
+        store.mean[slot] = 16500.0
+        self.assertEqual(store.slot(1), slot)
+        self.assertEqual(store.count[slot], 5)
+        other = store.slot(2)
+        self.assertNotEqual(other, slot)
+        self.assertEqual((store.count[other], store.mean[other]), (0, 0.0))
+        self.assertEqual(len(store), 2)
+
+    def test_least_recently_seen_is_evicted(self):
+        store = VehicleStateStore(max_entries=2)
+        slot_1 = store.slot(1)
+        store.slot(2)
+        store.slot(1)
+        store.count[slot_1] = 5
+        slot_3 = store.slot(3)
+        self.assertNotIn(2, store)
+        self.assertIn(1, store)
+        self.assertEqual(store.count[store.slot(1)], 5)
+        self.assertEqual(store.count[slot_3], 0)
+        self.assertEqual(store.stats()["evictions"], 1)
+        # The slot of the evicted vehicle is reused
+        self.assertEqual(len(store.count), 2)
+
+    def test_ttl(self):
+        clock = FakeClock()
+        store = VehicleStateStore(ttl=10, clock=clock)
+        store.slot(1)
+        clock.now = 5
+        slot_2 = store.slot(2)
+        store.count[slot_2] = 3
+        clock.now = 12
+        self.assertEqual(store.expire(), 1)
+        self.assertEqual((1 in store, 2 in store), (False, True))
+        # A vehicle that comes back after the TTL starts from scratch, even before expire runs
+        clock.now = 30
+        self.assertEqual(store.count[store.slot(2)], 0)
+        self.assertEqual(store.stats()["expirations"], 2)
+
+    def test_memory_cap(self):
+        store = VehicleStateStore(window=8, max_entries=1_000_000, max_bytes=1024 * 1024)
+        self.assertEqual(store.capacity, 1024 * 1024 // store.entry_bytes)
+        for user_id in range(store.capacity * 2):
+            store.slot(user_id)
+        stats = store.stats()
+        self.assertEqual(stats["entries"], store.capacity)
+        self.assertEqual(stats["evictions"], store.capacity)
+        self.assertLessEqual(stats["bytes"], 1024 * 1024)
+        self.assertEqual(
+            stats["bytes"], store.capacity * (15 * 8 + INDEX_BYTES_PER_ENTRY)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
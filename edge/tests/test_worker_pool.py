@@ -0,0 +1,68 @@
+import threading
+import unittest
+from unittest.mock import Mock
+
+from app.usecases.worker_pool import WorkerPool
+
+
+class TestWorkerPool(unittest.TestCase):
+    def test_stop_drains_queue(self):
+        handler = Mock(return_value=True)
+        pool = WorkerPool(handler, workers=2, queue_size=10)
+        pool.start()
+        for i in range(5):
+            self.assertTrue(pool.submit([i, i]))
+        pool.stop()
+        self.assertEqual(handler.call_count, 5)
+        stats = pool.stats()
+        self.assertEqual(stats["processed"], 10)
+        self.assertEqual(stats["queue_depth"], 0)
+
+    def test_submit_drops_when_queue_is_full(self):
+        release = threading.Event()
+        pool = WorkerPool(lambda batch: release.wait(1), workers=1, queue_size=1)
+        # Without started workers the queue is never drained
+        self.assertTrue(pool.submit([1]))
+        self.assertFalse(pool.submit([2, 3]))
+        self.assertEqual(pool.stats()["dropped"], 2)
+        self.assertEqual(pool.stats()["queue_depth"], 1)
+        release.set()
+
+    def test_failed_batches_are_counted(self):
+        pool = WorkerPool(Mock(side_effect=[False, RuntimeError("hub")]), workers=1)
+        pool.start()
+        pool.submit([1])
+        pool.submit([2, 3])
+        pool.stop()
+        stats = pool.stats()
+        self.assertEqual(stats["failed"], 3)
+        self.assertEqual(stats["processed"], 0)
+
+    def test_invalid_items_are_counted_apart(self):
+        pool = WorkerPool(Mock(side_effect=[1, True, 0]), workers=1)
+        pool.start()
+        pool.submit([1, 2, 3])
+        pool.submit([4])
+        pool.submit([5, 6])
+        pool.stop()
+        stats = pool.stats()
+        self.assertEqual(stats["processed"], 5)
+        self.assertEqual(stats["invalid"], 1)
+
+    def test_shards_keep_the_order_of_a_key(self):
+        handled = []
+        pool = WorkerPool(handled.append, workers=3, queue_size=30, shard_key=lambda item: item[0])
+        pool.start()
+        for i in range(10):
+            self.assertTrue(pool.submit([(key, i) for key in range(6)]))
+        pool.stop()
+        # Every batch holds the items of the keys of one worker only
+        self.assertEqual(len(handled), 30)
+        self.assertTrue(all(len({key % 3 for key, _ in batch}) == 1 for batch in handled))
+        for key in range(6):
+            self.assertEqual([i for batch in handled for k, i in batch if k == key], list(range(10)))
+        self.assertEqual(pool.stats()["processed"], 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
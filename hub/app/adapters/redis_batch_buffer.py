@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from redis import Redis
+
+# Append items to the user's shard and take the oldest batch_size items for every full batch the shard holds.
+# The pending sorted set keeps the arrival time of the oldest buffered item of every non-empty shard.
+# The script runs atomically, so every item ends up in exactly one batch even with several hub replicas.
+PUSH_AND_DRAIN_SCRIPT = """
+local batch_size = tonumber(ARGV[1])
+redis.call('RPUSH', KEYS[1], unpack(ARGV, 4))
+redis.call('ZADD', KEYS[2], 'NX', ARGV[2], ARGV[3])
+local batches = {}
+while redis.call('LLEN', KEYS[1]) >= batch_size do
+    table.insert(batches, redis.call('LRANGE', KEYS[1], 0, batch_size - 1))
+    redis.call('LTRIM', KEYS[1], batch_size, -1)
+end
+if #batches > 0 then
+    if redis.call('LLEN', KEYS[1]) == 0 then
+        redis.call('ZREM', KEYS[2], ARGV[3])
+    else
+        redis.call('ZADD', KEYS[2], ARGV[2], ARGV[3])
+    end
+end
+return batches
+"""
+
+# Take up to batch_size of the oldest items from every shard whose oldest item arrived before the cutoff.
+DRAIN_EXPIRED_SCRIPT = """
+local user_ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[2], 'LIMIT', 0, tonumber(ARGV[4]))
+local batch_size = tonumber(ARGV[3])
+local batches = {}
+for _, user_id in ipairs(user_ids) do
+    local key = ARGV[1] .. ':' .. user_id
+    local batch = redis.call('LRANGE', key, 0, batch_size - 1)
+    redis.call('LTRIM', key, batch_size, -1)
+    if redis.call('LLEN', key) == 0 then
+        redis.call('ZREM', KEYS[1], user_id)
+    else
+        redis.call('ZADD', KEYS[1], ARGV[5], user_id)
+    end
+    if #batch > 0 then
+        table.insert(batches, {user_id, batch})
+    end
+end
+return batches
+"""
+
+
+class RedisBatchBuffer:
+    """
+    Redis lists, one per user_id, that collect items and hand them out in FIFO batches.
+    A shard is drained as soon as it holds batch_size items, or by drain_expired once its oldest item is too old.
+    """
+
+    def __init__(self, redis_client: Redis, key_prefix: str, batch_size: int):
+        self.redis_client = redis_client
+        self.key_prefix = key_prefix
+        self.pending_key = f"{key_prefix}:pending"
+        self.batch_size = max(1, batch_size)
+        self._push_and_drain = redis_client.register_script(PUSH_AND_DRAIN_SCRIPT)
+        self._drain_expired = redis_client.register_script(DRAIN_EXPIRED_SCRIPT)
+
+    def shard_key(self, user_id: int) -> str:
+        return f"{self.key_prefix}:{user_id}"
+
+    def push(self, user_id: int, item) -> Optional[List[bytes]]:
+        """
+        Add an item to the user's shard in one round trip.
+        Returns:
+            The batch in arrival order when this item completed it, None otherwise.
+        """
+        batches = self.push_many(user_id, [item])
+        return batches[0] if batches else None
+
+    def push_many(self, user_id: int, items: List) -> List[List[bytes]]:
+        """
+        Add several items of one user to their shard in one round trip.
+        Returns:
+            Every batch the items completed, each in arrival order.
+        """
+        batches = []
+        # Lua's unpack() is limited to a few thousand arguments
+        for start in range(0, len(items), 1000):
+            batches += self._push_and_drain(
+                keys=[self.shard_key(user_id), self.pending_key],
+                args=[self.batch_size, time.time(), user_id, *items[start:start + 1000]],
+            )
+        return batches
+
+    def drain_expired(
+        self, max_age: float, limit: int = 100
+    ) -> List[Tuple[int, List[bytes]]]:
+        """
+        Take the buffered items of shards whose oldest item is at least max_age seconds old.
+        Parameters:
+            max_age (float): Age in seconds after which a partial batch is flushed.
+            limit (int): Maximum number of shards drained in one call.
+        Returns:
+            List of (user_id, batch) pairs, each batch in arrival order.
+        """
+        now = time.time()
+        batches = self._drain_expired(
+            keys=[self.pending_key],
+            args=[self.key_prefix, now - max_age, self.batch_size, limit, now],
+        )
+        return [(int(user_id), batch) for user_id, batch in batches]
+
+
+class BatchFlushScheduler:
+    """
+    Periodically flushes partial batches from a RedisBatchBuffer, so a quiet user's
+    readings reach the store within max_age seconds (plus one interval) of arriving.
+    """
+
+    def __init__(
+        self,
+        batch_buffer: RedisBatchBuffer,
+        flush_callback: Callable[[List[bytes]], None],
+        max_age: float,
+        interval: Optional[float] = None,
+    ):
+        self.batch_buffer = batch_buffer
+        self.flush_callback = flush_callback
+        self.max_age = max_age
+        self.interval = interval if interval is not None else max(max_age / 4, 0.01)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="batch-flush-scheduler", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def flush_expired(self) -> int:
+        """Flush every expired shard now. Returns the number of batches flushed."""
+        flushed = 0
+        while True:
+            batches = self.batch_buffer.drain_expired(self.max_age)
+            for user_id, batch in batches:
+                try:
+                    self.flush_callback(batch)
+                except Exception as e:
+                    logging.error(
+                        f"Error flushing batch of {len(batch)} items for user {user_id}: {e}"
+                    )
+            flushed += len(batches)
+            if not batches:
+                return flushed
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.flush_expired()
+            except Exception as e:
+                logging.error(f"Error draining expired batches: {e}")
@@ -0,0 +1,199 @@
+import logging
+import os
+import random
+import socket
+import threading
+from typing import List, Tuple
+
+from redis import Redis
+from redis.exceptions import ResponseError
+
+from app.interfaces.store_gateway import StoreGateway, StoreRejectedError
+
+
+class RedisRetryQueue:
+    """
+    Redis stream of batches the store failed to save.
+    A replay thread reads them through a consumer group, merges several failed batches into one request
+    and acknowledges them only after the store accepted it, so a hub crash mid-replay loses nothing:
+    entries left unacknowledged for claim_idle seconds are claimed again by any hub replica.
+    While the store keeps failing the replay backs off exponentially with jitter.
+    When a merged request fails the batches are replayed one by one, so one bad batch does not hold back
+    the others. Batches the store rejects, and batches delivered more than max_deliveries times without
+    being saved, are moved to the "<key>:dead" stream for inspection.
+    """
+
+    def __init__(
+        self,
+        redis_client: Redis,
+        store_gateway: StoreGateway,
+        key: str,
+        merge_count: int = 20,
+        min_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        claim_idle: float = 60.0,
+        max_deliveries: int = 50,
+    ):
+        self.redis_client = redis_client
+        self.store_gateway = store_gateway
+        self.key = key
+        self.dead_letter_key = f"{key}:dead"
+        self.group = "hub"
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.merge_count = max(1, merge_count)
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.claim_idle = claim_idle
+        self.max_deliveries = max(1, max_deliveries)
+        self.replayed_batches = 0
+        self.replayed_items = 0
+        self.dead_lettered_batches = 0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="store-retry-replay", daemon=True
+        )
+
+    def start(self):
+        try:
+            self.redis_client.xgroup_create(self.key, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def add(self, batch: List[bytes]):
+        """Keep a batch of serialized ProcessedAgentData items until the store accepts it"""
+        self.redis_client.xadd(
+            self.key, {"items": b",".join(batch), "count": len(batch)}
+        )
+
+    def __len__(self):
+        return self.redis_client.xlen(self.key)
+
+    def _without_deleted(self, entries: List[Tuple[bytes, dict]]) -> List[Tuple[bytes, dict]]:
+        # Entries deleted while pending come back without fields
+        deleted = [entry_id for entry_id, fields in entries if not fields]
+        if deleted:
+            self.redis_client.xack(self.key, self.group, *deleted)
+        return [(entry_id, fields) for entry_id, fields in entries if fields]
+
+    def _read(self) -> List[Tuple[bytes, dict]]:
+        # Entries this consumer failed to replay come first, reading them again counts another delivery
+        streams = self.redis_client.xreadgroup(
+            self.group, self.consumer, {self.key: "0"}, count=self.merge_count
+        )
+        entries = self._without_deleted(streams[0][1] if streams else [])
+        if entries:
+            return entries
+        # Then entries another consumer took but never acknowledged
+        _, entries, *_ = self.redis_client.xautoclaim(
+            self.key,
+            self.group,
+            self.consumer,
+            min_idle_time=int(self.claim_idle * 1000),
+            count=self.merge_count,
+        )
+        entries = self._without_deleted(entries)
+        if entries:
+            return entries
+        streams = self.redis_client.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.key: ">"},
+            count=self.merge_count,
+            block=1000,
+        )
+        return streams[0][1] if streams else []
+
+    def _remove(self, entries: List[Tuple[bytes, dict]]):
+        entry_ids = [entry_id for entry_id, _ in entries]
+        self.redis_client.xack(self.key, self.group, *entry_ids)
+        self.redis_client.xdel(self.key, *entry_ids)
+
+    def _dead_letter(self, entries: List[Tuple[bytes, dict]], reason: str):
+        for entry_id, fields in entries:
+            logging.error(f"Moving failed store batch {entry_id} to {self.dead_letter_key}: {reason}")
+            self.redis_client.xadd(self.dead_letter_key, {**fields, b"reason": reason})
+        self._remove(entries)
+        self.dead_lettered_batches += len(entries)
+
+    def _drop_exhausted(self, entries: List[Tuple[bytes, dict]]) -> List[Tuple[bytes, dict]]:
+        """Move the entries delivered more than max_deliveries times to the dead letter stream"""
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for entry_id, _ in entries:
+            pipeline.xpending_range(
+                self.key, self.group, min=entry_id, max=entry_id, count=1
+            )
+        deliveries = [pending[0]["times_delivered"] if pending else 0 for pending in pipeline.execute()]
+        exhausted = [
+            entry for entry, times_delivered in zip(entries, deliveries)
+            if times_delivered > self.max_deliveries
+        ]
+        if exhausted:
+            self._dead_letter(exhausted, f"not saved after {self.max_deliveries} deliveries")
+        return [
+            entry for entry, times_delivered in zip(entries, deliveries)
+            if times_delivered <= self.max_deliveries
+        ]
+
+    def _save(self, entries: List[Tuple[bytes, dict]]) -> bool:
+        # Every entry holds comma separated JSON objects, so merging is a concatenation
+        if not self.store_gateway.save_raw(
+            [fields[b"items"] for _, fields in entries], raise_rejected=True
+        ):
+            return False
+        self._remove(entries)
+        self.replayed_batches += len(entries)
+        self.replayed_items += sum(int(fields[b"count"]) for _, fields in entries)
+        return True
+
+    def _replay(self, entries: List[Tuple[bytes, dict]]) -> bool:
+        """
+        Replay the entries merged into one request.
+        Returns:
+            bool: False when the store is failing and the replay should back off,
+            the entries not saved yet stay pending and are read again.
+        """
+        try:
+            if self._save(entries):
+                return True
+            if len(entries) == 1:
+                return False
+        except StoreRejectedError as e:
+            if len(entries) == 1:
+                self._dead_letter(entries, f"rejected by the store: {e}")
+                return True
+        # The merged request may fail because of one of the entries, find it by replaying them one by one.
+        # Two failures in a row mean the store itself is failing, the rest waits for the next attempt
+        failed = 0
+        for entry in entries:
+            try:
+                if self._save([entry]):
+                    failed = 0
+                    continue
+            except StoreRejectedError as e:
+                self._dead_letter([entry], f"rejected by the store: {e}")
+                failed = 0
+                continue
+            failed += 1
+            if failed == 2:
+                return False
+        return failed == 0
+
+    def _run(self):
+        backoff = self.min_backoff
+        while not self._stop_event.is_set():
+            try:
+                entries = self._drop_exhausted(self._read())
+                if not entries or self._replay(entries):
+                    backoff = self.min_backoff
+                    continue
+            except Exception as e:
+                logging.error(f"Error replaying failed store batches: {e}")
+            self._stop_event.wait(random.uniform(backoff / 2, backoff))
+            backoff = min(backoff * 2, self.max_backoff)
@@ -1,42 +1,165 @@
+import asyncio
+import gzip
 import json
 import logging
-from typing import List
+import random
+import threading
+from concurrent.futures import Future
+from typing import List, Optional
 
+import httpx
 import pydantic_core
-import requests
 
 from app.entities.processed_agent_data import ProcessedAgentData
-from app.interfaces.store_gateway import StoreGateway
+from app.interfaces.store_gateway import StoreGateway, StoreRejectedError
+
+# Responses that are worth retrying, every other non-2xx status is a permanent failure
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
 
 
 class StoreApiAdapter(StoreGateway):
-    def __init__(self, api_base_url):
+    """
+    Sends processed agent data to the Store API over a keep-alive connection pool.
+    Requests run on a dedicated event loop thread, so synchronous callers (the MQTT callback
+    thread, FastAPI handlers, the flush scheduler) can hand over a batch with submit() and move on.
+    """
+
+    def __init__(
+        self,
+        api_base_url,
+        timeout: float = 10.0,
+        max_connections: int = 20,
+        max_in_flight: int = 10,
+        retries: int = 3,
+        retry_backoff: float = 0.5,
+        gzip_min_size: int = 1024,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
         self.api_base_url = api_base_url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_in_flight = max(1, max_in_flight)
+        self.retries = max(0, retries)
+        self.retry_backoff = retry_backoff
+        self.gzip_min_size = gzip_min_size
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="store-api-client", daemon=True
+        )
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(), self._loop).result()
+
+    async def _open(self):
+        self._client = httpx.AsyncClient(
+            base_url=self.api_base_url,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+            transport=self._transport,
+        )
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
 
     def save_data(self, processed_agent_data_batch: List[ProcessedAgentData]):
         """
-        Save the processed road data to the Store API.
+        Save the processed road data to the Store API and wait for the result.
+        Parameters:
+            processed_agent_data_batch (List[ProcessedAgentData]): Processed road data to be saved.
+        Returns:
+            bool: True if the data is successfully saved, False otherwise.
+        """
+        return self.submit(processed_agent_data_batch).result()
+
+    def submit(self, processed_agent_data_batch: List[ProcessedAgentData]) -> Future:
+        """
+        Schedule the batch to be saved without blocking the caller.
+        Returns:
+            Future: Resolves to True if the data is successfully saved, False otherwise.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self.save_data_async(processed_agent_data_batch), self._loop
+        )
+
+    def save_raw(self, items: List[bytes], raise_rejected: bool = False) -> bool:
+        """
+        Save already validated, serialized ProcessedAgentData items and wait for the result.
         Parameters:
-            processed_agent_data_batch (dict): Processed road data to be saved.
+            items (List[bytes]): JSON objects, sent as they are without parsing them again.
+            raise_rejected (bool): Raise StoreRejectedError when the store answers with a status
+                that is not worth retrying, instead of returning False.
         Returns:
             bool: True if the data is successfully saved, False otherwise.
         """
-        # Implement it
-        try:
-            # Convert the processed agent data to JSON
-            data = [data.dict() for data in processed_agent_data_batch]
-
-            # Make a POST request to the Store API endpoint with the processed data
-            # response = requests.post(f"{self.api_base_url}/processed_agent_data", json=data)
-            response = requests.post(f"{self.api_base_url}/processed_agent_data", data=json.dumps(
-                    processed_agent_data_batch, default=pydantic_core.to_jsonable_python))
-
-            # Check if the request was successful (status code 200)
-            if response.status_code == 200:
-                return True
-            else:
-                return False
-        except Exception as e:
-            # Handle exceptions if any
-            print(f"Error saving data to Store API: {e}")
+        return self.submit_raw(items, raise_rejected).result()
+
+    def submit_raw(self, items: List[bytes], raise_rejected: bool = False) -> Future:
+        """Schedule already serialized items to be saved without blocking the caller"""
+        return asyncio.run_coroutine_threadsafe(
+            self.save_raw_async(items, raise_rejected), self._loop
+        )
+
+    async def save_data_async(
+        self, processed_agent_data_batch: List[ProcessedAgentData]
+    ) -> bool:
+        """Save the batch on the client's event loop"""
+        body = json.dumps(
+            processed_agent_data_batch, default=pydantic_core.to_jsonable_python
+        ).encode("utf-8")
+        return await self._post(body, len(processed_agent_data_batch))
+
+    async def save_raw_async(self, items: List[bytes], raise_rejected: bool = False) -> bool:
+        """Save already serialized items on the client's event loop"""
+        return await self._post(b"[" + b",".join(items) + b"]", len(items), raise_rejected)
+
+    async def _post(self, body: bytes, count: int, raise_rejected: bool = False) -> bool:
+        """Send a JSON array body, retrying transient failures with jittered backoff"""
+        headers = {"Content-Type": "application/json"}
+        if self.gzip_min_size and len(body) >= self.gzip_min_size:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+
+        async with self._in_flight:
+            for attempt in range(self.retries + 1):
+                try:
+                    response = await self._client.post(
+                        "/processed_agent_data/", content=body, headers=headers
+                    )
+                    if response.is_success:
+                        return True
+                    if response.status_code not in RETRYABLE_STATUS_CODES:
+                        error = f"{response.status_code} {response.text}"
+                        logging.error(f"Store API rejected batch of {count} items: {error}")
+                        if raise_rejected:
+                            raise StoreRejectedError(error)
+                        return False
+                    error = f"status {response.status_code}"
+                except httpx.TransportError as e:
+                    error = repr(e)
+                if attempt < self.retries:
+                    # Full jitter keeps hub replicas from retrying in lockstep
+                    await asyncio.sleep(
+                        random.uniform(0, self.retry_backoff * 2**attempt)
+                    )
+            logging.error(
+                f"Error saving batch of {count} items to Store API "
+                f"after {self.retries + 1} attempts: {error}"
+            )
             return False
+
+    async def _close(self):
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await asyncio.gather(*pending, return_exceptions=True)
+        await self._client.aclose()
+
+    def close(self):
+        """Wait for the submitted batches, close the connection pool and stop the event loop thread"""
+        if not self._thread.is_alive():
+            return
+        asyncio.run_coroutine_threadsafe(self._close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
@@ -1,7 +1,16 @@
 from abc import ABC, abstractmethod
 from typing import List
+
+from pydantic import TypeAdapter
+
 from app.entities.processed_agent_data import ProcessedAgentData
 
+processed_agent_data_list_adapter = TypeAdapter(List[ProcessedAgentData])
+
+
+class StoreRejectedError(Exception):
+    """The store refused the data itself, sending the same data again cannot succeed"""
+
 
 class StoreGateway(ABC):
     """
@@ -19,3 +28,18 @@ class StoreGateway(ABC):
             bool: True if the data is successfully saved, False otherwise.
         """
         pass
+
+    def save_raw(self, items: List[bytes], raise_rejected: bool = False) -> bool:
+        """
+        Method to save processed agent data that is already validated and serialized to JSON.
+        Adapters that talk JSON override it to send the bytes as they are.
+        Parameters:
+            items (List[bytes]): Serialized processed agent data, joined with commas into one JSON array.
+            raise_rejected (bool): Raise StoreRejectedError instead of returning False when the store
+                refuses the data, adapters that cannot tell the failures apart always return False.
+        Returns:
+            bool: True if the data is successfully saved, False otherwise.
+        """
+        return self.save_data(
+            processed_agent_data_list_adapter.validate_json(b"[" + b",".join(items) + b"]")
+        )
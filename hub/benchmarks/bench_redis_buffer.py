@@ -0,0 +1,57 @@
+"""
+Messages/sec of the hub Redis batch buffer against a local redis-server.
+Compares the previous lpush + llen + lpop per item pattern with the atomic Lua drain.
+The Redis connection is configured with the same environment variables as the hub.
+Run from the hub directory:
+    python -m benchmarks.bench_redis_buffer
+"""
+import time
+
+from redis import Redis
+
+from app.adapters.redis_batch_buffer import RedisBatchBuffer
+from config import REDIS_HOST, REDIS_PORT, BATCH_SIZE
+
+MESSAGES = 20_000
+KEY = "bench_processed_agent_data"
+PAYLOAD = (
+    '{"road_state": "normal", "agent_data": {"user_id": 1, '
+    '"accelerometer": {"x": 100.0, "y": 200.0, "z": 16000.0}, '
+    '"gps": {"latitude": 50.45, "longitude": 30.52}, "timestamp": "2024-03-01T12:34:56"}}'
+)
+
+
+def bench_legacy(redis_client):
+    started_at = time.perf_counter()
+    batches = 0
+    for _ in range(MESSAGES):
+        redis_client.lpush(KEY, PAYLOAD)
+        if redis_client.llen(KEY) >= BATCH_SIZE:
+            batch = [redis_client.lpop(KEY) for _ in range(BATCH_SIZE)]
+            batches += 1
+    return time.perf_counter() - started_at, batches
+
+
+def bench_lua(redis_client):
+    batch_buffer = RedisBatchBuffer(redis_client, KEY, BATCH_SIZE)
+    started_at = time.perf_counter()
+    batches = 0
+    for _ in range(MESSAGES):
+        if batch_buffer.push(1, PAYLOAD) is not None:
+            batches += 1
+    return time.perf_counter() - started_at, batches
+
+
+def main():
+    redis_client = Redis(host=REDIS_HOST, port=REDIS_PORT)
+    print(f"batch size {BATCH_SIZE}, {MESSAGES:,} messages")
+    print(f"{'buffer':<22} {'messages/sec':>14} {'batches':>8}")
+    for name, bench in (("lpush/llen/lpop", bench_legacy), ("atomic Lua drain", bench_lua)):
+        redis_client.delete(KEY, f"{KEY}:1", f"{KEY}:pending")
+        elapsed, batches = bench(redis_client)
+        print(f"{name:<22} {MESSAGES / elapsed:>14,.0f} {batches:>8,}")
+    redis_client.delete(KEY, f"{KEY}:1", f"{KEY}:pending")
+
+
+if __name__ == "__main__":
+    main()
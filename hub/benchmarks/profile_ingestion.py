@@ -0,0 +1,75 @@
+"""
+CPU time per message spent by the hub between receiving a payload and building the store request body.
+Redis and HTTP are left out, only the serialization work differs between the two paths.
+Run from the hub directory:
+    python -m benchmarks.profile_ingestion [--cprofile]
+"""
+import cProfile
+import json
+import pstats
+import sys
+import time
+
+import pydantic_core
+
+from app.entities.processed_agent_data import ProcessedAgentData
+from config import BATCH_SIZE
+
+MESSAGES = 50_000
+PAYLOAD = (
+    b'{"road_state": "normal", "agent_data": {"user_id": 1, '
+    b'"accelerometer": {"x": 100.0, "y": 200.0, "z": 16000.0}, '
+    b'"gps": {"latitude": 50.45, "longitude": 30.52}, "timestamp": "2024-03-01T12:34:56"}}'
+)
+
+
+def reparse_path(payloads):
+    """Validate, dump into Redis, validate again on pop and serialize with json.dumps"""
+    buffered = []
+    for payload in payloads:
+        processed_agent_data = ProcessedAgentData.model_validate_json(
+            payload.decode("utf-8"), strict=True
+        )
+        buffered.append(processed_agent_data.model_dump_json())
+        if len(buffered) == BATCH_SIZE:
+            batch = [ProcessedAgentData.model_validate_json(item) for item in buffered]
+            # The list of data.dict() the adapter built and never used
+            [data.model_dump() for data in batch]
+            json.dumps(batch, default=pydantic_core.to_jsonable_python).encode("utf-8")
+            buffered = []
+
+
+def raw_path(payloads):
+    """Validate once, buffer the original bytes and concatenate them into the body"""
+    buffered = []
+    for payload in payloads:
+        ProcessedAgentData.model_validate_json(payload, strict=True)
+        buffered.append(payload)
+        if len(buffered) == BATCH_SIZE:
+            b"[" + b",".join(buffered) + b"]"
+            buffered = []
+
+
+def main():
+    payloads = [PAYLOAD] * MESSAGES
+    print(f"batch size {BATCH_SIZE}, {MESSAGES:,} messages")
+    print(f"{'path':<34} {'CPU us/message':>15}")
+    for name, path in (
+        ("validate + re-serialize (before)", reparse_path),
+        ("validate once + raw bytes (after)", raw_path),
+    ):
+        started_at = time.process_time()
+        path(payloads)
+        elapsed = time.process_time() - started_at
+        print(f"{name:<34} {elapsed / MESSAGES * 1e6:>15.2f}")
+
+    if "--cprofile" in sys.argv:
+        for path in (reparse_path, raw_path):
+            profiler = cProfile.Profile()
+            profiler.runcall(path, payloads)
+            print(f"\n{path.__name__}")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(8)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,33 @@
 import os
 
 
-def try_parse_int(value: str):
+def try_parse_int(value: str, default=None):
     try:
         return int(value)
     except Exception:
-        return None
+        return default
+
+
+def try_parse_float(value: str, default=None):
+    try:
+        return float(value)
+    except Exception:
+        return default
 
 
 # Configuration for the Store API
 STORE_API_HOST = os.environ.get("STORE_API_HOST") or "localhost"
 STORE_API_PORT = try_parse_int(os.environ.get("STORE_API_PORT")) or 8000
 STORE_API_BASE_URL = f"http://{STORE_API_HOST}:{STORE_API_PORT}"
+STORE_API_TIMEOUT = try_parse_float(os.environ.get("STORE_API_TIMEOUT")) or 10.0
+STORE_API_MAX_CONNECTIONS = try_parse_int(os.environ.get("STORE_API_MAX_CONNECTIONS")) or 20
+# Batches sent to the store concurrently, further batches wait for a free slot
+STORE_API_MAX_IN_FLIGHT = try_parse_int(os.environ.get("STORE_API_MAX_IN_FLIGHT")) or 10
+# Retries of a failed request and their backoff in seconds, 0 disables them
+STORE_API_RETRIES = try_parse_int(os.environ.get("STORE_API_RETRIES"), 3)
+STORE_API_RETRY_BACKOFF = try_parse_float(os.environ.get("STORE_API_RETRY_BACKOFF"), 0.5)
+# Request bodies of at least this many bytes are gzip compressed, 0 disables compression
+STORE_API_GZIP_MIN_SIZE = try_parse_int(os.environ.get("STORE_API_GZIP_MIN_SIZE"), 1024)
 
 # Configure for Redis
 REDIS_HOST = os.environ.get("REDIS_HOST") or "localhost"
@@ -19,6 +35,18 @@ REDIS_PORT = try_parse_int(os.environ.get("REDIS_PORT")) or 6379
 
 # Configure for hub logic
 BATCH_SIZE = try_parse_int(os.environ.get("BATCH_SIZE")) or 20
+# Seconds a partial batch may wait in Redis before it is flushed to the store
+BATCH_MAX_AGE = try_parse_float(os.environ.get("BATCH_MAX_AGE")) or 1.0
+
+# Replay of batches the store failed to save: failed batches merged into one request,
+# backoff bounds in seconds while the store keeps failing, and seconds after which
+# a batch taken by a hub that never finished it is replayed by another one
+RETRY_MERGE_COUNT = try_parse_int(os.environ.get("RETRY_MERGE_COUNT")) or 20
+RETRY_MIN_BACKOFF = try_parse_float(os.environ.get("RETRY_MIN_BACKOFF")) or 0.5
+RETRY_MAX_BACKOFF = try_parse_float(os.environ.get("RETRY_MAX_BACKOFF")) or 30.0
+RETRY_CLAIM_IDLE = try_parse_float(os.environ.get("RETRY_CLAIM_IDLE")) or 60.0
+# Deliveries of a failed batch before it is moved to the dead letter stream
+RETRY_MAX_DELIVERIES = try_parse_int(os.environ.get("RETRY_MAX_DELIVERIES")) or 50
 
 # MQTT
 MQTT_BROKER_HOST = os.environ.get("MQTT_BROKER_HOST") or "localhost"
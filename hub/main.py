@@ -1,17 +1,38 @@
+import json
 import logging
-from typing import List
-
-from fastapi import FastAPI
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from redis import Redis
 import paho.mqtt.client as mqtt
 
+from app.adapters.redis_batch_buffer import BatchFlushScheduler, RedisBatchBuffer
+from app.adapters.redis_retry_queue import RedisRetryQueue
 from app.adapters.store_api_adapter import StoreApiAdapter
 from app.entities.processed_agent_data import ProcessedAgentData
+from app.interfaces.store_gateway import StoreRejectedError, processed_agent_data_list_adapter
 from config import (
     STORE_API_BASE_URL,
+    STORE_API_TIMEOUT,
+    STORE_API_MAX_CONNECTIONS,
+    STORE_API_MAX_IN_FLIGHT,
+    STORE_API_RETRIES,
+    STORE_API_RETRY_BACKOFF,
+    STORE_API_GZIP_MIN_SIZE,
     REDIS_HOST,
     REDIS_PORT,
     BATCH_SIZE,
+    BATCH_MAX_AGE,
+    RETRY_MERGE_COUNT,
+    RETRY_MIN_BACKOFF,
+    RETRY_MAX_BACKOFF,
+    RETRY_CLAIM_IDLE,
+    RETRY_MAX_DELIVERIES,
     MQTT_TOPIC,
     MQTT_BROKER_HOST,
     MQTT_BROKER_PORT,
@@ -28,27 +49,158 @@ logging.basicConfig(
 )
 # Create an instance of the Redis using the configuration
 redis_client = Redis(host=REDIS_HOST, port=REDIS_PORT)
+batch_buffer = RedisBatchBuffer(redis_client, "processed_agent_data", BATCH_SIZE)
 # Create an instance of the StoreApiAdapter using the configuration
-store_adapter = StoreApiAdapter(api_base_url=STORE_API_BASE_URL)
+store_adapter = StoreApiAdapter(
+    api_base_url=STORE_API_BASE_URL,
+    timeout=STORE_API_TIMEOUT,
+    max_connections=STORE_API_MAX_CONNECTIONS,
+    max_in_flight=STORE_API_MAX_IN_FLIGHT,
+    retries=STORE_API_RETRIES,
+    retry_backoff=STORE_API_RETRY_BACKOFF,
+    gzip_min_size=STORE_API_GZIP_MIN_SIZE,
+)
+# Batches the store failed to save are kept in a Redis stream and replayed until it accepts them
+retry_queue = RedisRetryQueue(
+    redis_client,
+    store_adapter,
+    "processed_agent_data:retry",
+    merge_count=RETRY_MERGE_COUNT,
+    min_backoff=RETRY_MIN_BACKOFF,
+    max_backoff=RETRY_MAX_BACKOFF,
+    claim_idle=RETRY_CLAIM_IDLE,
+    max_deliveries=RETRY_MAX_DELIVERIES,
+)
+retry_queue.start()
+# Failed batches are added to the retry queue on this thread, not on the store client's event loop
+# that reports them, so a slow Redis does not hold up the other batches in flight
+retry_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hub-retry")
 # Create an instance of the AgentMQTTAdapter using the configuration
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Stop the age-based flusher and wait for the batches already handed to the store client
+    flush_scheduler.stop()
+    retry_queue.stop()
+    store_adapter.close()
+    retry_executor.shutdown()
+
+
 # FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+
+def save_batch(batch: List[bytes]):
+    """
+    Hand a batch taken from the Redis buffer to the store client without waiting.
+    The items were validated on the way in, so their bytes are sent without parsing them again.
+    If the store fails to save the batch, it goes to the retry queue instead of being lost.
+    Batches the store rejects are logged by the store client and not retried.
+    """
+    future = store_adapter.submit_raw(batch, raise_rejected=True)
+
+    def keep_for_retry():
+        try:
+            retry_queue.add(batch)
+        except Exception as e:
+            logging.error(f"Error keeping failed batch of {len(batch)} items for retry: {e}")
+
+    def on_saved(future):
+        # Runs on the store client's event loop, which must not wait for Redis
+        try:
+            if not future.result():
+                retry_executor.submit(keep_for_retry)
+        except StoreRejectedError:
+            pass
+        except Exception as e:
+            logging.error(f"Error saving batch of {len(batch)} items: {e}")
+
+    future.add_done_callback(on_saved)
+
+
+def buffer_processed_agent_data(user_id: int, items: List[bytes]):
+    """Add validated, serialized data to the user's Redis buffer and send the batches to the store once they are full"""
+    for batch in batch_buffer.push_many(user_id, items):
+        save_batch(batch)
+
+
+json_decoder = json.JSONDecoder()
+
+
+def split_json_array(payload: bytes) -> List[bytes]:
+    """The bytes of every element of a JSON array, the C JSON scanner only finds where each one ends"""
+    text = payload.decode("utf-8")
+    # Character offsets are byte offsets in ASCII, the common case, so the payload is sliced directly
+    ascii_only = len(text) == len(payload)
+    items = []
+    index = text.index("[") + 1
+    while True:
+        while text[index] in " \t\r\n,":
+            index += 1
+        if text[index] == "]":
+            return items
+        _, end = json_decoder.raw_decode(text, index)
+        items.append(payload[index:end] if ascii_only else text[index:end].encode("utf-8"))
+        index = end
+
+
+def group_by_user(
+    processed_agent_data_batch: List[ProcessedAgentData], items: List[bytes]
+) -> Dict[int, List[bytes]]:
+    """The serialized readings grouped by user_id, keeping the order they were received in"""
+    items_by_user: Dict[int, List[bytes]] = {}
+    for processed_agent_data, item in zip(processed_agent_data_batch, items):
+        items_by_user.setdefault(processed_agent_data.agent_data.user_id, []).append(item)
+    return items_by_user
+
+
+# Flush partial batches of quiet users once they are BATCH_MAX_AGE seconds old
+flush_scheduler = BatchFlushScheduler(batch_buffer, save_batch, BATCH_MAX_AGE)
+flush_scheduler.start()
+
+
+def parse_payload(payload: bytes) -> Dict[int, List[bytes]]:
+    """
+    Validate a payload holding either one processed reading or a JSON array of them.
+    Readings are validated once and their original bytes are what gets buffered and sent on.
+    Returns:
+        Serialized readings grouped by user_id, in the order they were received.
+    """
+    if payload.lstrip()[:1] != b"[":
+        processed_agent_data = ProcessedAgentData.model_validate_json(payload, strict=True)
+        return {processed_agent_data.agent_data.user_id: [payload]}
+    return group_by_user(
+        processed_agent_data_list_adapter.validate_json(payload, strict=True),
+        split_json_array(payload),
+    )
+
+
+def buffer_payload(payload: bytes):
+    for user_id, items in parse_payload(payload).items():
+        buffer_processed_agent_data(user_id, items)
+
+
+async def buffer_request(request: Request):
+    payload = await request.body()
+    try:
+        # The blocking Redis calls run in the threadpool instead of the event loop
+        await run_in_threadpool(buffer_payload, payload)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    return {"status": "ok"}
 
 
+# The bodies are read raw so the readings are forwarded as they were sent, see parse_payload
 @app.post("/processed_agent_data/")
-async def save_processed_agent_data(processed_agent_data: ProcessedAgentData):
-    redis_client.lpush("processed_agent_data", processed_agent_data.model_dump_json())
-    if redis_client.llen("processed_agent_data") >= BATCH_SIZE:
-        processed_agent_data_batch: List[ProcessedAgentData] = []
-        for _ in range(BATCH_SIZE):
-            processed_agent_data = ProcessedAgentData.model_validate_json(
-                redis_client.lpop("processed_agent_data")
-            )
-            processed_agent_data_batch.append(processed_agent_data)
-        print(processed_agent_data_batch)
-        store_adapter.save_data(processed_agent_data_batch=processed_agent_data_batch)
-    return {"status": "ok"}
+async def save_processed_agent_data(request: Request):
+    return await buffer_request(request)
+
+
+@app.post("/processed_agent_data/batch/")
+async def save_processed_agent_data_batch(request: Request):
+    return await buffer_request(request)
 
 
 # MQTT
@@ -65,23 +217,7 @@ def on_connect(client, userdata, flags, rc):
 
 def on_message(client, userdata, msg):
     try:
-        payload: str = msg.payload.decode("utf-8")
-        # Create ProcessedAgentData instance with the received data
-        processed_agent_data = ProcessedAgentData.model_validate_json(
-            payload, strict=True
-        )
-
-        redis_client.lpush(
-            "processed_agent_data", processed_agent_data.model_dump_json()
-        )
-        processed_agent_data_batch: List[ProcessedAgentData] = []
-        if redis_client.llen("processed_agent_data") >= BATCH_SIZE:
-            for _ in range(BATCH_SIZE):
-                processed_agent_data = ProcessedAgentData.model_validate_json(
-                    redis_client.lpop("processed_agent_data")
-                )
-                processed_agent_data_batch.append(processed_agent_data)
-        store_adapter.save_data(processed_agent_data_batch=processed_agent_data_batch)
+        buffer_payload(msg.payload)
         return {"status": "ok"}
     except Exception as e:
         logging.info(f"Error processing MQTT message: {e}")
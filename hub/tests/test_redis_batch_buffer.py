@@ -0,0 +1,93 @@
+import time
+import unittest
+
+import redis
+
+from app.adapters.redis_batch_buffer import BatchFlushScheduler, RedisBatchBuffer
+from config import REDIS_HOST, REDIS_PORT
+
+TEST_KEY_PREFIX = "test_processed_agent_data"
+
+
+class TestRedisBatchBuffer(unittest.TestCase):
+    def setUp(self):
+        self.redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
+        try:
+            self.redis_client.ping()
+        except redis.exceptions.ConnectionError:
+            self.skipTest("Redis is not reachable")
+        self.clear()
+        self.batch_buffer = RedisBatchBuffer(
+            self.redis_client, TEST_KEY_PREFIX, batch_size=3
+        )
+
+    def tearDown(self):
+        self.clear()
+
+    def clear(self):
+        keys = self.redis_client.keys(f"{TEST_KEY_PREFIX}:*")
+        if keys:
+            self.redis_client.delete(*keys)
+
+    def test_push_returns_batches_in_arrival_order(self):
+        results = [self.batch_buffer.push(1, f"item-{i}") for i in range(7)]
+        self.assertEqual(results[:2], [None, None])
+        self.assertEqual(results[2], [b"item-0", b"item-1", b"item-2"])
+        self.assertEqual(results[3:5], [None, None])
+        self.assertEqual(results[5], [b"item-3", b"item-4", b"item-5"])
+        self.assertIsNone(results[6])
+        # The incomplete batch stays buffered
+        self.assertEqual(
+            self.redis_client.lrange(self.batch_buffer.shard_key(1), 0, -1),
+            [b"item-6"],
+        )
+
+    def test_push_shards_by_user(self):
+        self.assertIsNone(self.batch_buffer.push(1, "a-0"))
+        self.assertIsNone(self.batch_buffer.push(2, "b-0"))
+        self.assertIsNone(self.batch_buffer.push(1, "a-1"))
+        self.assertIsNone(self.batch_buffer.push(2, "b-1"))
+        self.assertEqual(self.batch_buffer.push(1, "a-2"), [b"a-0", b"a-1", b"a-2"])
+        self.assertEqual(
+            self.redis_client.zrange(self.batch_buffer.pending_key, 0, -1), [b"2"]
+        )
+
+    def test_push_many_returns_every_completed_batch(self):
+        batches = self.batch_buffer.push_many(1, [f"item-{i}" for i in range(7)])
+        self.assertEqual(
+            batches,
+            [[b"item-0", b"item-1", b"item-2"], [b"item-3", b"item-4", b"item-5"]],
+        )
+        self.assertEqual(self.batch_buffer.push_many(1, ["item-7", "item-8"]), [
+            [b"item-6", b"item-7", b"item-8"]
+        ])
+        self.assertEqual(self.redis_client.zcard(self.batch_buffer.pending_key), 0)
+
+    def test_drain_expired_takes_only_old_shards(self):
+        self.batch_buffer.push(1, "a-0")
+        time.sleep(0.05)
+        self.batch_buffer.push(2, "b-0")
+        self.assertEqual(self.batch_buffer.drain_expired(0.03), [(1, [b"a-0"])])
+        self.assertEqual(self.batch_buffer.drain_expired(0.03), [])
+        self.assertEqual(self.batch_buffer.drain_expired(0), [(2, [b"b-0"])])
+        self.assertEqual(self.redis_client.zcard(self.batch_buffer.pending_key), 0)
+
+    def test_scheduler_flushes_partial_batches(self):
+        flushed = []
+        scheduler = BatchFlushScheduler(
+            self.batch_buffer, flushed.append, max_age=0.05, interval=0.01
+        )
+        scheduler.start()
+        try:
+            self.batch_buffer.push(1, "a-0")
+            self.batch_buffer.push(1, "a-1")
+            deadline = time.monotonic() + 2
+            while not flushed and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            scheduler.stop()
+        self.assertEqual(flushed, [[b"a-0", b"a-1"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import time
+import unittest
+from unittest.mock import Mock
+
+import redis
+
+from app.adapters.redis_retry_queue import RedisRetryQueue
+from app.entities.agent_data import AccelerometerData, AgentData, GpsData
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.interfaces.store_gateway import (
+    StoreGateway,
+    StoreRejectedError,
+    processed_agent_data_list_adapter,
+)
+from config import REDIS_HOST, REDIS_PORT
+
+TEST_KEY = "test_processed_agent_data:retry"
+DEAD_LETTER_KEY = f"{TEST_KEY}:dead"
+
+
+def processed_agent_data(user_id: int) -> ProcessedAgentData:
+    return ProcessedAgentData(
+        road_state="normal",
+        agent_data=AgentData(
+            user_id=user_id,
+            accelerometer=AccelerometerData(x=0.1, y=0.2, z=0.3),
+            gps=GpsData(latitude=10.123, longitude=20.456),
+            timestamp="2023-07-21T12:34:56Z",
+        ),
+    )
+
+
+class TestRedisRetryQueue(unittest.TestCase):
+    def setUp(self):
+        self.redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
+        try:
+            self.redis_client.ping()
+        except redis.exceptions.ConnectionError:
+            self.skipTest("Redis is not reachable")
+        self.redis_client.delete(TEST_KEY, DEAD_LETTER_KEY)
+        self.mock_store_gateway = Mock(spec=StoreGateway)
+        self.retry_queue = RedisRetryQueue(
+            self.redis_client,
+            self.mock_store_gateway,
+            TEST_KEY,
+            merge_count=10,
+            min_backoff=0.01,
+            max_backoff=0.05,
+            max_deliveries=3,
+        )
+
+    def tearDown(self):
+        self.retry_queue.stop()
+        self.redis_client.delete(TEST_KEY, DEAD_LETTER_KEY)
+
+    def wait_until_drained(self):
+        deadline = time.monotonic() + 5
+        while len(self.retry_queue) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.retry_queue), 0)
+
+    def test_failed_batches_are_merged_and_replayed_until_saved(self):
+        batches = [
+            [processed_agent_data(user_id).model_dump_json().encode() for user_id in (1, 2)],
+            [processed_agent_data(3).model_dump_json().encode()],
+        ]
+        for batch in batches:
+            self.retry_queue.add(batch)
+        # The store is down for the merged attempt and the two single ones that follow it
+        self.mock_store_gateway.save_raw.side_effect = [False, False, False, True]
+        self.retry_queue.start()
+        self.wait_until_drained()
+
+        self.assertEqual(self.mock_store_gateway.save_raw.call_count, 4)
+        (items,), _ = self.mock_store_gateway.save_raw.call_args
+        self.assertEqual(
+            processed_agent_data_list_adapter.validate_json(b"[" + b",".join(items) + b"]"),
+            [processed_agent_data(user_id) for user_id in (1, 2, 3)],
+        )
+        self.assertEqual(self.retry_queue.replayed_batches, 2)
+        self.assertEqual(self.retry_queue.replayed_items, 3)
+
+    def dead_letters(self):
+        return [
+            fields[b"items"] for _, fields in self.redis_client.xrange(DEAD_LETTER_KEY)
+        ]
+
+    def test_rejected_batch_does_not_block_the_others(self):
+        items = [processed_agent_data(user_id).model_dump_json().encode() for user_id in (1, 2, 3)]
+        for item in items:
+            self.retry_queue.add([item])
+
+        def save_raw(batch, raise_rejected=False):
+            if items[1] in batch:
+                raise StoreRejectedError("422")
+            return True
+
+        self.mock_store_gateway.save_raw.side_effect = save_raw
+        self.retry_queue.start()
+        self.wait_until_drained()
+
+        self.assertEqual(self.dead_letters(), [items[1]])
+        self.assertEqual(self.retry_queue.replayed_batches, 2)
+        self.assertEqual(self.retry_queue.dead_lettered_batches, 1)
+
+    def test_batch_failing_too_often_is_dead_lettered(self):
+        items = [processed_agent_data(user_id).model_dump_json().encode() for user_id in (1, 2)]
+        for item in items:
+            self.retry_queue.add([item])
+        # The store fails on every request holding the first batch
+        self.mock_store_gateway.save_raw.side_effect = (
+            lambda batch, raise_rejected=False: items[0] not in batch
+        )
+        self.retry_queue.start()
+        self.wait_until_drained()
+
+        self.assertEqual(self.dead_letters(), [items[0]])
+        self.assertEqual(self.retry_queue.replayed_batches, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
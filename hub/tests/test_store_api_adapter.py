@@ -1,18 +1,18 @@
-import requests
+import gzip
+import json
 import unittest
-from unittest.mock import Mock, patch
+
+import httpx
+
 from app.adapters.store_api_adapter import StoreApiAdapter
 from app.entities.agent_data import AccelerometerData, AgentData, GpsData
 from app.entities.processed_agent_data import ProcessedAgentData
+from app.interfaces.store_gateway import StoreRejectedError
 
 class TestStoreApiAdapter(unittest.TestCase):
     def setUp(self):
-        # Create the StoreApiAdapter instance
-        self.store_api_adapter = StoreApiAdapter(api_base_url="http://test-api.com")
-    @patch.object(requests, "post")
-    def test_save_data_success(self, mock_post):
-        # Test successful saving of data to the Store API
-        # Sample processed road data
+        self.requests = []
+        self.responses = []
         agent_data = AgentData(
             user_id=1,
             accelerometer=AccelerometerData(
@@ -26,47 +26,90 @@ class TestStoreApiAdapter(unittest.TestCase):
             ),
             timestamp="2023-07-21T12:34:56Z",
         )
-        processed_data = ProcessedAgentData(road_state="normal", agent_data=agent_data)
-        # Mock the response from the Store API
-        mock_response = Mock(status_code=201)  # 201 indicates successful creation
-        mock_post.return_value = mock_response
-        # Call the save_data method
-        result = self.store_api_adapter.save_data(processed_data)
-        # Ensure that the post method of the mock is called with the correct arguments
-        mock_post.assert_called_once_with(
-            "http://test-api.com/agent_data", json=processed_data.model_dump()
+        self.processed_data = ProcessedAgentData(road_state="normal", agent_data=agent_data)
+
+    def create_adapter(self, **kwargs):
+        def handler(request: httpx.Request):
+            self.requests.append(request)
+            return httpx.Response(self.responses.pop(0))
+
+        adapter = StoreApiAdapter(
+            api_base_url="http://test-api.com",
+            retry_backoff=0,
+            transport=httpx.MockTransport(handler),
+            **kwargs,
         )
-        # Ensure that the result is True, indicating successful saving
+        self.addCleanup(adapter.close)
+        return adapter
+
+    def sent_data(self, request: httpx.Request):
+        body = request.content
+        if request.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return json.loads(body)
+
+    def test_save_data_success(self):
+        # Test successful saving of data to the Store API
+        self.responses = [200]
+        result = self.create_adapter().save_data([self.processed_data])
         self.assertTrue(result)
-    @patch.object(requests, "post")
-    def test_save_data_failure(self, mock_post):
-        # Test failure to save data to the Store API
-        # Sample processed road data
-        agent_data = AgentData(
-            user_id=1,
-            accelerometer=AccelerometerData(
-                x=0.1,
-                y=0.2,
-                z=0.3,
-            ),
-            gps=GpsData(
-                latitude=10.123,
-                longitude=20.456,
-            ),
-            timestamp="2023-07-21T12:34:56Z",
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(
+            str(self.requests[0].url), "http://test-api.com/processed_agent_data/"
         )
-        processed_data = ProcessedAgentData(road_state="normal", agent_data=agent_data)
-        # Mock the response from the Store API
-        mock_response = Mock(status_code=400)  # 400 indicates a client error
-        mock_post.return_value = mock_response
-        # Call the save_data method
-        result = self.store_api_adapter.save_data(processed_data)
-        # Ensure that the post method of the mock is called with the correct arguments
-        mock_post.assert_called_once_with(
-            "http://test-api.com/agent_data", json=processed_data.model_dump()
+        self.assertEqual(
+            self.sent_data(self.requests[0]),
+            [self.processed_data.model_dump(mode="json")],
         )
-        # Ensure that the result is False, indicating failure to save
+
+    def test_save_raw_sends_items_unchanged(self):
+        self.responses = [200]
+        items = [self.processed_data.model_dump_json().encode()] * 2
+        self.assertTrue(self.create_adapter().save_raw(items))
+        self.assertEqual(self.requests[0].content, b"[" + b",".join(items) + b"]")
+
+    def test_save_data_failure(self):
+        # Client errors are not retried
+        self.responses = [400]
+        result = self.create_adapter().save_data([self.processed_data])
         self.assertFalse(result)
+        self.assertEqual(len(self.requests), 1)
+
+    def test_save_raw_raises_rejected(self):
+        self.responses = [422, 503, 503]
+        adapter = self.create_adapter(retries=1)
+        items = [self.processed_data.model_dump_json().encode()]
+        with self.assertRaises(StoreRejectedError):
+            adapter.save_raw(items, raise_rejected=True)
+        # Transient failures are still reported as False
+        self.assertFalse(adapter.save_raw(items, raise_rejected=True))
+        self.assertEqual(len(self.requests), 3)
+
+    def test_save_data_retries_transient_errors(self):
+        self.responses = [503, 502, 200]
+        result = self.create_adapter(retries=3).save_data([self.processed_data])
+        self.assertTrue(result)
+        self.assertEqual(len(self.requests), 3)
+
+    def test_save_data_gives_up_after_retries(self):
+        self.responses = [503, 503, 503]
+        result = self.create_adapter(retries=2).save_data([self.processed_data])
+        self.assertFalse(result)
+        self.assertEqual(len(self.requests), 3)
+
+    def test_large_batches_are_gzipped(self):
+        self.responses = [200]
+        batch = [self.processed_data] * 50
+        self.assertTrue(self.create_adapter(gzip_min_size=1024).save_data(batch))
+        self.assertEqual(self.requests[0].headers["Content-Encoding"], "gzip")
+        self.assertEqual(len(self.sent_data(self.requests[0])), 50)
+
+    def test_submit_does_not_block(self):
+        self.responses = [200] * 5
+        adapter = self.create_adapter()
+        futures = [adapter.submit([self.processed_data]) for _ in range(5)]
+        self.assertTrue(all(future.result() for future in futures))
+        self.assertEqual(len(self.requests), 5)
 
 if __name__ == "__main__":
     unittest.main()
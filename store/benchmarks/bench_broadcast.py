@@ -0,0 +1,95 @@
+"""
+Ingest latency of the WebSocket fan-out with 1, 100 and 1000 subscribers.
+Subscribers are in-process fake sockets where every send takes SEND_LATENCY seconds.
+Run from the store directory:
+    python -m benchmarks.bench_broadcast
+"""
+import asyncio
+import json
+import time
+
+from broadcast import Broadcaster
+
+SUBSCRIBERS = (1, 100, 1000)
+PUBLISHES = 20
+BATCH_SIZE = 20
+SEND_LATENCY = 0.001
+
+
+class FakeWebSocket:
+    def __init__(self, expected_rows=0):
+        self.expected_rows = expected_rows
+        self.received_rows = 0
+        self.done = asyncio.Event()
+
+    async def send_text(self, data):
+        await asyncio.sleep(SEND_LATENCY)
+        # Every row is one JSON object, coalesced batches carry several batches worth of rows
+        self.received_rows += data.count("{")
+        if self.received_rows >= self.expected_rows:
+            self.done.set()
+
+    async def close(self, code=1000):
+        pass
+
+
+def make_batch():
+    return [
+        {
+            "road_state": "normal",
+            "user_id": 1,
+            "x": 100.0,
+            "y": 200.0,
+            "z": 16000.0,
+            "latitude": 50.45,
+            "longitude": 30.52,
+            "timestamp": "2024-03-01T12:34:56",
+        }
+        for _ in range(BATCH_SIZE)
+    ]
+
+
+async def bench_sequential(subscribers):
+    """Fan-out before the broadcaster: the handler awaits every socket in turn"""
+    websockets = [FakeWebSocket() for _ in range(subscribers)]
+    data = make_batch()
+    started_at = time.perf_counter()
+    for _ in range(PUBLISHES):
+        for websocket in websockets:
+            await websocket.send_text(json.dumps(data))
+    elapsed = time.perf_counter() - started_at
+    return elapsed / PUBLISHES, elapsed
+
+
+async def bench_broadcaster(subscribers):
+    broadcaster = Broadcaster(queue_size=32, max_pending_rows=100_000, send_timeout=5)
+    websockets = [FakeWebSocket(PUBLISHES * BATCH_SIZE) for _ in range(subscribers)]
+    subscriptions = [broadcaster.subscribe(1, websocket) for websocket in websockets]
+    data = make_batch()
+    ingest_time = 0.0
+    started_at = time.perf_counter()
+    for _ in range(PUBLISHES):
+        publish_started_at = time.perf_counter()
+        broadcaster.publish(1, data)
+        ingest_time += time.perf_counter() - publish_started_at
+        # Let the sender tasks run between requests like the event loop would
+        await asyncio.sleep(0)
+    await asyncio.gather(*(websocket.done.wait() for websocket in websockets))
+    delivered_in = time.perf_counter() - started_at
+    for subscriber in subscriptions:
+        broadcaster.unsubscribe(subscriber)
+    await asyncio.gather(*(subscriber.task for subscriber in subscriptions), return_exceptions=True)
+    return ingest_time / PUBLISHES, delivered_in
+
+
+async def main():
+    print(f"{'subscribers':>11} {'fan-out':<12} {'ingest latency':>15} {'all delivered in':>17}")
+    for subscribers in SUBSCRIBERS:
+        for name, bench in (("sequential", bench_sequential), ("broadcaster", bench_broadcaster)):
+            latency, delivered_in = await bench(subscribers)
+            delivered = f"{delivered_in * 1000:.1f} ms"
+            print(f"{subscribers:>11} {name:<12} {latency * 1000:>12.3f} ms {delivered:>17}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
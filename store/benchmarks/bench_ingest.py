@@ -0,0 +1,72 @@
+"""
+Compare rows/sec of INSERT ... VALUES and COPY ingestion against a local Postgres.
+The database is configured with the same environment variables as the store.
+Run from the store directory:
+    python -m benchmarks.bench_ingest
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from main import (
+    SessionLocal,
+    copy_processed_agent_data,
+    insert_processed_agent_data,
+    processed_agent_data,
+)
+
+BATCH_SIZES = (20, 1_000, 50_000)
+# Every measurement ingests at least this many rows
+MIN_ROWS = 100_000
+# Rows written by the benchmark are deleted afterwards
+BENCHMARK_USER_ID = -1
+
+
+def make_rows(count):
+    started_at = datetime(2024, 1, 1)
+    return [
+        {
+            "road_state": "normal",
+            "user_id": BENCHMARK_USER_ID,
+            "x": 100.0,
+            "y": 200.0,
+            "z": 16000.0 + i % 500,
+            "latitude": 50.45 + i * 1e-6,
+            "longitude": 30.52 + i * 1e-6,
+            "timestamp": started_at + timedelta(milliseconds=i),
+        }
+        for i in range(count)
+    ]
+
+
+async def bench(save, rows, batches):
+    async with SessionLocal() as session:
+        started_at = time.perf_counter()
+        for _ in range(batches):
+            await save(session, rows)
+            await session.commit()
+        elapsed = time.perf_counter() - started_at
+        await session.execute(
+            processed_agent_data.delete().where(
+                processed_agent_data.c.user_id == BENCHMARK_USER_ID
+            )
+        )
+        await session.commit()
+    return elapsed
+
+
+async def main():
+    print(f"{'batch size':>10} {'method':<8} {'rows/sec':>12}")
+    for batch_size in BATCH_SIZES:
+        rows = make_rows(batch_size)
+        batches = max(1, MIN_ROWS // batch_size)
+        for method, save in (
+            ("INSERT", insert_processed_agent_data),
+            ("COPY", copy_processed_agent_data),
+        ):
+            elapsed = await bench(save, rows, batches)
+            print(f"{batch_size:>10} {method:<8} {batch_size * batches / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""
+Query plans and latencies of typical processed_agent_data queries before and after adding the indexes.
+A synthetic copy of the table is generated in the configured database and dropped afterwards.
+Run from the store directory:
+    python -m benchmarks.bench_queries [rows]
+"""
+import asyncio
+import sys
+import time
+
+from sqlalchemy import text
+
+from main import engine
+
+TABLE = "bench_processed_agent_data"
+DEFAULT_ROWS = 50_000_000
+# Rows generated per INSERT ... SELECT statement
+FILL_CHUNK = 5_000_000
+USERS = 10_000
+
+QUERIES = {
+    "user time range": f"""
+        SELECT * FROM {TABLE}
+        WHERE user_id = 42 AND timestamp >= '2024-01-10' AND timestamp < '2024-01-11'
+        ORDER BY timestamp, id
+    """,
+    "user keyset page": f"""
+        SELECT * FROM {TABLE}
+        WHERE user_id = 42 AND (timestamp, id) > ('2024-01-10', 0)
+        ORDER BY timestamp, id
+        LIMIT 100
+    """,
+    "bounding box": f"""
+        SELECT * FROM {TABLE}
+        WHERE point(longitude, latitude) <@ box(point(30.50, 50.44), point(30.51, 50.45))
+    """,
+}
+
+INDEXES = (
+    f"CREATE INDEX ON {TABLE} (user_id, timestamp, id)",
+    f"CREATE INDEX ON {TABLE} USING gist (point(longitude, latitude))",
+)
+
+
+async def fill(connection, rows):
+    await connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    await connection.execute(
+        text(
+            f"""
+            CREATE TABLE {TABLE} (
+                id SERIAL PRIMARY KEY,
+                road_state VARCHAR(255) NOT NULL,
+                user_id INTEGER NOT NULL,
+                x FLOAT,
+                y FLOAT,
+                z FLOAT,
+                latitude FLOAT,
+                longitude FLOAT,
+                timestamp TIMESTAMP
+            )
+            """
+        )
+    )
+    for start in range(0, rows, FILL_CHUNK):
+        end = min(rows, start + FILL_CHUNK)
+        # Readings of every user are spread evenly over a month
+        await connection.execute(
+            text(
+                f"""
+                INSERT INTO {TABLE} (road_state, user_id, x, y, z, latitude, longitude, timestamp)
+                SELECT
+                    (ARRAY['normal', 'small pits', 'large pits'])[1 + (i % 3)],
+                    i % {USERS},
+                    random() * 1000,
+                    random() * 1000,
+                    12000 + random() * 8000,
+                    50.30 + random() * 0.30,
+                    30.30 + random() * 0.50,
+                    TIMESTAMP '2024-01-01' + (i::float / {rows}) * INTERVAL '30 days'
+                FROM generate_series({start}, {end - 1}) AS i
+                """
+            )
+        )
+        print(f"Generated {end:,} / {rows:,} rows", flush=True)
+    await connection.execute(text(f"ANALYZE {TABLE}"))
+
+
+async def explain(connection, title):
+    print(f"\n===== {title} =====")
+    for name, query in QUERIES.items():
+        # Run once to warm the cache, then measure
+        await connection.execute(text(query))
+        started_at = time.perf_counter()
+        await connection.execute(text(query))
+        elapsed = time.perf_counter() - started_at
+        plan = (await connection.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {query}"))).scalars().all()
+        print(f"\n--- {name}: {elapsed * 1000:.2f} ms")
+        print("\n".join(plan))
+
+
+async def main(rows):
+    async with engine.connect() as connection:
+        await connection.execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            await fill(connection, rows)
+            await explain(connection, "without indexes")
+            for index in INDEXES:
+                await connection.execute(text(index))
+            await connection.execute(text(f"ANALYZE {TABLE}"))
+            await explain(connection, "with indexes")
+        finally:
+            await connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS))
@@ -0,0 +1,67 @@
+"""
+Reduction of defect detections to road_defects rows and the cost of clustering a batch.
+Vehicles drive over the same potholes and report them with a few meters of GPS error.
+Runs without a database, from the store directory:
+    python -m benchmarks.bench_road_defects
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from road_defects import cluster_detections
+
+POTHOLES = 1_000
+VEHICLES = 500
+# Share of readings that are detections, the rest are normal road
+DETECTION_SHARE = 0.05
+# Standard deviation of the GPS error in meters
+GPS_ERROR = 3
+RADIUS = 10
+BATCH_SIZE = 1_000
+
+
+def make_rows(count, rng):
+    potholes = [(50.40 + rng.random() * 0.1, 30.45 + rng.random() * 0.15) for _ in range(POTHOLES)]
+    started_at = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        latitude, longitude = potholes[rng.randrange(POTHOLES)]
+        detection = rng.random() < DETECTION_SHARE
+        rows.append(
+            {
+                "road_state": rng.choice(("small pits", "large pits")) if detection else "normal",
+                "user_id": rng.randrange(VEHICLES),
+                "latitude": latitude + rng.gauss(0, GPS_ERROR) / 111_320,
+                "longitude": longitude + rng.gauss(0, GPS_ERROR) / 71_000,
+                "timestamp": started_at + timedelta(milliseconds=i),
+            }
+        )
+    return rows
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'readings':>10} {'detections':>11} {'defects':>8} {'us/reading':>11}")
+    for count in (100_000, 1_000_000):
+        rows = make_rows(count, rng)
+        started_at = time.perf_counter()
+        # Stands in for the table: every batch is matched against the defects stored so far and upserted
+        defects = {}
+        hits = {}
+        for start in range(0, count, BATCH_SIZE):
+            for update in cluster_detections(rows[start:start + BATCH_SIZE], RADIUS, defects):
+                key = (update["defect_type"], update["cell_lat"], update["cell_lon"])
+                latitude, longitude = defects.get(key, (0.0, 0.0))
+                total = hits.get(key, 0) + update["hits"]
+                defects[key] = (
+                    (latitude * hits.get(key, 0) + update["latitude"] * update["hits"]) / total,
+                    (longitude * hits.get(key, 0) + update["longitude"] * update["hits"]) / total,
+                )
+                hits[key] = total
+        elapsed = time.perf_counter() - started_at
+        detections = sum(row["road_state"] != "normal" for row in rows)
+        print(f"{count:>10} {detections:>11} {len(defects):>8} {elapsed / count * 1e6:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
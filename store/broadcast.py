@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set
+
+from fastapi import WebSocket
+
+try:
+    import msgpack
+except ImportError:  # The binary frame format is optional
+    msgpack = None
+
+FRAME_FORMATS = ("json", "msgpack") if msgpack is not None else ("json",)
+
+
+class Frame:
+    """A batch of rows encoded at most once per wire format and shared by every subscriber"""
+
+    __slots__ = ("rows", "_text", "_binary")
+
+    def __init__(self, rows: List[dict]):
+        self.rows = rows
+        self._text: Optional[str] = None
+        self._binary: Optional[bytes] = None
+
+    def text(self) -> str:
+        if self._text is None:
+            self._text = json.dumps(self.rows)
+        return self._text
+
+    def binary(self) -> bytes:
+        if self._binary is None:
+            self._binary = msgpack.packb(self.rows)
+        return self._binary
+
+
+class Subscriber:
+    """WebSocket connection with its own bounded queue of pending frames"""
+
+    def __init__(self, user_id: int, websocket: WebSocket, frame_format: str):
+        self.user_id = user_id
+        self.websocket = websocket
+        self.frame_format = frame_format
+        self.pending: Deque[Frame] = deque()
+        self.pending_rows = 0
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class Broadcaster:
+    """
+    Fans batches out to the WebSocket subscribers of a user without waiting for the sockets.
+    Every connection is served by its own sender task. When a connection falls queue_size batches behind,
+    new data is coalesced into its last pending batch, and a connection that still has rows pending when
+    a batch takes it over max_pending_rows undelivered rows is evicted, so a single large batch is delivered.
+    Connections that fail or time out on send are dropped.
+    """
+
+    def __init__(self, queue_size: int, max_pending_rows: int, send_timeout: float):
+        self.queue_size = max(1, queue_size)
+        self.max_pending_rows = max_pending_rows
+        self.send_timeout = send_timeout
+        self.subscriptions: Dict[int, Set[Subscriber]] = {}
+        self.sent = 0
+        self.coalesced = 0
+        self.evicted = 0
+
+    def subscribe(self, user_id: int, websocket: WebSocket, frame_format: str = "json") -> Subscriber:
+        subscriber = Subscriber(user_id, websocket, frame_format)
+        self.subscriptions.setdefault(user_id, set()).add(subscriber)
+        subscriber.task = asyncio.create_task(self._send_loop(subscriber))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self.subscriptions.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscriptions[subscriber.user_id]
+        if subscriber.task is not None and subscriber.task is not asyncio.current_task():
+            subscriber.task.cancel()
+
+    def publish(self, user_id: int, data: List[dict]):
+        """Queue a batch for every subscriber of the user, never waits for the sockets"""
+        subscribers = self.subscriptions.get(user_id)
+        if not subscribers:
+            return
+        frame = Frame(data)
+        for subscriber in list(subscribers):
+            backlog = subscriber.pending_rows
+            if len(subscriber.pending) < self.queue_size:
+                subscriber.pending.append(frame)
+            else:
+                # Frames are shared between subscribers, so the coalesced frame is a new one
+                subscriber.pending[-1] = Frame(subscriber.pending[-1].rows + data)
+                self.coalesced += 1
+            subscriber.pending_rows += len(data)
+            if backlog and subscriber.pending_rows > self.max_pending_rows:
+                self._evict(subscriber)
+                continue
+            subscriber.ready.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": sum(len(subscribers) for subscribers in self.subscriptions.values()),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "evicted": self.evicted,
+        }
+
+    def _evict(self, subscriber: Subscriber):
+        logging.warning(
+            f"Evicting slow WebSocket subscriber of user {subscriber.user_id} "
+            f"with {subscriber.pending_rows} pending rows"
+        )
+        self.evicted += 1
+        self.unsubscribe(subscriber)
+        # 1013: try again later
+        asyncio.create_task(self._close(subscriber.websocket, code=1013))
+
+    async def _close(self, websocket: WebSocket, code: int):
+        try:
+            await asyncio.wait_for(websocket.close(code=code), self.send_timeout)
+        except Exception:
+            pass
+
+    async def _send_loop(self, subscriber: Subscriber):
+        websocket = subscriber.websocket
+        while True:
+            await subscriber.ready.wait()
+            while subscriber.pending:
+                frame = subscriber.pending.popleft()
+                subscriber.pending_rows -= len(frame.rows)
+                if subscriber.frame_format == "msgpack":
+                    send = websocket.send_bytes(frame.binary())
+                else:
+                    send = websocket.send_text(frame.text())
+                try:
+                    await asyncio.wait_for(send, self.send_timeout)
+                except Exception as e:
+                    # The socket is closed or too slow, drop it so the set does not keep dead connections
+                    logging.info(f"Dropping WebSocket subscriber of user {subscriber.user_id}: {e!r}")
+                    self.unsubscribe(subscriber)
+                    await self._close(websocket, code=1011)
+                    return
+                self.sent += 1
+            subscriber.ready.clear()
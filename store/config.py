@@ -14,3 +14,37 @@ POSTGRES_PORT = try_parse(int, os.environ.get("POSTGRES_PORT")) or 5432
 POSTGRES_USER = os.environ.get("POSTGRES_USER") or "user"
 POSTGRES_PASSWORD = os.environ.get("POSTGRES_PASS") or "pass"
 POSTGRES_DB = os.environ.get("POSTGRES_DB") or "test_db"
+
+# Database connection pool
+POOL_SIZE = try_parse(int, os.environ.get("POOL_SIZE")) or 10
+POOL_MAX_OVERFLOW = try_parse(int, os.environ.get("POOL_MAX_OVERFLOW")) or 20
+# Seconds after which a pooled connection is recycled
+POOL_RECYCLE = try_parse(int, os.environ.get("POOL_RECYCLE")) or 1800
+# Seconds to wait for a free connection before failing the request
+POOL_TIMEOUT = try_parse(float, os.environ.get("POOL_TIMEOUT")) or 30
+
+# Batches with at least COPY_THRESHOLD rows are ingested with COPY instead of INSERT
+COPY_THRESHOLD = try_parse(int, os.environ.get("COPY_THRESHOLD")) or 20
+
+# Largest request body accepted after gzip decompression, in bytes
+MAX_REQUEST_BODY_SIZE = try_parse(int, os.environ.get("MAX_REQUEST_BODY_SIZE")) or 64 * 1024 * 1024
+
+# Road defect detections closer than about this many meters are merged into one road_defects row
+ROAD_DEFECT_RADIUS = try_parse(float, os.environ.get("ROAD_DEFECT_RADIUS")) or 10
+
+# Pagination of the processed agent data list
+DEFAULT_PAGE_SIZE = try_parse(int, os.environ.get("DEFAULT_PAGE_SIZE")) or 100
+MAX_PAGE_SIZE = try_parse(int, os.environ.get("MAX_PAGE_SIZE")) or 1000
+# Rows fetched per round trip when streaming
+STREAM_CHUNK_SIZE = try_parse(int, os.environ.get("STREAM_CHUNK_SIZE")) or 1000
+
+# Set PARTITIONING=1 after applying docker/db/migrations/002_processed_agent_data_partitioning.sql
+PARTITIONING = os.environ.get("PARTITIONING") == "1"
+# Monthly partitions are created this many months ahead
+PARTITION_MONTHS_AHEAD = try_parse(int, os.environ.get("PARTITION_MONTHS_AHEAD")) or 3
+
+# WebSocket fan-out: pending batches per connection before coalescing,
+# undelivered rows before a slow connection is evicted and send timeout in seconds
+WS_QUEUE_SIZE = try_parse(int, os.environ.get("WS_QUEUE_SIZE")) or 32
+WS_MAX_PENDING_ROWS = try_parse(int, os.environ.get("WS_MAX_PENDING_ROWS")) or 10000
+WS_SEND_TIMEOUT = try_parse(float, os.environ.get("WS_SEND_TIMEOUT")) or 5
@@ -0,0 +1,10 @@
+-- Indexes for per-user, time range and bounding box queries on an existing database.
+-- CONCURRENTLY keeps the table writable, so run this file outside of a transaction:
+--   psql -f 001_processed_agent_data_indexes.sql
+CREATE INDEX CONCURRENTLY IF NOT EXISTS processed_agent_data_user_id_timestamp_idx
+    ON processed_agent_data (user_id, timestamp, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS processed_agent_data_location_idx
+    ON processed_agent_data USING gist (point(longitude, latitude));
+
+ANALYZE processed_agent_data;
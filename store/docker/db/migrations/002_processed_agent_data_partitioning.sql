@@ -0,0 +1,85 @@
+-- Optional monthly range partitioning of processed_agent_data on timestamp.
+-- The table is rebuilt as a partitioned table and the existing rows are copied over,
+-- run it in a maintenance window. Afterwards start the store with PARTITIONING=1 so it
+-- creates the partitions of the upcoming months ahead of time.
+BEGIN;
+
+ALTER TABLE processed_agent_data RENAME TO processed_agent_data_unpartitioned;
+ALTER INDEX processed_agent_data_pkey RENAME TO processed_agent_data_unpartitioned_pkey;
+ALTER INDEX IF EXISTS processed_agent_data_user_id_timestamp_idx RENAME TO processed_agent_data_unpartitioned_user_id_timestamp_idx;
+ALTER INDEX IF EXISTS processed_agent_data_location_idx RENAME TO processed_agent_data_unpartitioned_location_idx;
+
+-- The partition key has to be part of the primary key
+CREATE TABLE processed_agent_data (
+    id INTEGER NOT NULL DEFAULT nextval('processed_agent_data_id_seq'),
+    road_state VARCHAR(255) NOT NULL,
+    user_id INTEGER NOT NULL,
+    x FLOAT,
+    y FLOAT,
+    z FLOAT,
+    latitude FLOAT,
+    longitude FLOAT,
+    timestamp TIMESTAMP NOT NULL,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+ALTER SEQUENCE processed_agent_data_id_seq OWNED BY processed_agent_data.id;
+
+CREATE INDEX processed_agent_data_user_id_timestamp_idx ON processed_agent_data (user_id, timestamp, id);
+CREATE INDEX processed_agent_data_location_idx ON processed_agent_data USING gist (point(longitude, latitude));
+
+-- Rows outside of every monthly partition
+CREATE TABLE processed_agent_data_default PARTITION OF processed_agent_data DEFAULT;
+
+-- Create the monthly partitions from the month of from_date up to months_ahead months later.
+-- A partition is filled from the default partition before it is attached, so rows that
+-- arrived before their partition existed are moved instead of blocking the creation.
+CREATE OR REPLACE FUNCTION ensure_processed_agent_data_partitions(from_date DATE, months_ahead INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE;
+    month_end DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        month_start := date_trunc('month', from_date)::DATE + make_interval(months => i);
+        month_end := month_start + INTERVAL '1 month';
+        partition_name := format('processed_agent_data_%s', to_char(month_start, 'YYYY_MM'));
+        CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+
+        EXECUTE format('CREATE TABLE %I (LIKE processed_agent_data INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name);
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM processed_agent_data_default WHERE timestamp >= %L AND timestamp < %L RETURNING *) '
+            'INSERT INTO %I SELECT * FROM moved',
+            month_start, month_end, partition_name
+        );
+        EXECUTE format(
+            'ALTER TABLE processed_agent_data ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name, month_start, month_end
+        );
+        created := created + 1;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partitions for the existing data and the next months
+SELECT ensure_processed_agent_data_partitions(
+    COALESCE((SELECT min(timestamp) FROM processed_agent_data_unpartitioned), now())::DATE,
+    (
+        SELECT (extract(YEAR FROM age(date_trunc('month', now()), date_trunc('month', COALESCE(min(timestamp), now())))) * 12
+            + extract(MONTH FROM age(date_trunc('month', now()), date_trunc('month', COALESCE(min(timestamp), now())))))::INTEGER + 3
+        FROM processed_agent_data_unpartitioned
+    )
+);
+
+INSERT INTO processed_agent_data
+SELECT id, road_state, user_id, x, y, z, latitude, longitude, COALESCE(timestamp, 'epoch'::TIMESTAMP)
+FROM processed_agent_data_unpartitioned;
+
+DROP TABLE processed_agent_data_unpartitioned;
+
+COMMIT;
+
+ANALYZE processed_agent_data;
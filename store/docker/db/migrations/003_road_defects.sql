@@ -0,0 +1,55 @@
+-- Road defects clustered from the detections on a grid of cells, see road_defects.py.
+-- The store merges the detections of every new batch into the table. The existing detections
+-- are grouped here once by grid cell of the default ROAD_DEFECT_RADIUS of 10 meters, without
+-- the store's merging across neighboring cells.
+-- Run it before deploying the store version that writes the table, so no detection is counted twice.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS road_defects (
+    id SERIAL PRIMARY KEY,
+    defect_type VARCHAR(32) NOT NULL,
+    cell_lat INTEGER NOT NULL,
+    cell_lon INTEGER NOT NULL,
+    latitude FLOAT NOT NULL,
+    longitude FLOAT NOT NULL,
+    hits INTEGER NOT NULL,
+    severity INTEGER NOT NULL,
+    first_seen TIMESTAMP NOT NULL,
+    last_seen TIMESTAMP NOT NULL,
+    CONSTRAINT road_defects_cell_key UNIQUE (cell_lat, cell_lon, defect_type)
+);
+
+CREATE INDEX IF NOT EXISTS road_defects_location_idx ON road_defects USING gist (point(longitude, latitude));
+
+-- Same grid as grid_cell in road_defects.py: 10 m / 111320 m per degree
+WITH detections AS (
+    SELECT
+        CASE WHEN road_state = 'bumps' THEN 'bump' ELSE 'pit' END AS defect_type,
+        CASE WHEN road_state = 'large pits' THEN 2 ELSE 1 END AS severity,
+        floor(latitude / (10 / 111320.0))::INTEGER AS cell_lat,
+        latitude,
+        longitude,
+        timestamp
+    FROM processed_agent_data
+    WHERE road_state IN ('small pits', 'large pits', 'bumps')
+        AND latitude IS NOT NULL AND longitude IS NOT NULL AND timestamp IS NOT NULL
+), cells AS (
+    SELECT
+        *,
+        floor(
+            longitude / ((10 / 111320.0) / cos(radians(greatest(least((cell_lat + 0.5) * (10 / 111320.0), 89.0), -89.0))))
+        )::INTEGER AS cell_lon
+    FROM detections
+)
+INSERT INTO road_defects (
+    defect_type, cell_lat, cell_lon, latitude, longitude, hits, severity, first_seen, last_seen
+)
+SELECT
+    defect_type, cell_lat, cell_lon, avg(latitude), avg(longitude), count(*), max(severity), min(timestamp), max(timestamp)
+FROM cells
+GROUP BY cell_lat, cell_lon, defect_type
+ON CONFLICT ON CONSTRAINT road_defects_cell_key DO NOTHING;
+
+COMMIT;
+
+ANALYZE road_defects;
@@ -8,4 +8,26 @@ CREATE TABLE processed_agent_data (
     latitude FLOAT,
     longitude FLOAT,
     timestamp TIMESTAMP
-);
\ No newline at end of file
+);
+
+-- Per-user time range queries and keyset pagination in time order
+CREATE INDEX processed_agent_data_user_id_timestamp_idx ON processed_agent_data (user_id, timestamp, id);
+-- Bounding box queries: point(longitude, latitude) <@ box(...)
+CREATE INDEX processed_agent_data_location_idx ON processed_agent_data USING gist (point(longitude, latitude));
+
+-- Road defects clustered from the detections on a grid of cells, see road_defects.py
+CREATE TABLE road_defects (
+    id SERIAL PRIMARY KEY,
+    defect_type VARCHAR(32) NOT NULL,
+    cell_lat INTEGER NOT NULL,
+    cell_lon INTEGER NOT NULL,
+    latitude FLOAT NOT NULL,
+    longitude FLOAT NOT NULL,
+    hits INTEGER NOT NULL,
+    severity INTEGER NOT NULL,
+    first_seen TIMESTAMP NOT NULL,
+    last_seen TIMESTAMP NOT NULL,
+    CONSTRAINT road_defects_cell_key UNIQUE (cell_lat, cell_lon, defect_type)
+);
+
+CREATE INDEX road_defects_location_idx ON road_defects USING gist (point(longitude, latitude));
@@ -1,24 +1,33 @@
+import asyncio
 import json
-from datetime import datetime
-from typing import Set, Dict, List
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Literal, Optional, AsyncIterator
 
-from fastapi import Depends
+from fastapi import Depends, Query, Response
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, field_validator
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 
 from sqlalchemy import (
-    create_engine,
     MetaData,
     Table,
     Column,
     Integer,
     String,
     Float,
-    DateTime
+    DateTime,
+    Index,
+    Select,
+    UniqueConstraint,
+    func,
+    text,
+    tuple_,
 )
-from sqlalchemy.orm import Session
-from sqlalchemy.orm import sessionmaker
 
 from config import (
     POSTGRES_HOST,
@@ -26,13 +35,36 @@ from config import (
     POSTGRES_DB,
     POSTGRES_USER,
     POSTGRES_PASSWORD,
+    COPY_THRESHOLD,
+    MAX_REQUEST_BODY_SIZE,
+    POOL_SIZE,
+    POOL_MAX_OVERFLOW,
+    POOL_RECYCLE,
+    POOL_TIMEOUT,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    STREAM_CHUNK_SIZE,
+    PARTITIONING,
+    PARTITION_MONTHS_AHEAD,
+    ROAD_DEFECT_RADIUS,
+    WS_QUEUE_SIZE,
+    WS_MAX_PENDING_ROWS,
+    WS_SEND_TIMEOUT,
 )
+from broadcast import Broadcaster, FRAME_FORMATS
+from request_encoding import GZipRequestMiddleware
+from road_defects import cluster_detections, neighbor_cells
 
-# FastAPI app setup
-app = FastAPI()
 # SQLAlchemy setup
-DATABASE_URL = f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-engine = create_engine(DATABASE_URL)
+DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+engine = create_async_engine(
+    DATABASE_URL,
+    pool_size=POOL_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW,
+    pool_recycle=POOL_RECYCLE,
+    pool_timeout=POOL_TIMEOUT,
+    pool_pre_ping=True,
+)
 metadata = MetaData()
 # Define the ProcessedAgentData table
 processed_agent_data = Table(
@@ -47,25 +79,108 @@ processed_agent_data = Table(
     Column("latitude", Float),
     Column("longitude", Float),
     Column("timestamp", DateTime),
+    # Per-user time range queries and keyset pagination in time order
+    Index("processed_agent_data_user_id_timestamp_idx", "user_id", "timestamp", "id"),
+)
+# Bounding box queries are served by a GiST index on this expression
+processed_agent_data_location = func.point(
+    processed_agent_data.c.longitude, processed_agent_data.c.latitude
+)
+Index(
+    "processed_agent_data_location_idx",
+    processed_agent_data_location,
+    postgresql_using="gist",
+)
+# Road defects clustered from the detections on a grid, see road_defects.py
+road_defects = Table(
+    "road_defects",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("defect_type", String),
+    Column("cell_lat", Integer),
+    Column("cell_lon", Integer),
+    Column("latitude", Float),
+    Column("longitude", Float),
+    Column("hits", Integer),
+    Column("severity", Integer),
+    Column("first_seen", DateTime),
+    Column("last_seen", DateTime),
+    # Also serves the lookup of the defects in the cells around new detections
+    UniqueConstraint("cell_lat", "cell_lon", "defect_type", name="road_defects_cell_key"),
+)
+road_defects_location = func.point(road_defects.c.longitude, road_defects.c.latitude)
+Index("road_defects_location_idx", road_defects_location, postgresql_using="gist")
+SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+# Columns written by the ingestion path, in COPY order
+INSERT_COLUMNS = (
+    "road_state",
+    "user_id",
+    "x",
+    "y",
+    "z",
+    "latitude",
+    "longitude",
+    "timestamp",
 )
-SessionLocal = sessionmaker(bind=engine)
 
 
-def get_db():
+async def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
 
 
 # Function to read data from the database
-def read_data(db: Session):
-    # Query data using the session
-    query_result = db.query(processed_agent_data).all()
-    return query_result
+async def read_data(db: AsyncSession, query: Select) -> AsyncIterator[list]:
+    # Rows are pulled from a server-side cursor in chunks, so memory does not depend on the result size
+    result = await db.stream(query.execution_options(yield_per=STREAM_CHUNK_SIZE))
+    async for rows in result.partitions():
+        yield rows
+
+
+async def ensure_partitions():
+    """Create the monthly partitions ahead of time, see docker/db/migrations/002_processed_agent_data_partitioning.sql"""
+    async with engine.begin() as connection:
+        created = (
+            await connection.execute(
+                text("SELECT ensure_processed_agent_data_partitions(CURRENT_DATE, :months_ahead)"),
+                {"months_ahead": PARTITION_MONTHS_AHEAD},
+            )
+        ).scalar()
+    if created:
+        logging.info(f"Created {created} processed_agent_data partitions")
+
+
+async def maintain_partitions():
+    while True:
+        try:
+            await ensure_partitions()
+        except Exception as e:
+            logging.error(f"Error creating processed_agent_data partitions: {e}")
+        await asyncio.sleep(24 * 60 * 60)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        # Databases initialised before road_defects existed, or from a structure.sql without it
+        await connection.run_sync(metadata.create_all, tables=[road_defects])
+    partition_task = asyncio.create_task(maintain_partitions()) if PARTITIONING else None
+    yield
+    if partition_task is not None:
+        partition_task.cancel()
+    await engine.dispose()
+
 
 Base = declarative_base()
+# FastAPI app setup
+app = FastAPI(lifespan=lifespan)
+# The hub gzips large batches
+app.add_middleware(GZipRequestMiddleware, max_size=MAX_REQUEST_BODY_SIZE)
+
 # SQLAlchemy model
 class ProcessedAgentDataInDB(BaseModel):
     id: int
@@ -127,44 +242,93 @@ class ProcessedAgentDataResponse(BaseModel):
     timestamp: datetime
 
 
+class ProcessedAgentDataFilter(BaseModel):
+    user_id: Optional[int] = None
+    road_state: Optional[str] = None
+    # Time range, start inclusive and end exclusive
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    # Bounding box
+    min_latitude: Optional[float] = None
+    max_latitude: Optional[float] = None
+    min_longitude: Optional[float] = None
+    max_longitude: Optional[float] = None
+
+
+class RoadDefectResponse(BaseModel):
+    id: int
+    defect_type: str
+    latitude: float
+    longitude: float
+    hits: int
+    severity: int
+    first_seen: datetime
+    last_seen: datetime
+
+
+class RoadDefectFilter(BaseModel):
+    defect_type: Optional[Literal["pit", "bump"]] = None
+    min_hits: Optional[int] = None
+    min_severity: Optional[int] = None
+    # Defects hit since this time
+    seen_since: Optional[datetime] = None
+    # Bounding box
+    min_latitude: Optional[float] = None
+    max_latitude: Optional[float] = None
+    min_longitude: Optional[float] = None
+    max_longitude: Optional[float] = None
+
+
 # WebSocket subscriptions
-subscriptions: Dict[int, Set[WebSocket]] = {}
+broadcaster = Broadcaster(
+    queue_size=WS_QUEUE_SIZE,
+    max_pending_rows=WS_MAX_PENDING_ROWS,
+    send_timeout=WS_SEND_TIMEOUT,
+)
 
 
 # FastAPI WebSocket endpoint
 @app.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int):
+async def websocket_endpoint(websocket: WebSocket, user_id: int, format: str = "json"):
+    # Frames are JSON text by default, "msgpack" selects binary frames when msgpack is installed
+    frame_format = format if format in FRAME_FORMATS else "json"
     await websocket.accept()
-    if user_id not in subscriptions:
-        subscriptions[user_id] = set()
-    subscriptions[user_id].add(websocket)
+    subscriber = broadcaster.subscribe(user_id, websocket, frame_format)
     try:
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
-        subscriptions[user_id].remove(websocket)
+        pass
+    finally:
+        broadcaster.unsubscribe(subscriber)
 
 
 # Function to send data to subscribed users
-async def send_data_to_subscribers(user_id: int, data):
-    if user_id in subscriptions:
-        for websocket in subscriptions[user_id]:
-            await websocket.send_json(json.dumps(data))
+def send_data_to_subscribers(data: List[dict]):
+    # Rows are grouped per user, delivery happens in the background
+    rows_by_user: Dict[int, List[dict]] = {}
+    for row in data:
+        rows_by_user.setdefault(row["user_id"], []).append(row)
+    for user_id, rows in rows_by_user.items():
+        broadcaster.publish(user_id, rows)
 
 
 # FastAPI CRUD endpoints
 
-def get_session():
-    with SessionLocal() as session:
+async def get_session():
+    async with SessionLocal() as session:
         yield session
 
-# Create
-@app.post("/processed_agent_data/")
-async def create_processed_agent_data(data: List[ProcessedAgentData], session: Session = Depends(get_session)):
-    if len(data) == 0:
-        return
 
-    flatten_data = [
+def to_naive_utc(value: datetime) -> datetime:
+    """The timestamp column has no time zone, aware timestamps are stored in UTC"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def flatten_processed_agent_data(data: List[ProcessedAgentData]) -> List[dict]:
+    return [
         {
             "road_state": p_agent_data.road_state,
             "user_id": p_agent_data.agent_data.user_id,
@@ -173,43 +337,215 @@ async def create_processed_agent_data(data: List[ProcessedAgentData], session: S
             "z": p_agent_data.agent_data.accelerometer.z,
             "latitude": p_agent_data.agent_data.gps.latitude,
             "longitude": p_agent_data.agent_data.gps.longitude,
-            "timestamp": p_agent_data.agent_data.timestamp,
+            "timestamp": to_naive_utc(p_agent_data.agent_data.timestamp),
         }
         for p_agent_data in data
     ]
 
-    insert_query = processed_agent_data.insert().values(flatten_data)
-    session.execute(insert_query)
 
-    user_id = data[0].agent_data.user_id
-    await send_data_to_subscribers(
-        user_id,
+async def insert_processed_agent_data(session: AsyncSession, rows: List[dict]):
+    """Insert rows with multi-row INSERT ... VALUES statements, batched below the driver parameter limit"""
+    await session.execute(processed_agent_data.insert(), rows)
+
+
+async def copy_processed_agent_data(session: AsyncSession, rows: List[dict]):
+    """Stream rows into the table with binary COPY ... FROM STDIN"""
+    # COPY runs on the session connection so it is part of the session transaction
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        processed_agent_data.name,
+        records=[tuple(row[column] for column in INSERT_COLUMNS) for row in rows],
+        columns=INSERT_COLUMNS,
+    )
+
+
+async def upsert_road_defects(session: AsyncSession, rows: List[dict]):
+    """Merge the defect detections of a batch into road_defects, one upsert per batch"""
+    cells = neighbor_cells(rows, ROAD_DEFECT_RADIUS)
+    if not cells:
+        return
+    cell_lats, cell_lons = zip(*cells)
+    # The stored defects the detections can join, the cells are passed as two arrays
+    existing_defects = await session.execute(
+        text(
+            "SELECT defect_type, road_defects.cell_lat, road_defects.cell_lon, latitude, longitude "
+            "FROM road_defects JOIN unnest(CAST(:cell_lats AS INTEGER[]), CAST(:cell_lons AS INTEGER[])) "
+            "AS cells (cell_lat, cell_lon) "
+            "ON road_defects.cell_lat = cells.cell_lat AND road_defects.cell_lon = cells.cell_lon"
+        ),
+        {"cell_lats": list(cell_lats), "cell_lons": list(cell_lons)},
+    )
+    defects = {
+        (row.defect_type, row.cell_lat, row.cell_lon): (row.latitude, row.longitude)
+        for row in existing_defects
+    }
+    updates = cluster_detections(rows, ROAD_DEFECT_RADIUS, defects)
+    statement = pg_insert(road_defects)
+    existing = road_defects.c
+    new = statement.excluded
+    hits = existing.hits + new.hits
+    await session.execute(
+        statement.on_conflict_do_update(
+            constraint="road_defects_cell_key",
+            set_={
+                # The position is the mean of every hit
+                "latitude": (existing.latitude * existing.hits + new.latitude * new.hits) / hits,
+                "longitude": (existing.longitude * existing.hits + new.longitude * new.hits) / hits,
+                "hits": hits,
+                "severity": func.greatest(existing.severity, new.severity),
+                "first_seen": func.least(existing.first_seen, new.first_seen),
+                "last_seen": func.greatest(existing.last_seen, new.last_seen),
+            },
+        ),
+        updates,
+    )
+
+
+async def save_processed_agent_data(session: AsyncSession, rows: List[dict]):
+    """
+    Save rows in one transaction, batches of COPY_THRESHOLD rows and more are ingested with COPY.
+    Their defect detections are merged into road_defects in the same transaction.
+    """
+    try:
+        if len(rows) >= COPY_THRESHOLD:
+            await copy_processed_agent_data(session, rows)
+        else:
+            await insert_processed_agent_data(session, rows)
+        await upsert_road_defects(session, rows)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+
+
+# Create
+@app.post("/processed_agent_data/")
+async def create_processed_agent_data(data: List[ProcessedAgentData], session: AsyncSession = Depends(get_session)):
+    if len(data) == 0:
+        return
+
+    flatten_data = flatten_processed_agent_data(data)
+    await save_processed_agent_data(session, flatten_data)
+
+    send_data_to_subscribers(
         [{**d, "timestamp": d["timestamp"].isoformat()} for d in flatten_data],
     )
 
 # Read
 @app.get("/processed_agent_data/{processed_agent_data_id}", response_model=ProcessedAgentDataInDB)
-def read_processed_agent_data(processed_agent_data_id: int, session: Session = Depends(get_session)):
+async def read_processed_agent_data(processed_agent_data_id: int, session: AsyncSession = Depends(get_session)):
     query = processed_agent_data.select().where(processed_agent_data.c.id == processed_agent_data_id)
 
-    result = session.execute(query).fetchone()
+    result = (await session.execute(query)).fetchone()
 
     if result is None:
         raise HTTPException(status_code=404, detail="ProcessedAgentData not found")
 
     return result
 
-# List
-@app.get("/processed_agent_data/", response_model=List[ProcessedAgentDataInDB])
-def list_processed_agent_data(session: Session = Depends(get_session)):
+def encode_cursor(row, order_by: str) -> str:
+    if order_by == "timestamp":
+        return f"{row.timestamp.isoformat()}|{row.id}"
+    return str(row.id)
+
+
+def build_list_query(
+    filters: ProcessedAgentDataFilter,
+    order_by: str,
+    cursor: Optional[str],
+    limit: Optional[int],
+) -> Select:
+    """Filtered query ordered by a unique key, the cursor is the key of the last row of the previous page"""
+    table = processed_agent_data.c
     query = processed_agent_data.select()
+    if filters.user_id is not None:
+        query = query.where(table.user_id == filters.user_id)
+    if filters.road_state is not None:
+        query = query.where(table.road_state == filters.road_state)
+    if filters.start_time is not None:
+        query = query.where(table.timestamp >= to_naive_utc(filters.start_time))
+    if filters.end_time is not None:
+        query = query.where(table.timestamp < to_naive_utc(filters.end_time))
+    bounds = (filters.min_longitude, filters.min_latitude, filters.max_longitude, filters.max_latitude)
+    if None not in bounds:
+        # A complete bounding box is matched against the GiST location index
+        query = query.where(
+            processed_agent_data_location.op("<@")(
+                func.box(func.point(bounds[0], bounds[1]), func.point(bounds[2], bounds[3]))
+            )
+        )
+    else:
+        if filters.min_latitude is not None:
+            query = query.where(table.latitude >= filters.min_latitude)
+        if filters.max_latitude is not None:
+            query = query.where(table.latitude <= filters.max_latitude)
+        if filters.min_longitude is not None:
+            query = query.where(table.longitude >= filters.min_longitude)
+        if filters.max_longitude is not None:
+            query = query.where(table.longitude <= filters.max_longitude)
+
+    try:
+        if order_by == "timestamp":
+            query = query.order_by(table.timestamp, table.id)
+            if cursor is not None:
+                timestamp, id_ = cursor.rsplit("|", 1)
+                query = query.where(
+                    tuple_(table.timestamp, table.id)
+                    > (to_naive_utc(datetime.fromisoformat(timestamp)), int(id_))
+                )
+        else:
+            query = query.order_by(table.id)
+            if cursor is not None:
+                query = query.where(table.id > int(cursor))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+async def stream_ndjson(query: Select) -> AsyncIterator[str]:
+    # The session is owned by the generator because the response outlives the request dependencies
+    async with SessionLocal() as session:
+        async for rows in read_data(session, query):
+            yield "".join(
+                json.dumps({**row._mapping, "timestamp": row.timestamp.isoformat()}) + "\n"
+                for row in rows
+            )
 
-    results = session.execute(query).fetchall()
+
+# List
+@app.get("/processed_agent_data/", response_model=List[ProcessedAgentDataInDB])
+async def list_processed_agent_data(
+    response: Response,
+    filters: ProcessedAgentDataFilter = Depends(),
+    order_by: Literal["id", "timestamp"] = "id",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    format: Literal["json", "ndjson"] = "json",
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Keyset paginated list of processed agent data.
+    A JSON page holds at most MAX_PAGE_SIZE rows and the cursor of the next page is returned in the X-Next-Cursor header.
+    The NDJSON format streams every matching row (or up to limit) without materializing the result.
+    """
+    if format == "ndjson":
+        query = build_list_query(filters, order_by, cursor, limit)
+        return StreamingResponse(stream_ndjson(query), media_type="application/x-ndjson")
+
+    limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    query = build_list_query(filters, order_by, cursor, limit)
+    results = (await session.execute(query)).fetchall()
+    if len(results) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(results[-1], order_by)
     return results
 
 # Update
 @app.put("/processed_agent_data/{processed_agent_data_id}", response_model=ProcessedAgentDataInDB)
-def update_processed_agent_data(processed_agent_data_id: int, data: ProcessedAgentData, session: Session = Depends(get_session)):
+async def update_processed_agent_data(processed_agent_data_id: int, data: ProcessedAgentData, session: AsyncSession = Depends(get_session)):
     agent_data = data.agent_data
     query = (
         processed_agent_data.update()
@@ -222,36 +558,87 @@ def update_processed_agent_data(processed_agent_data_id: int, data: ProcessedAge
             z=agent_data.accelerometer.z,
             latitude=agent_data.gps.latitude,
             longitude=agent_data.gps.longitude,
-            timestamp=agent_data.timestamp,
+            timestamp=to_naive_utc(agent_data.timestamp),
         )
         .returning(processed_agent_data)
     )
 
-    result = session.execute(query).fetchone()
+    result = (await session.execute(query)).fetchone()
 
     if result is None:
         raise HTTPException(status_code=404, detail="ProcessedAgentData not found")
 
+    await session.commit()
     return result
 
-Base.metadata.create_all(bind=engine)
-
 # Delete
 @app.delete("/processed_agent_data/{processed_agent_data_id}", response_model=ProcessedAgentDataInDB)
-def delete_processed_agent_data(processed_agent_data_id: int, session: Session = Depends(get_session)):
+async def delete_processed_agent_data(processed_agent_data_id: int, session: AsyncSession = Depends(get_session)):
     query = (
         processed_agent_data.delete()
         .where(processed_agent_data.c.id == processed_agent_data_id)
         .returning(processed_agent_data)
     )
 
-    result = session.execute(query).fetchone()
+    result = (await session.execute(query)).fetchone()
 
     if result is None:
         raise HTTPException(status_code=404, detail="ProcessedAgentData not found")
 
+    await session.commit()
     return result
 
+def build_road_defects_query(filters: RoadDefectFilter, cursor: Optional[int], limit: int) -> Select:
+    table = road_defects.c
+    query = road_defects.select()
+    if filters.defect_type is not None:
+        query = query.where(table.defect_type == filters.defect_type)
+    if filters.min_hits is not None:
+        query = query.where(table.hits >= filters.min_hits)
+    if filters.min_severity is not None:
+        query = query.where(table.severity >= filters.min_severity)
+    if filters.seen_since is not None:
+        query = query.where(table.last_seen >= to_naive_utc(filters.seen_since))
+    bounds = (filters.min_longitude, filters.min_latitude, filters.max_longitude, filters.max_latitude)
+    if None not in bounds:
+        query = query.where(
+            road_defects_location.op("<@")(
+                func.box(func.point(bounds[0], bounds[1]), func.point(bounds[2], bounds[3]))
+            )
+        )
+    else:
+        if filters.min_latitude is not None:
+            query = query.where(table.latitude >= filters.min_latitude)
+        if filters.max_latitude is not None:
+            query = query.where(table.latitude <= filters.max_latitude)
+        if filters.min_longitude is not None:
+            query = query.where(table.longitude >= filters.min_longitude)
+        if filters.max_longitude is not None:
+            query = query.where(table.longitude <= filters.max_longitude)
+    if cursor is not None:
+        query = query.where(table.id > cursor)
+    return query.order_by(table.id).limit(limit)
+
+
+@app.get("/road_defects/", response_model=List[RoadDefectResponse])
+async def list_road_defects(
+    response: Response,
+    filters: RoadDefectFilter = Depends(),
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Road defects clustered from the detections, for the map.
+    A page holds at most MAX_PAGE_SIZE defects and the cursor of the next page is returned in the X-Next-Cursor header.
+    """
+    limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    results = (await session.execute(build_road_defects_query(filters, cursor, limit))).fetchall()
+    if len(results) == limit:
+        response.headers["X-Next-Cursor"] = str(results[-1].id)
+    return results
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,62 @@
+import zlib
+
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class GZipRequestMiddleware:
+    """
+    Decompresses request bodies sent with Content-Encoding: gzip before they reach the endpoints.
+    Bodies that inflate beyond max_size are rejected with 413 instead of being buffered.
+    """
+
+    def __init__(self, app: ASGIApp, max_size: int):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        content_encoding = dict(scope["headers"]).get(b"content-encoding", b"")
+        if content_encoding.strip().lower() != b"gzip":
+            await self.app(scope, receive, send)
+            return
+
+        decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        body = bytearray()
+        more_body = True
+        try:
+            while more_body:
+                message = await receive()
+                more_body = message.get("more_body", False)
+                body += decompressor.decompress(
+                    message.get("body", b""), self.max_size + 1 - len(body)
+                )
+                if len(body) > self.max_size or decompressor.unconsumed_tail:
+                    response = PlainTextResponse("Request body too large", status_code=413)
+                    await response(scope, receive, send)
+                    return
+            body += decompressor.flush()
+        except zlib.error:
+            response = PlainTextResponse("Invalid gzip request body", status_code=400)
+            await response(scope, receive, send)
+            return
+
+        headers = [
+            (name, value)
+            for name, value in scope["headers"]
+            if name not in (b"content-encoding", b"content-length")
+        ]
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        scope = {**scope, "headers": headers}
+        sent = False
+
+        async def receive_decompressed() -> Message:
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {"type": "http.request", "body": bytes(body), "more_body": False}
+
+        await self.app(scope, receive_decompressed, send)
@@ -0,0 +1,122 @@
+"""
+Clustering of road defect detections into the road_defects table.
+Positions are indexed on a grid of cells radius meters wide. A detection joins the nearest defect of its
+type within radius in its own or a neighboring cell, otherwise it starts a defect in its own cell, so a
+pothole hit by hundreds of vehicles is one row with a hit count. A cell holds at most one defect of each type.
+A batch is reduced to one update per defect in memory and merged into the table with one upsert,
+see docker/db/migrations/003_road_defects.sql.
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Road states that are defects: their type and severity
+DEFECT_STATES = {
+    "small pits": ("pit", 1),
+    "large pits": ("pit", 2),
+    "bumps": ("bump", 1),
+}
+# Length of a degree of latitude, and of longitude at the equator, in meters
+METERS_PER_DEGREE = 111_320
+
+Cell = Tuple[int, int]
+DefectKey = Tuple[str, int, int]
+
+
+def grid_cell(latitude: float, longitude: float, radius: float) -> Cell:
+    """
+    The cell of a position on a grid of cells radius meters high and about as wide.
+    Cells are narrower in degrees of longitude towards the poles, the width is taken at the latitude
+    of the row so every position of a row maps to the same columns.
+    """
+    cell_height = radius / METERS_PER_DEGREE
+    row = math.floor(latitude / cell_height)
+    row_latitude = max(min((row + 0.5) * cell_height, 89.0), -89.0)
+    cell_width = cell_height / math.cos(math.radians(row_latitude))
+    return row, math.floor(longitude / cell_width)
+
+
+def distance(latitude_1: float, longitude_1: float, latitude_2: float, longitude_2: float) -> float:
+    """Approximate distance in meters, exact enough at the scale of a cell"""
+    dx = (longitude_2 - longitude_1) * math.cos(math.radians((latitude_1 + latitude_2) / 2))
+    return math.hypot(latitude_2 - latitude_1, dx) * METERS_PER_DEGREE
+
+
+def _detections(rows: Iterable[dict]) -> Iterable[Tuple[dict, str, int]]:
+    for row in rows:
+        defect = DEFECT_STATES.get(row["road_state"])
+        if defect is not None and None not in (row["latitude"], row["longitude"], row["timestamp"]):
+            yield row, *defect
+
+
+def neighbor_cells(rows: List[dict], radius: float) -> Set[Cell]:
+    """The cells whose defects the detections among the rows can join"""
+    cells = set()
+    for row, _, _ in _detections(rows):
+        cell_lat, cell_lon = grid_cell(row["latitude"], row["longitude"], radius)
+        cells.update(
+            (cell_lat + d_lat, cell_lon + d_lon) for d_lat in (-1, 0, 1) for d_lon in (-1, 0, 1)
+        )
+    return cells
+
+
+def cluster_detections(
+    rows: List[dict],
+    radius: float,
+    defects: Optional[Dict[DefectKey, Tuple[float, float]]] = None,
+) -> List[dict]:
+    """
+    Reduce processed agent data rows to one update per defect.
+    Parameters:
+        rows (List[dict]): Flattened processed agent data, rows that are not defects are skipped.
+        radius (float): Merge distance and cell size in meters.
+        defects: Positions of the stored defects in the neighbor cells of the detections,
+            by defect type and cell.
+    Returns:
+        updates (List[dict]): The road_defects values of every defect hit, with the mean position
+        of its new hits, ordered by key so concurrent upserts lock the rows in the same order.
+    """
+    # Positions the detections are matched against: the stored defects and the new ones of this batch
+    centers = dict(defects or {})
+    clusters: Dict[DefectKey, dict] = {}
+    for row, defect_type, severity in _detections(rows):
+        latitude, longitude = row["latitude"], row["longitude"]
+        cell_lat, cell_lon = grid_cell(latitude, longitude, radius)
+        key = (defect_type, cell_lat, cell_lon)
+        nearest = radius
+        for d_lat in (-1, 0, 1):
+            for d_lon in (-1, 0, 1):
+                candidate = (defect_type, cell_lat + d_lat, cell_lon + d_lon)
+                center = centers.get(candidate)
+                if center is not None:
+                    meters = distance(latitude, longitude, *center)
+                    if meters <= nearest:
+                        key, nearest = candidate, meters
+        cluster = clusters.get(key)
+        if cluster is None:
+            clusters[key] = cluster = {
+                "defect_type": defect_type,
+                "cell_lat": key[1],
+                "cell_lon": key[2],
+                "latitude": 0.0,
+                "longitude": 0.0,
+                "hits": 0,
+                "severity": severity,
+                "first_seen": row["timestamp"],
+                "last_seen": row["timestamp"],
+            }
+        cluster["latitude"] += latitude
+        cluster["longitude"] += longitude
+        cluster["hits"] += 1
+        cluster["severity"] = max(cluster["severity"], severity)
+        cluster["first_seen"] = min(cluster["first_seen"], row["timestamp"])
+        cluster["last_seen"] = max(cluster["last_seen"], row["timestamp"])
+        if defects is None or key not in defects:
+            # A new defect is matched against the mean position of its hits so far
+            centers[key] = (cluster["latitude"] / cluster["hits"], cluster["longitude"] / cluster["hits"])
+    updates = []
+    for key in sorted(clusters):
+        cluster = clusters[key]
+        cluster["latitude"] /= cluster["hits"]
+        cluster["longitude"] /= cluster["hits"]
+        updates.append(cluster)
+    return updates
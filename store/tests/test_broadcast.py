@@ -0,0 +1,140 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import patch
+
+from broadcast import Broadcaster, Frame, msgpack
+
+
+class FakeWebSocket:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+        self.closed = None
+
+    async def send_text(self, data):
+        if self.fail:
+            raise RuntimeError("connection closed")
+        self.sent.append(data)
+
+    async def send_bytes(self, data):
+        if self.fail:
+            raise RuntimeError("connection closed")
+        self.sent.append(data)
+
+    async def close(self, code):
+        self.closed = code
+
+
+def rows(count, start=0):
+    return [{"id": i} for i in range(start, start + count)]
+
+
+async def settle():
+    # Let the sender and close tasks run
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestFrame(unittest.TestCase):
+    def test_text_is_encoded_once(self):
+        frame = Frame(rows(2))
+        with patch("broadcast.json.dumps", wraps=json.dumps) as dumps:
+            self.assertIs(frame.text(), frame.text())
+        dumps.assert_called_once()
+        self.assertEqual(json.loads(frame.text()), rows(2))
+
+    @unittest.skipIf(msgpack is None, "msgpack is not installed")
+    def test_binary_is_encoded_once(self):
+        frame = Frame(rows(2))
+        with patch("broadcast.msgpack.packb", wraps=msgpack.packb) as packb:
+            self.assertIs(frame.binary(), frame.binary())
+        packb.assert_called_once()
+        self.assertEqual(msgpack.unpackb(frame.binary()), rows(2))
+
+
+class TestBroadcaster(unittest.IsolatedAsyncioTestCase):
+    def create_broadcaster(self, queue_size=4, max_pending_rows=10):
+        broadcaster = Broadcaster(queue_size=queue_size, max_pending_rows=max_pending_rows, send_timeout=1)
+        self.addAsyncCleanup(self.unsubscribe_all, broadcaster)
+        return broadcaster
+
+    async def unsubscribe_all(self, broadcaster):
+        for subscribers in list(broadcaster.subscriptions.values()):
+            for subscriber in list(subscribers):
+                broadcaster.unsubscribe(subscriber)
+        await settle()
+
+    async def test_frames_are_shared_between_subscribers(self):
+        broadcaster = self.create_broadcaster()
+        websockets = [FakeWebSocket(), FakeWebSocket()]
+        for websocket in websockets:
+            broadcaster.subscribe(1, websocket)
+        other = FakeWebSocket()
+        broadcaster.subscribe(2, other)
+        with patch("broadcast.json.dumps", wraps=json.dumps) as dumps:
+            broadcaster.publish(1, rows(3))
+            await settle()
+        dumps.assert_called_once()
+        self.assertIs(websockets[0].sent[0], websockets[1].sent[0])
+        self.assertEqual(other.sent, [])
+        self.assertEqual(broadcaster.stats()["sent"], 2)
+
+    async def test_batches_are_coalesced_when_behind(self):
+        broadcaster = self.create_broadcaster(queue_size=2, max_pending_rows=100)
+        websocket = FakeWebSocket()
+        broadcaster.subscribe(1, websocket)
+        # The sender has not run yet, so the batches pile up
+        for i in range(4):
+            broadcaster.publish(1, rows(2, start=2 * i))
+        await settle()
+        self.assertEqual([json.loads(frame) for frame in websocket.sent], [rows(2), rows(6, start=2)])
+        self.assertEqual(broadcaster.stats()["coalesced"], 2)
+
+    async def test_subscriber_behind_is_evicted(self):
+        broadcaster = self.create_broadcaster(max_pending_rows=10)
+        websocket = FakeWebSocket()
+        broadcaster.subscribe(1, websocket)
+        broadcaster.publish(1, rows(6))
+        broadcaster.publish(1, rows(6))
+        await settle()
+        self.assertEqual(websocket.sent, [])
+        self.assertEqual(websocket.closed, 1013)
+        self.assertEqual(broadcaster.stats()["evicted"], 1)
+        self.assertEqual(broadcaster.stats()["subscribers"], 0)
+
+    async def test_large_batch_reaches_an_idle_subscriber(self):
+        broadcaster = self.create_broadcaster(max_pending_rows=10)
+        websocket = FakeWebSocket()
+        broadcaster.subscribe(1, websocket)
+        broadcaster.publish(1, rows(11))
+        await settle()
+        self.assertEqual([json.loads(frame) for frame in websocket.sent], [rows(11)])
+        self.assertIsNone(websocket.closed)
+        self.assertEqual(broadcaster.stats()["evicted"], 0)
+
+    async def test_dead_socket_is_dropped(self):
+        broadcaster = self.create_broadcaster()
+        dead, alive = FakeWebSocket(fail=True), FakeWebSocket()
+        broadcaster.subscribe(1, dead)
+        broadcaster.subscribe(1, alive)
+        broadcaster.publish(1, rows(1))
+        await settle()
+        self.assertEqual(dead.closed, 1011)
+        self.assertEqual(len(broadcaster.subscriptions[1]), 1)
+        broadcaster.publish(1, rows(1, start=1))
+        await settle()
+        self.assertEqual(len(alive.sent), 2)
+
+    @unittest.skipIf(msgpack is None, "msgpack is not installed")
+    async def test_msgpack_subscriber_gets_binary_frames(self):
+        broadcaster = self.create_broadcaster()
+        websocket = FakeWebSocket()
+        broadcaster.subscribe(1, websocket, "msgpack")
+        broadcaster.publish(1, rows(2))
+        await settle()
+        self.assertEqual(msgpack.unpackb(websocket.sent[0]), rows(2))
+
+
+if __name__ == "__main__":
+    unittest.main()
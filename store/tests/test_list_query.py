@@ -0,0 +1,150 @@
+import json
+import unittest
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+import main
+from main import ProcessedAgentDataFilter, build_list_query, encode_cursor
+
+
+class Row(dict):
+    """A result row, its columns are keys and attributes"""
+
+    __getattr__ = dict.__getitem__
+
+    @property
+    def _mapping(self):
+        return self
+
+
+def make_row(id_, timestamp=datetime(2024, 1, 1, 12, 30, 15, 123456)):
+    return Row(
+        id=id_, road_state="normal", user_id=1, x=0.0, y=0.0, z=16500.0,
+        latitude=50.45, longitude=30.52, timestamp=timestamp,
+    )
+
+
+def compile_query(query):
+    compiled = query.compile(dialect=postgresql.dialect())
+    return str(compiled), compiled.params
+
+
+class TestBuildListQuery(unittest.TestCase):
+    def test_id_cursor_round_trip(self):
+        cursor = encode_cursor(make_row(42), "id")
+        sql, params = compile_query(build_list_query(ProcessedAgentDataFilter(), "id", cursor, 10))
+        self.assertIn("processed_agent_data.id > %(id_1)s", sql)
+        self.assertIn("ORDER BY processed_agent_data.id", sql)
+        self.assertEqual(params["id_1"], 42)
+
+    def test_timestamp_cursor_round_trip(self):
+        row = make_row(42)
+        cursor = encode_cursor(row, "timestamp")
+        sql, params = compile_query(build_list_query(ProcessedAgentDataFilter(), "timestamp", cursor, 10))
+        self.assertIn("(processed_agent_data.timestamp, processed_agent_data.id) > ", sql)
+        self.assertIn("ORDER BY processed_agent_data.timestamp, processed_agent_data.id", sql)
+        self.assertIn(row.timestamp, params.values())
+        self.assertIn(42, params.values())
+
+    def test_aware_time_filters_are_compared_in_utc(self):
+        filters = ProcessedAgentDataFilter(start_time=datetime(2024, 1, 1, 12, tzinfo=timezone.utc))
+        _, params = compile_query(build_list_query(filters, "id", None, None))
+        self.assertIn(datetime(2024, 1, 1, 12), params.values())
+
+    def test_invalid_cursor_is_rejected(self):
+        for order_by, cursor in (("id", "abc"), ("timestamp", "42"), ("timestamp", "yesterday|42")):
+            with self.subTest(order_by=order_by, cursor=cursor):
+                with self.assertRaises(HTTPException) as context:
+                    build_list_query(ProcessedAgentDataFilter(), order_by, cursor, 10)
+                self.assertEqual(context.exception.status_code, 400)
+
+    def test_complete_bounding_box_uses_the_location_index(self):
+        filters = ProcessedAgentDataFilter(
+            min_latitude=50.0, max_latitude=51.0, min_longitude=30.0, max_longitude=31.0
+        )
+        sql, params = compile_query(build_list_query(filters, "id", None, None))
+        self.assertIn("point(processed_agent_data.longitude, processed_agent_data.latitude) <@ box(", sql)
+        self.assertNotIn("processed_agent_data.latitude >=", sql)
+        # Corners are given as (longitude, latitude)
+        self.assertEqual(
+            [params[f"point_{i}"] for i in range(1, 5)], [30.0, 50.0, 31.0, 51.0]
+        )
+
+    def test_partial_bounds_filter_the_columns(self):
+        filters = ProcessedAgentDataFilter(min_latitude=50.0, max_longitude=31.0)
+        sql, _ = compile_query(build_list_query(filters, "id", None, None))
+        self.assertIn("processed_agent_data.latitude >= ", sql)
+        self.assertIn("processed_agent_data.longitude <= ", sql)
+        self.assertNotIn("box(", sql)
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    async def execute(self, query):
+        self.queries.append(query)
+        return self
+
+    def fetchall(self):
+        return self.rows
+
+
+class TestListEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.session = FakeSession([])
+
+        async def get_session():
+            yield self.session
+
+        main.app.dependency_overrides[main.get_session] = get_session
+        self.addCleanup(main.app.dependency_overrides.clear)
+        self.client = TestClient(main.app)
+
+    def test_full_page_returns_the_next_cursor(self):
+        self.session.rows = [make_row(1), make_row(2)]
+        response = self.client.get("/processed_agent_data/", params={"limit": 2, "order_by": "timestamp"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["id"] for row in response.json()], [1, 2])
+        cursor = response.headers["X-Next-Cursor"]
+        self.assertEqual(cursor, "2024-01-01T12:30:15.123456|2")
+
+        self.session.rows = [make_row(3)]
+        response = self.client.get(
+            "/processed_agent_data/", params={"limit": 2, "order_by": "timestamp", "cursor": cursor}
+        )
+        self.assertNotIn("X-Next-Cursor", response.headers)
+        _, params = compile_query(self.session.queries[-1])
+        self.assertIn(2, params.values())
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        response = self.client.get("/processed_agent_data/", params={"cursor": "abc"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_ndjson_streams_every_row(self):
+        rows = [make_row(1), make_row(2), make_row(3)]
+
+        async def read_data(session, query):
+            yield rows[:2]
+            yield rows[2:]
+
+        @asynccontextmanager
+        async def session_local():
+            yield None
+
+        with patch("main.read_data", read_data), patch("main.SessionLocal", session_local):
+            response = self.client.get("/processed_agent_data/", params={"format": "ndjson"})
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([line["id"] for line in lines], [1, 2, 3])
+        self.assertEqual(lines[0]["timestamp"], "2024-01-01T12:30:15.123456")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import gzip
+import unittest
+
+from request_encoding import GZipRequestMiddleware
+
+
+class EchoApp:
+    """Records the request it gets and answers 200"""
+
+    def __init__(self):
+        self.scope = None
+        self.body = None
+
+    async def __call__(self, scope, receive, send):
+        self.scope = scope
+        self.body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            self.body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+
+class TestGZipRequestMiddleware(unittest.IsolatedAsyncioTestCase):
+    async def request(self, chunks, headers, max_size=1000):
+        app = EchoApp()
+        middleware = GZipRequestMiddleware(app, max_size=max_size)
+        scope = {"type": "http", "method": "POST", "path": "/", "headers": headers}
+        messages = [
+            {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+            for i, chunk in enumerate(chunks)
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope, receive, send)
+        return sent[0]["status"], app
+
+    async def test_plain_body_is_passed_through(self):
+        headers = [(b"content-type", b"application/json"), (b"content-length", b"2")]
+        status, app = await self.request([b"[]"], headers)
+        self.assertEqual(status, 200)
+        self.assertEqual(app.body, b"[]")
+        self.assertEqual(app.scope["headers"], headers)
+
+    async def test_gzip_body_is_decompressed(self):
+        body = b'[{"user_id": 1}]' * 10
+        compressed = gzip.compress(body)
+        headers = [(b"content-encoding", b"gzip"), (b"content-length", str(len(compressed)).encode())]
+        # The body arrives in several messages
+        chunks = [compressed[i:i + 7] for i in range(0, len(compressed), 7)]
+        status, app = await self.request(chunks, headers)
+        self.assertEqual(status, 200)
+        self.assertEqual(app.body, body)
+        self.assertEqual(app.scope["headers"], [(b"content-length", str(len(body)).encode())])
+
+    async def test_body_larger_than_max_size_is_rejected(self):
+        compressed = gzip.compress(b"0" * 100_000)
+        status, app = await self.request([compressed], [(b"content-encoding", b"gzip")], max_size=1000)
+        self.assertEqual(status, 413)
+        self.assertIsNone(app.scope)
+
+    async def test_invalid_gzip_stream_is_rejected(self):
+        status, app = await self.request([b"not gzip"], [(b"content-encoding", b"gzip")])
+        self.assertEqual(status, 400)
+        self.assertIsNone(app.scope)
+
+
+if __name__ == "__main__":
+    unittest.main()
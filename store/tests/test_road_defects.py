@@ -0,0 +1,100 @@
+import unittest
+from datetime import datetime, timedelta
+
+from road_defects import METERS_PER_DEGREE, cluster_detections, grid_cell, neighbor_cells
+
+RADIUS = 10
+# One meter and the height of a cell in degrees of latitude
+METER = 1 / METERS_PER_DEGREE
+CELL = RADIUS * METER
+# A latitude on the border of two rows of cells and a longitude in the middle of a column
+BORDER = 5000 * CELL
+LONGITUDE = CELL / 2
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def detection(road_state, latitude, longitude=LONGITUDE, seconds=0):
+    return {
+        "road_state": road_state,
+        "latitude": latitude,
+        "longitude": longitude,
+        "timestamp": START + timedelta(seconds=seconds),
+    }
+
+
+class TestGridCell(unittest.TestCase):
+    def test_close_positions_share_a_cell(self):
+        self.assertEqual(
+            grid_cell(BORDER + METER, LONGITUDE, RADIUS),
+            grid_cell(BORDER + 2 * METER, LONGITUDE, RADIUS),
+        )
+
+    def test_positions_across_a_border_are_in_neighbor_rows(self):
+        below = grid_cell(BORDER - METER, LONGITUDE, RADIUS)
+        above = grid_cell(BORDER + METER, LONGITUDE, RADIUS)
+        self.assertEqual(above, (below[0] + 1, below[1]))
+
+    def test_neighbor_cells(self):
+        cell_lat, cell_lon = grid_cell(BORDER + METER, LONGITUDE, RADIUS)
+        cells = neighbor_cells([detection("small pits", BORDER + METER)], RADIUS)
+        self.assertEqual(len(cells), 9)
+        self.assertIn((cell_lat - 1, cell_lon + 1), cells)
+        self.assertEqual(neighbor_cells([detection("normal", BORDER)], RADIUS), set())
+
+
+class TestClusterDetections(unittest.TestCase):
+    def test_detections_across_a_border_merge(self):
+        rows = [
+            detection("small pits", BORDER - METER, seconds=5),
+            detection("small pits", BORDER + METER, seconds=1),
+        ]
+        [update] = cluster_detections(rows, RADIUS)
+        self.assertEqual(
+            (update["cell_lat"], update["cell_lon"]), grid_cell(BORDER - METER, LONGITUDE, RADIUS)
+        )
+        self.assertEqual(update["hits"], 2)
+        self.assertAlmostEqual(update["latitude"], BORDER)
+        self.assertEqual(update["first_seen"], START + timedelta(seconds=1))
+        self.assertEqual(update["last_seen"], START + timedelta(seconds=5))
+
+    def test_severity_is_the_maximum(self):
+        rows = [
+            detection("small pits", BORDER + METER),
+            detection("large pits", BORDER + 2 * METER),
+            detection("small pits", BORDER + 3 * METER),
+        ]
+        [update] = cluster_detections(rows, RADIUS)
+        self.assertEqual(update["defect_type"], "pit")
+        self.assertEqual(update["severity"], 2)
+        self.assertEqual(update["hits"], 3)
+
+    def test_stored_defect_in_a_neighbor_cell_is_joined(self):
+        cell_lat, cell_lon = grid_cell(BORDER - METER, LONGITUDE, RADIUS)
+        defects = {("pit", cell_lat, cell_lon): (BORDER - METER, LONGITUDE)}
+        [update] = cluster_detections([detection("large pits", BORDER + METER)], RADIUS, defects)
+        self.assertEqual((update["cell_lat"], update["cell_lon"]), (cell_lat, cell_lon))
+        self.assertEqual(update["hits"], 1)
+        # The update holds the position of the new hits, the upsert weighs it with the stored one
+        self.assertAlmostEqual(update["latitude"], BORDER + METER)
+
+    def test_distant_and_different_defects_are_kept_apart(self):
+        rows = [
+            detection("small pits", BORDER + METER),
+            detection("small pits", BORDER + METER + 3 * CELL),
+            detection("bumps", BORDER + METER),
+        ]
+        updates = cluster_detections(rows, RADIUS)
+        self.assertEqual([update["defect_type"] for update in updates], ["bump", "pit", "pit"])
+        self.assertEqual([update["hits"] for update in updates], [1, 1, 1])
+
+    def test_rows_that_are_not_defects_are_skipped(self):
+        rows = [
+            detection("normal", BORDER),
+            detection("small pits", None),
+            {**detection("bumps", BORDER), "timestamp": None},
+        ]
+        self.assertEqual(cluster_detections(rows, RADIUS), [])
+
+
+if __name__ == "__main__":
+    unittest.main()